@@ -0,0 +1,154 @@
+"""
+Mixed concurrent load on the auth and user endpoints.
+Seeds --users users (sharing one real password hash) and --roles roles, logs in a pool of
+sessions, then runs --concurrency workers for --duration seconds, each picking its next
+request by the --mix weights. Reports throughput and p50/p95/p99 per endpoint.
+
+    PASSWORD_HASH_ROUNDS=4 python -m benchmarks.bench_load --baseline benchmarks/baselines/load.json
+    PASSWORD_HASH_ROUNDS=4 python -m benchmarks.bench_load --save-baseline benchmarks/baselines/load.json
+
+The stored baseline was recorded with PASSWORD_HASH_ROUNDS=4 (bcrypt out of the picture, see
+bench_micro for its cost) on a 1-CPU machine against aiosqlite, re-record it on the machine that
+gates (its "environment" block says where a result came from).
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+import uuid
+from typing import Dict, List
+
+from benchmarks.harness import (
+    add_baseline_arguments, app_client, environment, percentile, report, run as run_benchmark, summarize,
+)
+from benchmarks.seed import password_hash_for, seed_roles, seed_users
+
+PASSWORD = "benchmark-password"
+DEFAULT_MIX = "login=1,me=20,register=1,admin_list=2,admin_search=2,admin_only=2"
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+async def run(args) -> dict:
+    await seed_users(args.users, password_hash=await password_hash_for(PASSWORD))
+    seeded = await seed_roles(args.roles, args.permissions_per_role, admins=1, roles_per_user=args.roles_per_user)
+    rng = random.Random(args.seed)
+    run_id = uuid.uuid4().hex[:8]
+    registrations = 0
+
+    async with app_client() as client:
+        async def login(email: str) -> Dict[str, str]:
+            response = await client.post("/login", data={"username": email, "password": PASSWORD})
+            response.raise_for_status()
+            return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        # seeding makes every tenth user inactive and gives the admin role to the first active one (user1)
+        active = [i for i in range(2, args.users) if i % 10 != 0]
+        admin_headers = await login("user1@example.com")
+        sessions = [await login(f"user{i}@example.com") for i in active[:args.sessions]]
+        # polling clients revalidating /me with the ETag they already have ("me_revalidate" in --mix, answered 304)
+        revalidations = [
+            {**headers, "If-None-Match": (await client.get("/me", headers=headers)).headers["etag"]}
+            for headers in sessions
+        ]
+
+        async def request(name: str):
+            nonlocal registrations
+            if name == "login":
+                user = rng.choice(active)
+                return await client.post("/login", data={"username": f"user{user}@example.com", "password": PASSWORD}), 200
+            if name == "me":
+                return await client.get("/me", headers=rng.choice(sessions)), 200
+            if name == "me_revalidate":
+                return await client.get("/me", headers=rng.choice(revalidations)), 304
+            if name == "register":
+                registrations += 1
+                payload = {
+                    "email": f"load-{run_id}-{registrations}@example.com",
+                    "username": f"load{run_id}x{registrations}",
+                    "password": PASSWORD,
+                }
+                return await client.post("/register/user", json=payload), 201
+            if name == "admin_list":
+                return await client.get("/users", params={"limit": 50}, headers=admin_headers), 200
+            if name == "admin_search":
+                params = {"email": f"user{rng.randrange(1, 1000)}", "match": "prefix", "page_size": 20}
+                return await client.get("/users/search", params=params, headers=admin_headers), 200
+            if name == "admin_only":
+                return await client.get("/admin-only", headers=admin_headers), 200
+            raise ValueError(f"Unknown endpoint in --mix: {name}")
+
+        mix = parse_mix(args.mix)
+        names, weights = list(mix), list(mix.values())
+        samples: Dict[str, List[float]] = {name: [] for name in names}
+        errors: Dict[str, int] = {name: 0 for name in names}
+
+        async def worker(deadline: float):
+            while time.perf_counter() < deadline:
+                name = rng.choices(names, weights)[0]
+                start = time.perf_counter()
+                response, expected = await request(name)
+                samples[name].append(time.perf_counter() - start)
+                if response.status_code != expected:
+                    errors[name] += 1
+
+        # short unrecorded warm-up so first-request costs (statement compilation, caches) don't skew p99
+        await asyncio.gather(*(worker(time.perf_counter() + args.warmup) for _ in range(args.concurrency)))
+        for name in names:
+            samples[name].clear()
+            errors[name] = 0
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(start + args.duration) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+
+    endpoints = {}
+    for name in names:
+        summary = summarize(samples[name])
+        summary.update(errors=errors[name], throughput_per_s=len(samples[name]) / elapsed)
+        endpoints[name] = summary
+    every_sample = [sample for values in samples.values() for sample in values]
+    return {
+        "environment": environment(),
+        "config": {
+            "users": args.users, **seeded, "concurrency": args.concurrency,
+            "duration_s": args.duration, "mix": args.mix,
+        },
+        "total": {
+            "requests": len(every_sample),
+            "errors": sum(errors.values()),
+            "throughput_per_s": len(every_sample) / elapsed,
+            "p50_ms": percentile(every_sample, 50) * 1000,
+            "p99_ms": percentile(every_sample, 99) * 1000,
+        },
+        "endpoints": endpoints,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--roles", type=int, default=5)
+    parser.add_argument("--permissions-per-role", type=int, default=4)
+    parser.add_argument("--roles-per-user", type=int, default=1)
+    parser.add_argument("--sessions", type=int, default=8, help="logged-in users polling /me")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--warmup", type=float, default=1.0)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"endpoint weights (default {DEFAULT_MIX})")
+    parser.add_argument("--seed", type=int, default=1234)
+    add_baseline_arguments(parser)
+    args = parser.parse_args()
+    result = run_benchmark(run(args))
+    sys.exit(report(result, args.baseline, args.save_baseline, args.tolerance, args.ignore_environment))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Login burst benchmark.
+Fires `--logins` logins with `--concurrency` in flight while a poller hammers /me,
+then reports login throughput and /me latency percentiles.
+Compare runs with PASSWORD_HASH_WORKERS / PASSWORD_HASH_EXECUTOR set differently.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.harness import run as run_benchmark, app_client, register_and_login, summarize
+
+PASSWORD = "benchmark-password"
+
+
+async def run(logins: int, concurrency: int, pollers: int, poll_interval: float) -> dict:
+    async with app_client() as client:
+        token = await register_and_login(client, "bench@example.com", "benchuser", PASSWORD)
+        headers = {"Authorization": f"Bearer {token}"}
+        me_samples = []
+        login_failures = 0
+        done = asyncio.Event()
+
+        async def poll_me():
+            while not done.is_set():
+                start = time.perf_counter()
+                await client.get("/me", headers=headers)
+                me_samples.append(time.perf_counter() - start)
+                await asyncio.sleep(poll_interval)
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def login():
+            nonlocal login_failures
+            async with semaphore:
+                response = await client.post(
+                    "/login", data={"username": "bench@example.com", "password": PASSWORD}
+                )
+                if response.status_code != 200:
+                    login_failures += 1
+
+        poll_tasks = [asyncio.create_task(poll_me()) for _ in range(pollers)]
+        start = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(logins)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await asyncio.gather(*poll_tasks)
+
+    return {
+        "logins": logins,
+        "login_failures": login_failures,
+        "login_throughput_per_s": logins / elapsed,
+        "me_latency_during_logins": summarize(me_samples),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--pollers", type=int, default=4)
+    parser.add_argument("--poll-interval", type=float, default=0.01)
+    args = parser.parse_args()
+    result = run_benchmark(run(args.logins, args.concurrency, args.pollers, args.poll_interval))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
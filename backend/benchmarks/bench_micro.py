@@ -0,0 +1,69 @@
+"""
+Micro-benchmarks of the per-request auth primitives: token creation/decoding,
+the verified-token cache and bcrypt at the configured cost.
+Reports the best-of-`--repeat` time per operation, gate with --baseline like bench_load.
+"""
+import argparse
+import sys
+import time
+from datetime import timedelta
+from typing import Callable
+
+from benchmarks.harness import add_baseline_arguments, environment, report, run as run_benchmark
+
+
+def best_ns_per_op(fn: Callable[[], object], number: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter_ns() - start) / number)
+    return best
+
+
+async def run(number: int, repeat: int, hash_number: int) -> dict:
+    from db.session import SessionLocal
+    from repositories.user_repository import UserRepository
+    from services.security_service import SecurityService
+    from services.hashing_service import _hash, _verify, current_rounds
+    from services.token_cache import Principal, TokenCache
+
+    # the session is never used, SecurityService only needs it to build its repositories
+    async with SessionLocal() as session:
+        service = SecurityService(UserRepository(session))
+        claims = {"sub": "42", "scopes": ["admin"], "perms": 0b1011, "ver": 0}
+        lifetime = timedelta(minutes=30)
+        token = service.create_access_token(claims, lifetime)
+        payload = service.decode_token(token)
+
+        cache = TokenCache(max_entries=10_000, ttl_seconds=60)
+        cache.set(token, payload, Principal(id=42, email="bench@example.com", username="bench", is_active=True, is_superuser=False))
+
+        hashed = _hash("benchmark-password", current_rounds())
+        results = {
+            "create_access_token": best_ns_per_op(lambda: service.create_access_token(claims, lifetime), number, repeat),
+            "decode_token": best_ns_per_op(lambda: service.decode_token(token), number, repeat),
+            "token_cache_hit": best_ns_per_op(lambda: cache.get(token), number, repeat),
+            "password_hash": best_ns_per_op(lambda: _hash("benchmark-password", current_rounds()), hash_number, repeat),
+            "password_verify": best_ns_per_op(lambda: _verify("benchmark-password", hashed), hash_number, repeat),
+        }
+    return {
+        "environment": environment(),
+        **{name: {"ns_per_op": ns, "ops_per_s": 1e9 / ns} for name, ns in results.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=2000, help="calls per timing run")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--hash-number", type=int, default=3, help="calls per timing run for bcrypt")
+    add_baseline_arguments(parser)
+    args = parser.parse_args()
+    result = run_benchmark(run(args.number, args.repeat, args.hash_number))
+    sys.exit(report(result, args.baseline, args.save_baseline, args.tolerance, args.ignore_environment))
+
+
+if __name__ == "__main__":
+    main()
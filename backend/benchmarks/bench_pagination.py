@@ -0,0 +1,60 @@
+"""
+OFFSET vs keyset pagination deep into the user table.
+Seeds `--rows` users, then times fetching page `--page` (of `--page-size`) both ways.
+"""
+import argparse
+import json
+import time
+
+from benchmarks.harness import run as run_benchmark, summarize
+from benchmarks.seed import seed_users
+
+
+async def run(rows: int, page: int, page_size: int, repeat: int) -> dict:
+    from db.session import SessionLocal
+    from repositories.pagination import encode_cursor
+    from repositories.user_repository import UserRepository
+
+    await seed_users(rows)
+    if page < 2 or (page - 1) * page_size >= rows:
+        raise SystemExit("--page must be > 1 and inside the seeded table")
+    skip = (page - 1) * page_size
+    offset_samples, keyset_samples = [], []
+    async with SessionLocal() as session:
+        repository = UserRepository(session)
+        # the cursor a client would hold after walking to page-1 (sort key of the last row seen)
+        previous = await repository.get_all(skip=skip - 1, limit=1)
+        cursor = encode_cursor("id", previous[0].id, previous[0].id)
+        for _ in range(repeat):
+            session.expunge_all()
+            start = time.perf_counter()
+            offset_items = await repository.get_all(skip=skip, limit=page_size)
+            offset_samples.append(time.perf_counter() - start)
+
+            session.expunge_all()
+            start = time.perf_counter()
+            keyset_items, _ = await repository.get_page(limit=page_size, cursor=cursor)
+            keyset_samples.append(time.perf_counter() - start)
+        assert [u.id for u in offset_items] == [u.id for u in keyset_items]
+    return {
+        "rows": rows,
+        "page": page,
+        "page_size": page_size,
+        "offset": summarize(offset_samples),
+        "keyset": summarize(keyset_samples),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--page", type=int, default=1000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    result = run_benchmark(run(args.rows, args.page, args.page_size, args.repeat))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
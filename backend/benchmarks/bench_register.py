@@ -0,0 +1,63 @@
+"""
+Signup benchmark: latency and database statements per POST /register/user.
+Set REGISTRATION_PRECHECK=false to measure the insert-only path.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.harness import app_client, run as run_benchmark, summarize
+
+
+async def run(signups: int, concurrency: int, duplicates: int) -> dict:
+    from sqlalchemy import event
+    from db.session import engine
+
+    statements = 0
+
+    def count_statement(*args):
+        nonlocal statements
+        statements += 1
+
+    async with app_client() as client:
+        event.listen(engine.sync_engine, "before_cursor_execute", count_statement)
+        samples = []
+        statuses = {}
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def signup(i: int):
+            # the last `duplicates` signups reuse earlier emails to exercise the conflict path
+            n = i - signups + duplicates if i >= signups - duplicates else i
+            payload = {"email": f"signup{n}@example.com", "username": f"signup{i}", "password": "benchmark-password"}
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post("/register/user", json=payload)
+                samples.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(signup(i) for i in range(signups)))
+        elapsed = time.perf_counter() - start
+        event.remove(engine.sync_engine, "before_cursor_execute", count_statement)
+
+    return {
+        "signups": signups,
+        "statuses": statuses,
+        "statements_per_signup": statements / signups,
+        "throughput_per_s": signups / elapsed,
+        "latency": summarize(samples),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--signups", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duplicates", type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps(run_benchmark(run(args.signups, args.concurrency, args.duplicates)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+User search latency on a seeded table (1M rows by default).
+Times UserRepository.search for the common filter shapes; the target is < 10ms per query.
+"""
+import argparse
+import json
+import time
+
+from benchmarks.harness import run as run_benchmark, summarize
+from benchmarks.seed import seed_users
+
+CASES = {
+    "email_exact": {"email": "user123456@example.com", "match": "exact"},
+    "email_prefix": {"email": "user12345", "match": "prefix"},
+    "username_contains": {"username": "r98765", "match": "contains"},
+    "email_contains_active": {"email": "54321@", "match": "contains", "is_active": True},
+    "newest_active": {"is_active": True, "order_by": "created_at", "order": "desc"},
+    "by_username_asc": {"order_by": "username", "order": "asc"},
+}
+
+
+async def run(rows: int, repeat: int) -> dict:
+    from db.session import SessionLocal
+    from repositories.user_repository import UserRepository
+    from schemas.users_scheme import UserSearch
+
+    await seed_users(rows)
+    results = {"rows": rows}
+    async with SessionLocal() as session:
+        repository = UserRepository(session)
+        for name, params in CASES.items():
+            criteria = UserSearch(**params)
+            samples = []
+            for _ in range(repeat):
+                session.expunge_all()
+                start = time.perf_counter()
+                await repository.search(criteria)
+                samples.append(time.perf_counter() - start)
+            results[name] = summarize(samples)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps(run_benchmark(run(args.rows, args.repeat)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Serialization cost of the user read endpoints, per user, for a single user (/me from the
+cached Principal) and for --items users in one page (/users from ORM objects or row tuples).
+"pydantic" is the previous path: model_validate per item, then FastAPI validating and encoding
+the returned model against response_model, rendered by the stdlib-json JSONResponse.
+The other paths build a FastJSONResponse from RowSerializer dicts, "stdlib" renders those with
+json instead of orjson to separate the encoder from the validation savings.
+Gate with --baseline like bench_micro.
+"""
+import argparse
+import json
+import sys
+from datetime import datetime, timedelta
+
+from benchmarks.harness import add_baseline_arguments, environment, report, run as run_benchmark
+from benchmarks.bench_micro import best_ns_per_op
+
+
+async def run(items: int, number: int, repeat: int) -> dict:
+    from fastapi.responses import JSONResponse
+    from fastapi.utils import create_response_field
+    from models.users import User
+    from schemas.response import CursorPage
+    from schemas.serialization import FastJSONResponse, _default
+    from schemas.users_scheme import UserResponse, user_response_serializer
+    from services.token_cache import Principal
+
+    start = datetime(2024, 1, 1, 12, 0, 0, 123456)
+    users = [
+        User(
+            id=i, email=f"user{i}@example.com", username=f"user{i}", hashed_password="x",
+            is_active=True, is_superuser=False,
+            created_at=start + timedelta(seconds=i), updated_at=start + timedelta(seconds=i, microseconds=7),
+        )
+        for i in range(1, items + 1)
+    ]
+    rows = [tuple(getattr(user, name) for name in user_response_serializer.fields) for user in users]
+    principal = Principal.from_user(users[0], {"scopes": ["admin"], "perms": 3})
+
+    # the response fields FastAPI builds from the routes' response_model
+    user_field = create_response_field(name="Response_read_users_me", type_=UserResponse)
+    page_field = create_response_field(name="Response_list_users", type_=CursorPage[UserResponse])
+
+    def fastapi_encode(field, content) -> bytes:
+        value, errors = field.validate(content, {}, loc=("response",))
+        assert not errors, errors
+        return JSONResponse(field.serialize(value, mode="json", by_alias=True)).body
+
+    def pydantic_one() -> bytes:
+        return fastapi_encode(user_field, principal)
+
+    def pydantic_page() -> bytes:
+        page = CursorPage[UserResponse](items=[UserResponse.model_validate(user) for user in users], next_cursor="x")
+        return fastapi_encode(page_field, page)
+
+    def page(items_: list) -> dict:
+        return {"items": items_, "next_cursor": "x", "total": None, "total_is_estimate": False}
+
+    def stdlib_dumps(content) -> bytes:
+        return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+    # same bytes out of every path, or the comparison is meaningless
+    assert json.loads(pydantic_one()) == json.loads(FastJSONResponse(user_response_serializer.one(principal)).body)
+    assert json.loads(pydantic_page()) == json.loads(FastJSONResponse(page(user_response_serializer.rows(rows))).body)
+
+    page_number = max(1, number // items)
+    cases = {
+        "single.pydantic": (pydantic_one, number, 1),
+        "single.serializer": (lambda: FastJSONResponse(user_response_serializer.one(principal)).body, number, 1),
+        "single.serializer_stdlib": (lambda: stdlib_dumps(user_response_serializer.one(principal)), number, 1),
+        "page.pydantic": (pydantic_page, page_number, items),
+        "page.serializer_orm": (lambda: FastJSONResponse(page(user_response_serializer.many(users))).body, page_number, items),
+        "page.serializer_rows": (lambda: FastJSONResponse(page(user_response_serializer.rows(rows))).body, page_number, items),
+        "page.serializer_rows_stdlib": (lambda: stdlib_dumps(page(user_response_serializer.rows(rows))), page_number, items),
+    }
+    result = {"environment": environment(), "config": {"items": items}}
+    for name, (fn, calls, per_call) in cases.items():
+        group, path = name.split(".")
+        ns = best_ns_per_op(fn, calls, repeat)
+        result.setdefault(group, {})[path] = {"ns_per_op": ns, "ns_per_user": ns / per_call}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=1000, help="users in the page case")
+    parser.add_argument("--number", type=int, default=2000, help="users serialized per timing run")
+    parser.add_argument("--repeat", type=int, default=5)
+    add_baseline_arguments(parser)
+    args = parser.parse_args()
+    result = run_benchmark(run(args.items, args.number, args.repeat))
+    sys.exit(report(result, args.baseline, args.save_baseline, args.tolerance, args.ignore_environment))
+
+
+if __name__ == "__main__":
+    main()
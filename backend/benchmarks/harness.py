@@ -0,0 +1,208 @@
+"""
+Shared helpers for the benchmark scripts.
+Run them from the backend directory, e.g. `python -m benchmarks.bench_login`.
+Importing this module points the app at a throwaway aiosqlite database unless
+DATABASE_URL_TEST is already set (e.g. postgresql+asyncpg://... for a local Postgres),
+so it must be imported before `main`. DATABASE_URL_TEST is also the app's only database URL,
+so the seeding helpers refuse any other database unless BENCHMARK_ALLOW_EXISTING_DATABASE=true.
+"""
+import asyncio
+import json
+import os
+import platform
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Dict, List, Optional
+
+_db_file = os.path.join(tempfile.mkdtemp(prefix="tma-bench-"), "bench.db")
+_throwaway_url = f"sqlite+aiosqlite:///{_db_file}"
+os.environ.setdefault("DATABASE_URL_TEST", _throwaway_url)
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-not-for-production")
+os.environ.setdefault("ALGORITHM", "HS256")
+# the load generators hammer /login and /register/user from one client address
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+import httpx  # noqa: E402
+
+
+class ExistingDatabaseError(RuntimeError):
+    """A benchmark would write synthetic data into a database it didn't create"""
+
+
+def ensure_throwaway_database() -> None:
+    """Seeding deletes and inserts rows: only into the throwaway database, unless explicitly allowed"""
+    if os.environ["DATABASE_URL_TEST"] == _throwaway_url:
+        return
+    if os.environ.get("BENCHMARK_ALLOW_EXISTING_DATABASE", "").lower() == "true":
+        return
+    raise ExistingDatabaseError(
+        "DATABASE_URL_TEST points at an existing database and seeding would replace its roles and add users. "
+        "Unset it to benchmark a throwaway SQLite file, or set BENCHMARK_ALLOW_EXISTING_DATABASE=true "
+        "for a database that exists only for benchmarking."
+    )
+
+
+def run(coro: Awaitable[Any]) -> Any:
+    """asyncio.run that always disposes the engines, aiosqlite threads keep the interpreter alive otherwise"""
+    async def runner():
+        from db.session import dispose_engine
+        try:
+            return await coro
+        finally:
+            await dispose_engine()
+    return asyncio.run(runner())
+
+
+@asynccontextmanager
+async def app_client() -> AsyncIterator[httpx.AsyncClient]:
+    """Boot main.app (including its lifespan) and yield an in-process client"""
+    from main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            yield client
+
+
+async def register_and_login(client: httpx.AsyncClient, email: str, username: str, password: str) -> str:
+    """Create a user (ignoring conflicts) and return an access token"""
+    await client.post("/register/user", json={"email": email, "username": username, "password": password})
+    response = await client.post("/login", data={"username": email, "password": password})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Latency summary in milliseconds"""
+    return {
+        "count": len(samples),
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "max_ms": (max(samples) if samples else 0.0) * 1000,
+    }
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+
+
+# metrics gated by the baseline comparison: latencies/costs must not grow, throughput must not shrink
+LOWER_IS_BETTER = ("p50_ms", "p95_ms", "ns_per_op")
+HIGHER_IS_BETTER = ("throughput_per_s",)
+
+
+def flatten(result: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    """{"login": {"p95_ms": 3}} -> {"login.p95_ms": 3}"""
+    flat = {}
+    for key, value in result.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)):
+            flat[name] = float(value)
+    return flat
+
+
+def compare_to_baseline(result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regressions beyond `tolerance` (0.25 = 25%) of the gated metrics present in both runs, plus any new errors"""
+    current, previous = flatten(result), flatten(baseline)
+    regressions = []
+    for name, before in previous.items():
+        after = current.get(name)
+        if after is None:
+            continue
+        metric = name.rsplit(".", 1)[-1]
+        if metric == "errors":
+            if after > before:
+                regressions.append(f"{name}: {before:.0f} -> {after:.0f}")
+            continue
+        if before <= 0:
+            continue
+        change = f"{before:.3f} -> {after:.3f} ({(after / before - 1) * 100:+.0f}%)"
+        if metric in LOWER_IS_BETTER and after > before * (1 + tolerance):
+            regressions.append(f"{name}: {change}")
+        elif metric in HIGHER_IS_BETTER and after < before * (1 - tolerance):
+            regressions.append(f"{name}: {change}")
+    return regressions
+
+
+def environment() -> Dict[str, Any]:
+    """Where a result was measured, baselines only compare meaningfully on the same kind of setup"""
+    from db.session import engine
+    from services.hashing_service import current_rounds
+    return {
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "database": engine.dialect.name,
+        "bcrypt_rounds": current_rounds(),
+    }
+
+
+def environment_differences(result: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """Fields of the "environment" blocks that differ, a baseline without one differs in everything"""
+    current, previous = result.get("environment", {}), baseline.get("environment")
+    if previous is None:
+        return ["environment (not recorded in the baseline)"]
+    return [
+        f"{name}: {previous.get(name)!r} -> {current.get(name)!r}"
+        for name in sorted(set(current) | set(previous))
+        if current.get(name) != previous.get(name)
+    ]
+
+
+def report(
+    result: Dict[str, Any],
+    baseline_path: Optional[str],
+    save_baseline: Optional[str],
+    tolerance: float,
+    ignore_environment: bool = False,
+) -> int:
+    """
+    Print the result, optionally store it / gate it against a stored baseline, returns the exit code
+    A baseline measured on another setup (cpus, bcrypt cost, database...) can't gate this run: exit code 2
+    """
+    print(json.dumps(result, indent=2))
+    if save_baseline:
+        with open(save_baseline, "w") as handle:
+            json.dump(result, handle, indent=2, sort_keys=True)
+    if not baseline_path:
+        return 0
+    with open(baseline_path) as handle:
+        baseline = json.load(handle)
+    differences = environment_differences(result, baseline)
+    if differences:
+        for line in differences:
+            print(f"ENVIRONMENT {line}")
+        if not ignore_environment:
+            print(f"{baseline_path} was recorded on another setup, not comparing "
+                  "(record one here with --save-baseline, or pass --ignore-environment)")
+            return 2
+    regressions = compare_to_baseline(result, baseline, tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if not regressions:
+        print(f"No regressions against {baseline_path} (tolerance {tolerance:.0%})")
+    return 1 if regressions else 0
+
+
+def add_baseline_arguments(parser) -> None:
+    parser.add_argument("--baseline", help="JSON result of an earlier run, regressions beyond --tolerance fail the run")
+    parser.add_argument("--save-baseline", help="write this run's result as a baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression (default 0.25)")
+    parser.add_argument("--ignore-environment", action="store_true",
+                        help="compare against a baseline recorded on a different setup anyway")
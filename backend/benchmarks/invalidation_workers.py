@@ -0,0 +1,149 @@
+"""
+Multi-process check of the cache invalidation bus.
+Starts --workers processes, each booting main.app (lifespan included) against one shared database
+(a fresh SQLite file unless DATABASE_URL_TEST is set, which postgres needs), with the repository
+row cache on and the given --transport. The parent drives them over pipes: every worker caches
+two sessions, worker 0 logs one out and signs the user out everywhere, then every other worker
+is polled until it rejects the tokens, which measures how long they served stale cached state.
+tests/test_invalidation_bus.py runs it with two workers on every test run.
+
+    python -m benchmarks.invalidation_workers                    # unix sockets, exits 1 if any worker stays stale
+    python -m benchmarks.invalidation_workers --transport none   # what happens without the bus
+    DATABASE_URL_TEST=postgresql+asyncpg://... python -m benchmarks.invalidation_workers --transport postgres
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+PASSWORD = "benchmark-password"
+
+
+def worker_main(conn, env: Dict[str, str]) -> None:
+    os.environ.update(env)  # before the app (and its settings) are imported
+    asyncio.run(_serve(conn))
+
+
+async def _serve(conn) -> None:
+    from benchmarks.harness import app_client
+
+    loop = asyncio.get_running_loop()
+    async with app_client() as client:
+        conn.send("ready")
+        while True:
+            # recv in a thread, the loop has to keep reading invalidations meanwhile
+            command = await loop.run_in_executor(None, conn.recv)
+            if command is None:
+                break
+            method, path, kwargs = command
+            response = await client.request(method, path, **kwargs)
+            conn.send((response.status_code, response.json() if response.content else None))
+
+
+class Worker:
+    def __init__(self, index: int, env: Dict[str, str]):
+        self.index = index
+        self.conn, child = multiprocessing.Pipe()
+        self.process = multiprocessing.get_context("spawn").Process(target=worker_main, args=(child, env), daemon=True)
+        self.process.start()
+
+    def wait_ready(self, timeout: float = 60) -> None:
+        if not self.conn.poll(timeout) or self.conn.recv() != "ready":
+            raise RuntimeError(f"worker {self.index} didn't start")
+
+    def request(self, method: str, path: str, **kwargs):
+        self.conn.send((method, path, kwargs))
+        return self.conn.recv()
+
+    def stop(self) -> None:
+        self.conn.send(None)
+        self.process.join(10)
+
+
+def wait_rejected(worker: Worker, headers: Dict[str, str], timeout: float) -> Optional[float]:
+    """ms until `worker` answers /me with 401, None if it still accepts the token after `timeout`"""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        status, _ = worker.request("GET", "/me", headers=headers)
+        if status == 401:
+            return (time.perf_counter() - start) * 1000
+        time.sleep(0.001)
+    return None
+
+
+def run(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="tma-invalidation-")
+    env = {
+        "DATABASE_URL_TEST": os.environ.get("DATABASE_URL_TEST") or f"sqlite+aiosqlite:///{os.path.join(workdir, 'shared.db')}",
+        "REPOSITORY_CACHE_BACKEND": "memory",
+        "INVALIDATION_BUS": "" if args.transport == "none" else args.transport,
+        "INVALIDATION_SOCKET_DIR": os.path.join(workdir, "sockets"),
+        "PASSWORD_HASH_ROUNDS": "4",
+        "LOG_LEVEL": "WARNING",
+    }
+    # the first worker creates the tables, the others start once it is up
+    workers = [Worker(0, env)]
+    workers[0].wait_ready()
+    workers += [Worker(index, env) for index in range(1, args.workers)]
+    for worker in workers[1:]:
+        worker.wait_ready()
+
+    try:
+        writer, others = workers[0], workers[1:]
+        user = {"email": "bus@example.com", "username": "bususer", "password": PASSWORD}
+        writer.request("POST", "/register/user", json=user)
+
+        def login() -> Dict[str, str]:
+            status, body = writer.request("POST", "/login", data={"username": user["email"], "password": PASSWORD})
+            assert status == 200, body
+            return {"Authorization": f"Bearer {body['access_token']}"}
+
+        logged_out, signed_out = login(), login()
+        for worker in workers:
+            for headers in (logged_out, signed_out):
+                status, _ = worker.request("GET", "/me", headers=headers)
+                assert status == 200, f"worker {worker.index} rejected a fresh token"
+
+        results: Dict[str, List[Optional[float]]] = {}
+        # revocation: the others must drop that cached token and see the jti in their filters
+        writer.request("POST", "/logout", headers=logged_out, json={})
+        results["logout"] = [wait_rejected(worker, logged_out, args.timeout) for worker in others]
+        # logout-all bumps token_version: cached tokens and the cached user row must both go
+        writer.request("POST", "/logout-all", headers=signed_out)
+        results["logout_all"] = [wait_rejected(worker, signed_out, args.timeout) for worker in others]
+    finally:
+        for worker in workers:
+            worker.stop()
+
+    return {
+        "transport": args.transport,
+        "workers": args.workers,
+        **{
+            scenario: {
+                "propagation_ms": [round(ms, 3) if ms is not None else None for ms in timings],
+                "stale_workers": sum(ms is None for ms in timings),
+            }
+            for scenario, timings in results.items()
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--transport", choices=["unix", "postgres", "none"], default="unix")
+    parser.add_argument("--timeout", type=float, default=2.0, help="seconds a worker may keep accepting a dead token")
+    args = parser.parse_args()
+    result = run(args)
+    print(json.dumps(result, indent=2))
+    stale = sum(result[scenario]["stale_workers"] for scenario in ("logout", "logout_all"))
+    sys.exit(1 if stale and args.transport != "none" else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Synthetic data for the benchmarks: bulk inserts users, roles and permissions straight
+through Core, skipping per-row bcrypt (every row shares one precomputed hash).
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import delete, func, insert, select
+
+from benchmarks.harness import ensure_throwaway_database
+from db.session import SessionLocal, init_db
+from models.users import User
+from models.role import Role
+from models.permission import Permission
+from models.role_permission import role_permission
+from models.user_role import user_role
+
+SEED_HASH = "$2b$04$0123456789012345678901uKo8a.1lHZOGLMbkZMOzIH8pP6rjCnC"
+ADMIN_ROLE = "admin"
+
+
+async def password_hash_for(password: str) -> str:
+    """One real hash at the configured cost, shared by all seeded rows so logins work and don't trigger rehashes"""
+    from services.hashing_service import password_hasher
+    return await password_hasher.hash(password)
+
+
+async def seed_users(rows: int, batch_size: int = 10_000, password_hash: Optional[str] = None) -> int:
+    """
+    Insert synthetic users (user{i}@example.com) until the table holds `rows` rows, returns the final count
+    Without `password_hash` the rows get a placeholder nobody can log in with
+    """
+    ensure_throwaway_database()
+    await init_db()
+    async with SessionLocal() as session:
+        existing = (await session.execute(select(func.count()).select_from(User))).scalar_one()
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        for offset in range(existing, rows, batch_size):
+            batch = [
+                {
+                    "email": f"user{i}@example.com",
+                    "username": f"user{i}",
+                    "hashed_password": password_hash or SEED_HASH,
+                    "is_active": i % 10 != 0,
+                    "is_superuser": False,
+                    "created_at": start + timedelta(seconds=i),
+                    "updated_at": start + timedelta(seconds=i),
+                }
+                for i in range(offset, min(offset + batch_size, rows))
+            ]
+            await session.execute(insert(User), batch)
+            await session.commit()
+        return max(existing, rows)
+
+
+async def seed_roles(roles: int, permissions_per_role: int, admins: int, roles_per_user: int) -> dict:
+    """
+    `roles` roles with `permissions_per_role` permissions each, the first role is "admin" and goes
+    to the first `admins` active users (user1, user2, ... since every tenth user is seeded inactive),
+    every other user gets `roles_per_user` of the remaining roles.
+    Replaces earlier role assignments, so reruns with other parameters start clean.
+    """
+    ensure_throwaway_database()
+    await init_db()
+    async with SessionLocal() as session:
+        await session.execute(delete(user_role))
+        await session.execute(delete(role_permission))
+        await session.execute(delete(Role))
+        await session.execute(delete(Permission))
+        role_names = [ADMIN_ROLE] + [f"role{i}" for i in range(1, roles)]
+        role_ids = list((await session.execute(
+            insert(Role).returning(Role.id), [{"name": name} for name in role_names]
+        )).scalars())
+        permission_names = [f"perm{r}:{p}" for r in range(roles) for p in range(permissions_per_role)]
+        permission_ids = list((await session.execute(
+            insert(Permission).returning(Permission.id),
+            [{"name": name, "bit": bit} for bit, name in enumerate(permission_names)]
+        )).scalars()) if permission_names else []
+        if permission_ids:
+            await session.execute(insert(role_permission), [
+                {"role_id": role_ids[index // permissions_per_role], "permission_id": permission_id}
+                for index, permission_id in enumerate(permission_ids)
+            ])
+
+        users = (await session.execute(select(User.id, User.is_active).order_by(User.id))).all()
+        admin_ids = [user_id for user_id, is_active in users if is_active][:admins]
+        assignments = [{"user_id": user_id, "role_id": role_ids[0]} for user_id in admin_ids]
+        others = role_ids[1:]
+        if others and roles_per_user:
+            admin_set = set(admin_ids)
+            regular_ids = [user_id for user_id, _ in users if user_id not in admin_set]
+            for position, user_id in enumerate(regular_ids):
+                for offset in range(min(roles_per_user, len(others))):
+                    assignments.append({"user_id": user_id, "role_id": others[(position + offset) % len(others)]})
+        for start in range(0, len(assignments), 10_000):
+            await session.execute(insert(user_role), assignments[start:start + 10_000])
+        await session.commit()
+
+    from services.permission_service import permission_registry
+    permission_registry.invalidate()
+    return {"roles": len(role_ids), "permissions": len(permission_ids), "role_assignments": len(assignments)}
@@ -0,0 +1,132 @@
+"""
+Check of request coalescing (repositories' SingleFlight): a burst of identical lookups must cost one query.
+Fires --concurrency simultaneous /me requests for one user with a cold token cache (every request has to
+load the user), then as many simultaneous logins, and counts the SELECTs that hit the user table.
+It also exercises SingleFlight on its own: an error reaches every waiter, a cancelled waiter leaves
+the others their result, and a cancelled leader hands the call over to one of its waiters.
+tests/test_single_flight.py asserts the same on every test run.
+
+    python -m benchmarks.single_flight                         # exits 1 unless each burst ran one user query
+    python -m benchmarks.single_flight --no-single-flight      # the same bursts without coalescing
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+PASSWORD = "benchmark-password"
+
+
+@contextmanager
+def user_selects(engine) -> Iterator[List[str]]:
+    """Statements SELECTing from the user table, appended as the engine runs them inside the block"""
+    from sqlalchemy import event
+
+    statements: List[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and ("FROM user" in statement or 'FROM "user"' in statement):
+            statements.append(statement)
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+
+async def bursts(concurrency: int) -> Dict[str, Dict[str, int]]:
+    from benchmarks.harness import app_client, register_and_login
+    from db.session import engine
+    from services.token_cache import token_cache
+
+    async with app_client() as client:
+        with user_selects(engine) as statements:
+            token = await register_and_login(client, "flight@example.com", "flightuser", PASSWORD)
+            headers = {"Authorization": f"Bearer {token}"}
+            result = {}
+
+            token_cache.clear()
+            statements.clear()
+            responses = await asyncio.gather(*(client.get("/me", headers=headers) for _ in range(concurrency)))
+            result["me"] = {
+                "requests": concurrency,
+                "ok": sum(response.status_code == 200 for response in responses),
+                "user_queries": len(statements),
+            }
+
+            statements.clear()
+            credentials = {"username": "flight@example.com", "password": PASSWORD}
+            responses = await asyncio.gather(*(client.post("/login", data=credentials) for _ in range(concurrency)))
+            result["login"] = {
+                "requests": concurrency,
+                "ok": sum(response.status_code == 200 for response in responses),
+                "user_queries": len(statements),
+            }
+    return result
+
+
+async def semantics() -> Dict[str, bool]:
+    from services.single_flight import SingleFlight
+
+    flights = SingleFlight()
+    checks = {}
+
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise LookupError("boom")
+    outcomes = await asyncio.gather(*(flights.do("key", failing) for _ in range(5)), return_exceptions=True)
+    checks["error_reaches_every_waiter"] = len(calls) == 1 and all(isinstance(o, LookupError) for o in outcomes)
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "value"
+    quitter = asyncio.ensure_future(flights.do("key", slow))
+    stayer = asyncio.ensure_future(flights.do("key", slow))
+    await asyncio.sleep(0.01)
+    quitter.cancel()
+    checks["cancelled_waiter_leaves_result_to_others"] = await stayer == "value" and quitter.cancelled()
+
+    runs = []
+
+    async def handed_over():
+        runs.append(1)
+        await asyncio.sleep(0.05)
+        return "value"
+    leader = asyncio.ensure_future(flights.do("key", handed_over))
+    await asyncio.sleep(0)
+    waiters = [asyncio.ensure_future(flights.do("key", handed_over)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    leader.cancel()
+    outcomes = await asyncio.gather(*waiters)
+    checks["cancelled_leader_hands_over"] = leader.cancelled() and outcomes == ["value"] * 3 and len(runs) == 2
+    return checks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--no-single-flight", action="store_true", help="run the bursts with REPOSITORY_SINGLE_FLIGHT=false")
+    args = parser.parse_args()
+    os.environ["REPOSITORY_SINGLE_FLIGHT"] = "false" if args.no_single_flight else "true"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("PASSWORD_HASH_ROUNDS", "4")  # the logins measure the lookup, not bcrypt
+    from benchmarks.harness import run
+
+    async def everything():
+        return {"single_flight": not args.no_single_flight, **await bursts(args.concurrency), "semantics": await semantics()}
+    result = run(everything())
+    print(json.dumps(result, indent=2))
+    if args.no_single_flight:
+        sys.exit(0)
+    coalesced = result["me"]["user_queries"] == 1 and result["login"]["user_queries"] == 1
+    sys.exit(0 if coalesced and all(result["semantics"].values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+"""
+Measure the bcrypt cost that fits the login latency budget on this machine.
+
+    python -m cli.calibrate_hash_rounds                  # PASSWORD_HASH_TARGET_MS, MIN_ROUNDS and MAX_ROUNDS
+    python -m cli.calibrate_hash_rounds --target-ms 300
+
+Run it once on the hardware the app runs on and set the printed PASSWORD_HASH_ROUNDS on every host,
+so all workers hash with (and upgrade to) the same cost.
+"""
+import argparse
+
+from services.hashing_service import calibrate_rounds
+from config import settings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print the bcrypt cost that fits a hashing time budget")
+    parser.add_argument("--target-ms", type=float, default=settings.PASSWORD_HASH_TARGET_MS)
+    parser.add_argument("--min-rounds", type=int, default=settings.PASSWORD_HASH_MIN_ROUNDS)
+    parser.add_argument("--max-rounds", type=int, default=settings.PASSWORD_HASH_MAX_ROUNDS)
+    args = parser.parse_args()
+    print(f"PASSWORD_HASH_ROUNDS={calibrate_rounds(args.target_ms, args.min_rounds, args.max_rounds)}")
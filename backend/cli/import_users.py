@@ -0,0 +1,47 @@
+"""
+Bulk user import from the command line.
+
+    python -m cli.import_users users.csv
+    python -m cli.import_users users.ndjson --batch-size 5000
+
+Uses the same UserImportService as POST /users/import.
+"""
+import argparse
+import asyncio
+
+from db.session import SessionLocal, dispose_engine, init_db
+from repositories.user_repository import UserRepository
+from services.hashing_service import import_password_hasher
+from services.user_import_service import UserImportService
+from config import settings
+
+
+async def main(path: str, format: str, batch_size: int) -> int:
+    await init_db()
+    try:
+        async with SessionLocal() as session:
+            service = UserImportService(UserRepository(session), batch_size=batch_size)
+            with open(path, encoding="utf-8-sig", newline="") as stream:
+                report = await service.import_users(stream, format)
+    except UnicodeDecodeError as e:
+        print(f"{path} is not UTF-8 text ({e.reason}), stopped there (batches before it were committed)")
+        return 1
+    finally:
+        import_password_hasher.shutdown()
+        await dispose_engine()
+    for error in report.errors:
+        print(f"line {error.line}: {error.field or '-'}: {error.message}")
+    if report.errors_truncated:
+        print("... more errors not shown")
+    print(f"created {report.created}, failed {report.failed}")
+    return 1 if report.failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import users from a CSV or NDJSON file")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, default=settings.USER_IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+    format = args.format or ("csv" if args.path.lower().endswith(".csv") else "ndjson")
+    raise SystemExit(asyncio.run(main(args.path, format, args.batch_size)))
@@ -10,10 +10,122 @@ class Settings:
     ALGORITHM : str = os.getenv("ALGORITHM")
     SECRET_KEY: str = os.getenv("SECRET_KEY")
     DATABASE_URL: str = os.getenv("DATABASE_URL_TEST")
+    # comma separated read replica URLs, reads are spread round-robin across them
+    DATABASE_REPLICA_URLS: list[str] = [
+        url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()
+    ]
     BACKEND_ORIGINS: list[str] = ["http://localhost:3000"]
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
 
+    # database connection pool (ignored for in-memory sqlite)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_STATEMENT_CACHE_SIZE: int = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))  # asyncpg prepared statements
+
+    # password hashing pool ("thread" or "process"), 0 workers/concurrency means cpu count
+    PASSWORD_HASH_EXECUTOR: str = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "0"))
+    PASSWORD_HASH_MAX_CONCURRENCY: int = int(os.getenv("PASSWORD_HASH_MAX_CONCURRENCY", "0"))
+    PASSWORD_HASH_MAX_QUEUE: int = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))
+
+    # bcrypt cost: fixed PASSWORD_HASH_ROUNDS (0 = passlib default), or with PASSWORD_HASH_CALIBRATE
+    # measured at startup as the highest cost in [MIN, MAX] whose hash fits PASSWORD_HASH_TARGET_MS.
+    # One worker per host measures, the others reuse its result from PASSWORD_HASH_CALIBRATION_FILE
+    # (default <tmp>/tma-<uid>/bcrypt-rounds) for CALIBRATION_MAX_AGE seconds. For several hosts run
+    # `python -m cli.calibrate_hash_rounds` once and set PASSWORD_HASH_ROUNDS everywhere instead.
+    # Hashes below the cost are rehashed in the background on the next successful login, stronger ones are kept.
+    PASSWORD_HASH_ROUNDS: int = int(os.getenv("PASSWORD_HASH_ROUNDS", "0"))
+    PASSWORD_HASH_CALIBRATE: bool = os.getenv("PASSWORD_HASH_CALIBRATE", "false").lower() == "true"
+    PASSWORD_HASH_TARGET_MS: float = float(os.getenv("PASSWORD_HASH_TARGET_MS", "250"))
+    PASSWORD_HASH_MIN_ROUNDS: int = int(os.getenv("PASSWORD_HASH_MIN_ROUNDS", "10"))
+    PASSWORD_HASH_MAX_ROUNDS: int = int(os.getenv("PASSWORD_HASH_MAX_ROUNDS", "15"))
+    PASSWORD_HASH_CALIBRATION_FILE: str = os.getenv("PASSWORD_HASH_CALIBRATION_FILE", "")
+    PASSWORD_HASH_CALIBRATION_MAX_AGE: float = float(os.getenv("PASSWORD_HASH_CALIBRATION_MAX_AGE", "86400"))
+
+    # registration: check email+username in one query before paying for bcrypt (the unique indexes are the real guard)
+    REGISTRATION_PRECHECK: bool = os.getenv("REGISTRATION_PRECHECK", "true").lower() == "true"
+
+    # bulk user import: rows per INSERT/commit, hashing processes (0 = cpu count), reported row errors
+    USER_IMPORT_BATCH_SIZE: int = int(os.getenv("USER_IMPORT_BATCH_SIZE", "1000"))
+    USER_IMPORT_HASH_WORKERS: int = int(os.getenv("USER_IMPORT_HASH_WORKERS", "0"))
+    USER_IMPORT_MAX_ERRORS: int = int(os.getenv("USER_IMPORT_MAX_ERRORS", "1000"))
+
+    # write-behind login tracking: buffered in memory, flushed every interval or once FLUSH_SIZE logins are pending
+    # (disabling it drops the login stats only, password hash upgrades are still written)
+    LOGIN_TRACKING_ENABLED: bool = os.getenv("LOGIN_TRACKING_ENABLED", "true").lower() == "true"
+    LOGIN_TRACKING_MAX_PENDING: int = int(os.getenv("LOGIN_TRACKING_MAX_PENDING", "10000"))
+    LOGIN_TRACKING_FLUSH_INTERVAL: float = float(os.getenv("LOGIN_TRACKING_FLUSH_INTERVAL", "5"))
+    LOGIN_TRACKING_FLUSH_SIZE: int = int(os.getenv("LOGIN_TRACKING_FLUSH_SIZE", "500"))
+
+    # in-memory Bloom filter in front of the revoked_token table
+    REVOCATION_FILTER_CAPACITY: int = int(os.getenv("REVOCATION_FILTER_CAPACITY", "100000"))
+    REVOCATION_FILTER_ERROR_RATE: float = float(os.getenv("REVOCATION_FILTER_ERROR_RATE", "0.001"))
+    # every SYNC_SECONDS a worker adds the rows other workers revoked meanwhile (bus or not), looking
+    # back SYNC_OVERLAP_SECONDS more for commits that landed late and clock skew between hosts
+    REVOCATION_FILTER_SYNC_SECONDS: float = float(os.getenv("REVOCATION_FILTER_SYNC_SECONDS", "5"))
+    REVOCATION_FILTER_SYNC_OVERLAP_SECONDS: float = float(os.getenv("REVOCATION_FILTER_SYNC_OVERLAP_SECONDS", "60"))
+
+    # pre-hash throttling: token bucket per client IP, sliding window per submitted email,
+    # state for at most RATE_LIMIT_MAX_KEYS keys (least recently seen evicted)
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_MAX_KEYS: int = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+    LOGIN_RATE_IP_BURST: int = int(os.getenv("LOGIN_RATE_IP_BURST", "20"))
+    LOGIN_RATE_IP_PER_MINUTE: float = float(os.getenv("LOGIN_RATE_IP_PER_MINUTE", "30"))
+    LOGIN_RATE_EMAIL_LIMIT: int = int(os.getenv("LOGIN_RATE_EMAIL_LIMIT", "10"))
+    LOGIN_RATE_EMAIL_WINDOW_SECONDS: float = float(os.getenv("LOGIN_RATE_EMAIL_WINDOW_SECONDS", "300"))
+    REGISTER_RATE_IP_BURST: int = int(os.getenv("REGISTER_RATE_IP_BURST", "5"))
+    REGISTER_RATE_IP_PER_MINUTE: float = float(os.getenv("REGISTER_RATE_IP_PER_MINUTE", "10"))
+
+    # GET /metrics (Prometheus text format): admins only, plus whoever sends METRICS_TOKEN as a bearer
+    # token (set it for the scraper, it can't log in)
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_TOKEN: str = os.getenv("METRICS_TOKEN", "")
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+
+    # per-request diagnostics: SQL statement counts with N+1 warnings for every request, and a sampling
+    # profiler for PROFILE_SAMPLE_RATE of requests or any "X-Profile: 1" request with an admin token,
+    # its folded stacks (flame graph input) go to PROFILE_OUTPUT_DIR (default: <tmp>/tma-profiles)
+    REQUEST_DIAGNOSTICS_ENABLED: bool = os.getenv("REQUEST_DIAGNOSTICS_ENABLED", "true").lower() == "true"
+    SQL_STATEMENTS_WARN_THRESHOLD: int = int(os.getenv("SQL_STATEMENTS_WARN_THRESHOLD", "20"))
+    SQL_REPEATED_STATEMENT_THRESHOLD: int = int(os.getenv("SQL_REPEATED_STATEMENT_THRESHOLD", "5"))
+    PROFILE_SAMPLE_RATE: float = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    PROFILE_INTERVAL_MS: float = float(os.getenv("PROFILE_INTERVAL_MS", "1"))
+    PROFILE_OUTPUT_DIR: str = os.getenv("PROFILE_OUTPUT_DIR", "")
+
+    # Cache-Control of the conditional (ETag/If-None-Match) user reads, "no-cache" = always revalidate,
+    # which polling clients do cheaply: an unchanged user/page is a bodiless 304
+    ME_CACHE_CONTROL: str = os.getenv("ME_CACHE_CONTROL", "private, no-cache")
+    USERS_CACHE_CONTROL: str = os.getenv("USERS_CACHE_CONTROL", "private, no-cache")
+
+    # opt-in read-through row cache for repository lookups by id/unique column: "" (off), "memory"
+    # (LRU per worker) or "sqlite" (one file shared by the workers on a host, REPOSITORY_CACHE_PATH,
+    # default <tmp>/tma-<uid>/repository-cache.db; the file must be ours, 0600, in a directory other users
+    # can't write). Writes evict on commit, TTL bounds anything missed.
+    REPOSITORY_CACHE_BACKEND: str = os.getenv("REPOSITORY_CACHE_BACKEND", "")
+    REPOSITORY_CACHE_MAX_ENTRIES: int = int(os.getenv("REPOSITORY_CACHE_MAX_ENTRIES", "10000"))
+    REPOSITORY_CACHE_TTL_SECONDS: float = float(os.getenv("REPOSITORY_CACHE_TTL_SECONDS", "30"))
+    REPOSITORY_CACHE_PATH: str = os.getenv("REPOSITORY_CACHE_PATH", "")
+    # opt-in: concurrent identical lookups by id/unique column (e.g. a burst of /me or logins for one user)
+    # share one query per worker, run by the first caller on its own session; requests that already wrote
+    # keep reading on their own
+    REPOSITORY_SINGLE_FLIGHT: bool = os.getenv("REPOSITORY_SINGLE_FLIGHT", "false").lower() == "true"
+
+    # cross-worker cache invalidation: "" (single worker), "unix" (datagram sockets in INVALIDATION_SOCKET_DIR,
+    # default <tmp>/tma-<uid>/invalidation, must be owned by the app's user and 0700; workers of one host)
+    # or "postgres" (LISTEN/NOTIFY on INVALIDATION_CHANNEL over INVALIDATION_DATABASE_URL, default the primary database)
+    INVALIDATION_BUS: str = os.getenv("INVALIDATION_BUS", "")
+    INVALIDATION_SOCKET_DIR: str = os.getenv("INVALIDATION_SOCKET_DIR", "")
+    INVALIDATION_CHANNEL: str = os.getenv("INVALIDATION_CHANNEL", "tma_invalidation")
+    INVALIDATION_DATABASE_URL: str = os.getenv("INVALIDATION_DATABASE_URL", "")
+
+    # verified access token cache, 0 entries disables it
+    TOKEN_CACHE_MAX_ENTRIES: int = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000"))
+    TOKEN_CACHE_TTL_SECONDS: int = int(os.getenv("TOKEN_CACHE_TTL_SECONDS", "60"))
+
     class Config:
         case_sensitive = True
         env_file = ".env"
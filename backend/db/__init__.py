@@ -1,3 +1,9 @@
-from .session import engine, SessionLocal, get_db
+from .session import engine, replica_engines, SessionLocal, new_replica_session, get_db, get_read_db, dispose_engine
+from .pool_metrics import pool_metrics
+from .unit_of_work import UnitOfWork, after_commit
 
-__all__ = ["engine", "SessionLocal", "get_db"]
\ No newline at end of file
+__all__ = [
+    "engine", "replica_engines", "SessionLocal", "new_replica_session",
+    "get_db", "get_read_db", "dispose_engine", "pool_metrics",
+    "UnitOfWork", "after_commit",
+]
\ No newline at end of file
@@ -0,0 +1,70 @@
+"""
+Schema upgrades that create_all can't do: it creates missing tables but never alters existing ones.
+Every step looks at the live schema first, so init_db runs them all on each startup and a database
+created by any earlier version of the app (or freshly by create_all) ends up with the same schema.
+"""
+import logging
+from typing import Sequence, Tuple
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateIndex
+from models.base_class import Base
+
+logger = logging.getLogger(__name__)
+
+# (table, columns) added to tables that already existed, in the order they were introduced
+ADDED_COLUMNS: Sequence[Tuple[str, Tuple[str, ...]]] = (
+    ("user", ("last_login", "login_count")),
+    ("user", ("token_version",)),
+    ("permission", ("bit",)),
+)
+
+
+def _add_columns(conn: Connection, table_name: str, column_names: Sequence[str]) -> None:
+    table = Base.metadata.tables[table_name]
+    existing = {column["name"] for column in inspect(conn).get_columns(table_name)}
+    preparer = conn.dialect.identifier_preparer
+    for name in column_names:
+        if name in existing:
+            continue
+        column = table.c[name]
+        ddl = f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} {column.type.compile(conn.dialect)}"
+        if column.server_default is not None:
+            ddl += f" DEFAULT {column.server_default.arg}"
+        if not column.nullable:
+            ddl += " NOT NULL"  # existing rows get the server default
+        conn.execute(text(ddl))
+        logger.info("Added column %s.%s", table_name, name)
+
+
+def _create_indexes(conn: Connection) -> None:
+    # create_all only indexes the tables it creates, indexes added to a model later come from here
+    # (IF NOT EXISTS rather than checkfirst: reflection doesn't report expression indexes such as lower())
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            conn.execute(CreateIndex(index, if_not_exists=True))
+
+
+def _create_search_indexes(conn: Connection) -> None:
+    # the substring search structures hang off the user table's after_create, which an existing table never fires
+    from models.users import USER_SEARCH_DDL, USER_SEARCH_FTS_TABLE
+    dialect = conn.dialect.name
+    created = dialect == "sqlite" and USER_SEARCH_FTS_TABLE not in inspect(conn).get_table_names()
+    for statement_dialect, statement in USER_SEARCH_DDL:
+        if statement_dialect == dialect:
+            conn.execute(text(statement))
+    if created:
+        # external content: index the rows that predate the table, the triggers keep up from here
+        conn.execute(text(f"INSERT INTO {USER_SEARCH_FTS_TABLE}({USER_SEARCH_FTS_TABLE}) VALUES ('rebuild')"))
+        logger.info("Created and backfilled %s", USER_SEARCH_FTS_TABLE)
+
+
+def upgrade_schema(conn: Connection) -> None:
+    """Bring tables created before the current models up to date (run after create_all, via run_sync)"""
+    tables = set(inspect(conn).get_table_names())
+    for table_name, column_names in ADDED_COLUMNS:
+        if table_name in tables:
+            _add_columns(conn, table_name, column_names)
+    _create_indexes(conn)
+    if "user" in tables:
+        _create_search_indexes(conn)
@@ -0,0 +1,84 @@
+import bisect
+import logging
+import time
+from typing import Dict, Tuple
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool
+
+
+class PoolMetrics:
+    """Connection pool counters plus a histogram of how long checkouts waited for a connection"""
+
+    BUCKETS: Tuple[float, ...] = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.wait_counts = [0] * (len(self.BUCKETS) + 1)  # last slot is +Inf
+        self.wait_sum = 0.0
+        self.checkouts = 0
+        self.timeouts = 0
+
+    def observe_wait(self, seconds: float) -> None:
+        self.wait_counts[bisect.bisect_left(self.BUCKETS, seconds)] += 1
+        self.wait_sum += seconds
+        self.checkouts += 1
+
+    def snapshot(self, pool: Pool) -> Dict:
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.BUCKETS + (float("inf"),), self.wait_counts):
+            cumulative += count
+            buckets["+Inf" if bound == float("inf") else str(bound)] = cumulative
+        snapshot = {
+            "pool_class": type(pool).__name__,
+            "checkouts_total": self.checkouts,
+            "checkout_timeouts_total": self.timeouts,
+            "checkout_wait_seconds": {
+                "buckets": buckets,
+                "sum": self.wait_sum,
+                "count": self.checkouts,
+            },
+        }
+        # only queue pools know about size/overflow
+        if hasattr(pool, "checkedout"):
+            snapshot.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow(),
+            })
+        return snapshot
+
+
+# one PoolMetrics per engine, keyed by the engine's pool_logging_name ("primary", "replica-0", ...)
+pool_metrics: Dict[str, PoolMetrics] = {}
+
+def get_pool_metrics(name: str) -> PoolMetrics:
+    metrics = pool_metrics.get(name)
+    if metrics is None:
+        metrics = pool_metrics[name] = PoolMetrics()
+    return metrics
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that times every checkout, including the wait for a free connection"""
+
+    def _do_get(self):
+        metrics = get_pool_metrics(self.logging_name or "primary")
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            metrics.timeouts += 1
+            raise
+        finally:
+            metrics.observe_wait(time.perf_counter() - start)
+
+
+# SQLAlchemy keeps its own "sqlalchemy.*" loggers at WARN unless configured, the subclass logs
+# under this module's name instead, hold it to the same default so pool dispose/recreate stays quiet
+_pool_logger = logging.getLogger(__name__)
+if _pool_logger.level == logging.NOTSET:
+    _pool_logger.setLevel(logging.WARNING)
@@ -1,7 +1,14 @@
+from itertools import cycle
+from typing import List, Optional
 from config import settings
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from models.base_class import Base
+from .migrations import upgrade_schema
+from .pool_metrics import InstrumentedAsyncQueuePool
+from metrics import DEPENDENCY_DURATION, timed
+from metrics.sql import instrument_engine, track_statements
 
 
 # pick a URL attribute from settings (handles common names)
@@ -14,17 +21,124 @@ _db_url = (
 if not _db_url:
     raise RuntimeError("Database URL not found in settings (expected DATABASE_URL or database_url)")
 
-engine = create_async_engine(_db_url, future=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, class_=AsyncSession)
+def _engine_options(url: str, name: str) -> tuple:
+    """Pool/driver settings for a database URL, returns (url, engine kwargs)"""
+    url = make_url(url)
+    options = {"pool_pre_ping": settings.DB_POOL_PRE_PING, "pool_logging_name": name}
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        # in-memory sqlite lives in a single connection, leave the default static pool alone
+        return url, options
+    options.update(
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+    )
+    if url.get_driver_name() == "asyncpg":
+        url = url.update_query_dict({"prepared_statement_cache_size": str(settings.DB_STATEMENT_CACHE_SIZE)})
+    return url, options
+
+_url, _options = _engine_options(_db_url, "primary")
+engine = create_async_engine(_url, future=True, **_options)
+# expire_on_commit=False: objects stay readable after commit without a refresh round-trip
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine, class_=AsyncSession)
+
+replica_engines: List[AsyncEngine] = []
+for _index, _replica_url in enumerate(settings.DATABASE_REPLICA_URLS):
+    _url, _options = _engine_options(_replica_url, f"replica-{_index}")
+    replica_engines.append(create_async_engine(_url, future=True, **_options))
+
+if settings.METRICS_ENABLED:
+    instrument_engine(engine, "primary")
+    for _index, _replica_engine in enumerate(replica_engines):
+        instrument_engine(_replica_engine, f"replica-{_index}")
+if settings.REQUEST_DIAGNOSTICS_ENABLED:
+    for _diagnosed_engine in [engine] + replica_engines:
+        track_statements(_diagnosed_engine)
+
+ReplicaSessionLocals = [
+    sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=replica_engine, class_=AsyncSession)
+    for replica_engine in replica_engines
+]
+_replica_cycle = cycle(ReplicaSessionLocals) if ReplicaSessionLocals else None
+
+class LazySession:
+    """
+    Stands in for an AsyncSession and only creates it on first use.
+    Requests served from in-memory state (cached tokens, rejected by a guard, ...)
+    never build a session, let alone check out a pooled connection
+    (the session itself connects on its first statement).
+    """
+
+    __slots__ = ("_factory", "_session")
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._session: Optional[AsyncSession] = None
+
+    @property
+    def started(self) -> bool:
+        return self._session is not None
+
+    @property
+    def session(self) -> AsyncSession:
+        if self._session is None:
+            self._session = self._factory()
+        return self._session
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    def __contains__(self, instance) -> bool:
+        return self._session is not None and instance in self._session
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+
+def new_replica_session() -> Optional[AsyncSession]:
+    """new session on the next replica (round-robin), None when no replicas are configured"""
+    if _replica_cycle is None:
+        return None
+    return next(_replica_cycle)()
 
 async def init_db():
-    """create all tables in the database"""
+    """create all tables in the database, then upgrade the ones an earlier version created"""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(upgrade_schema)
+    # sqlite files standing in for replicas (local testing) don't replicate DDL
+    for replica_engine in replica_engines:
+        if replica_engine.dialect.name == "sqlite":
+            async with replica_engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+                await conn.run_sync(upgrade_schema)
+
+async def dispose_engine():
+    """close every pooled connection (application shutdown)"""
+    await engine.dispose()
+    for replica_engine in replica_engines:
+        await replica_engine.dispose()
+
+_GET_DB_TIMER = DEPENDENCY_DURATION.labels("get_db")
 
 async def get_db():
-    async with SessionLocal() as session:
-        try:
-            yield session
-        finally:
-            await session.close()
\ No newline at end of file
+    """request session, created (and connected) lazily on first use"""
+    with timed(_GET_DB_TIMER):
+        session = LazySession(SessionLocal)
+    try:
+        yield session
+    finally:
+        await session.close()
+
+async def get_read_db():
+    """lazy replica session for read-only queries, yields None when there are no replicas"""
+    if _replica_cycle is None:
+        yield None
+        return
+    session = LazySession(next(_replica_cycle))
+    try:
+        yield session
+    finally:
+        await session.close()
\ No newline at end of file
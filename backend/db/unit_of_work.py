@@ -0,0 +1,44 @@
+from typing import Callable, List
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# session.info key holding callbacks to run once the transaction is committed
+AFTER_COMMIT = "after_commit"
+
+
+def after_commit(session: AsyncSession, callback: Callable[[], None]) -> None:
+    """Run `callback` after the session's current transaction commits (dropped on rollback)"""
+    session.info.setdefault(AFTER_COMMIT, []).append(callback)
+
+
+class UnitOfWork:
+    """
+    Transaction boundary around the request-scoped session from get_db.
+    Repositories only stage (add/flush/INSERT ... RETURNING), the service commits once
+    per use case, so several writes share one transaction and one fsync.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def flush(self) -> None:
+        await self.session.flush()
+
+    async def commit(self) -> None:
+        await self.session.commit()
+        callbacks: List[Callable[[], None]] = self.session.info.pop(AFTER_COMMIT, [])
+        for callback in callbacks:
+            callback()
+
+    async def rollback(self) -> None:
+        self.session.info.pop(AFTER_COMMIT, None)
+        await self.session.rollback()
+
+    async def __aenter__(self) -> "UnitOfWork":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        # leaving the block commits, an exception rolls everything back
+        if exc_type is None:
+            await self.commit()
+        else:
+            await self.rollback()
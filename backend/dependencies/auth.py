@@ -1,34 +1,54 @@
 from fastapi import Depends
 from services.security_service import oauth2_scheme, SecurityService
 # from repositories import UserRepository
-from .repositories import get_user_repository, UserRepository
-from models.users import User
+from .repositories import get_user_repository, get_unit_of_work, UserRepository
+from db.unit_of_work import UnitOfWork
+from services.token_cache import Principal
+from .context import get_request_context, RequestContext
+from metrics import DEPENDENCY_DURATION, timed
+
+_AUTHENTICATE_TIMER = DEPENDENCY_DURATION.labels("authenticate")
 
 async def get_auth_service(
-    user_repository: UserRepository = Depends(get_user_repository)
+    user_repository: UserRepository = Depends(get_user_repository),
+    uow: UnitOfWork = Depends(get_unit_of_work)
 ) -> SecurityService:
-    return SecurityService(user_repository)
+    return SecurityService(user_repository, uow)
 
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
+    context: RequestContext = Depends(get_request_context),
     auth_service: SecurityService = Depends(get_auth_service)
-) -> User:
-    return await auth_service.get_current_user(token)
+) -> Principal:
+    """Resolved once per request into the request context, cached tokens never touch the session"""
+    if context.principal is None:
+        with timed(_AUTHENTICATE_TIMER):
+            context.principal = await auth_service.get_current_user(token)
+    return context.principal
 
 async def get_current_active_user(
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     auth_service: SecurityService = Depends(get_auth_service)
-) -> User:
+) -> Principal:
     return await auth_service.get_current_active_user(current_user)
 
 async def get_current_active_admin(
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_user),
     auth_service: SecurityService = Depends(get_auth_service)
-) -> User:
+) -> Principal:
     return await auth_service.get_current_active_admin(current_user)
 
 async def get_current_superuser(
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_user),
     auth_service: SecurityService = Depends(get_auth_service)
-) -> User:
-    return await auth_service.get_current_superuser(current_user)
\ No newline at end of file
+) -> Principal:
+    return await auth_service.get_current_superuser(current_user)
+
+def require_permissions(*permission_names: str):
+    """Route guard factory: Depends(require_permissions("users:read", ...))"""
+    async def permission_guard(
+        current_user: Principal = Depends(get_current_active_user),
+        auth_service: SecurityService = Depends(get_auth_service)
+    ) -> Principal:
+        return await auth_service.require_permissions(current_user, *permission_names)
+    return permission_guard
\ No newline at end of file
@@ -0,0 +1,69 @@
+import hashlib
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+from fastapi import Request, status
+from starlette.responses import Response
+from schemas.serialization import FastJSONResponse
+
+
+def _version(updated_at: Optional[datetime]) -> str:
+    return updated_at.strftime("%Y%m%d%H%M%S%f") if updated_at is not None else "0"
+
+def user_etag(user) -> str:
+    """Weak ETag of one user (ORM object, Principal or row), it changes whenever updated_at does"""
+    return f'W/"{user.id}.{_version(user.updated_at)}"'
+
+def page_etag(items: Iterable[Dict[str, Any]], **meta: Any) -> str:
+    """Weak ETag of a page of serialized users plus its paging metadata (cursor, total...)"""
+    digest = hashlib.blake2b(digest_size=12)
+    for item in items:
+        digest.update(f"{item['id']}.{_version(item['updated_at'])};".encode())
+    digest.update(repr(sorted(meta.items())).encode())
+    return f'W/"{digest.hexdigest()}"'
+
+def _opaque(tag: str) -> str:
+    # weak comparison (RFC 9110 13.1.2): W/"x" and "x" match
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+class ConditionalGet:
+    """
+    If-None-Match handling for one GET, built by `conditional_get`:
+    `respond(etag, content)` answers 304 without calling `content` when the client's copy is current,
+    otherwise renders content() as a FastJSONResponse, both carrying ETag and the route's Cache-Control
+    """
+
+    __slots__ = ("if_none_match", "headers")
+
+    def __init__(self, if_none_match: Optional[str], headers: Dict[str, str]):
+        self.if_none_match = if_none_match
+        self.headers = headers
+
+    def matches(self, etag: str) -> bool:
+        if not self.if_none_match:
+            return False
+        if self.if_none_match.strip() == "*":
+            return True
+        wanted = _opaque(etag)
+        return any(_opaque(tag) == wanted for tag in self.if_none_match.split(","))
+
+    def respond(self, etag: str, content: Callable[[], Any]) -> Response:
+        headers = {**self.headers, "ETag": etag}
+        if self.matches(etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return FastJSONResponse(content(), headers=headers)
+
+
+def conditional_get(cache_control: str, vary: Tuple[str, ...] = ("Authorization",)) -> Callable:
+    """
+    Dependency factory, one per route so each picks its Cache-Control, e.g.
+    `conditional: ConditionalGet = Depends(conditional_get(settings.ME_CACHE_CONTROL))`
+    """
+    headers = {"Vary": ", ".join(vary)} if vary else {}
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+
+    async def dependency(request: Request) -> ConditionalGet:
+        return ConditionalGet(request.headers.get("if-none-match"), headers)
+    return dependency
@@ -0,0 +1,29 @@
+from typing import Optional
+from fastapi import Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.session import get_db, get_read_db
+from services.token_cache import Principal
+
+
+class RequestContext:
+    """
+    Per-request state, also reachable as `request.state.context` from middleware and handlers:
+    the (lazy) primary/replica sessions and the principal once authentication resolved it
+    """
+
+    __slots__ = ("db", "read_db", "principal")
+
+    def __init__(self, db: AsyncSession, read_db: Optional[AsyncSession] = None):
+        self.db = db
+        self.read_db = read_db
+        self.principal: Optional[Principal] = None
+
+
+async def get_request_context(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    read_db: Optional[AsyncSession] = Depends(get_read_db)
+) -> RequestContext:
+    context = RequestContext(db, read_db)
+    request.state.context = context
+    return context
\ No newline at end of file
@@ -0,0 +1,21 @@
+from fastapi import Depends, Request
+from fastapi.security import OAuth2PasswordRequestForm
+from services.rate_limiter import rate_limiter, LOGIN_PER_IP, LOGIN_PER_EMAIL, REGISTER_PER_IP
+
+
+def _client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+async def limit_login_attempts(
+    request: Request,
+    form_data: OAuth2PasswordRequestForm = Depends()
+) -> None:
+    """Throttle /login per client IP and per submitted email, before any DB lookup or bcrypt verify"""
+    rate_limiter.check(
+        (("login:ip", _client_ip(request)), LOGIN_PER_IP),
+        (("login:email", form_data.username.strip().lower()), LOGIN_PER_EMAIL),
+    )
+
+async def limit_registrations(request: Request) -> None:
+    """Throttle /register/user per client IP, before the precheck query and bcrypt hash"""
+    rate_limiter.check((("register:ip", _client_ip(request)), REGISTER_PER_IP))
\ No newline at end of file
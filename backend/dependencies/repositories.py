@@ -1,9 +1,18 @@
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
-from db.session import get_db
+from typing import Optional
+from db.session import get_db, get_read_db
 from repositories.user_repository import UserRepository
+from db.unit_of_work import UnitOfWork
 
 
-async def get_user_repository(db: AsyncSession = Depends(get_db)) -> UserRepository:
-    """Dependency to get user repository"""
-    return UserRepository(db)
+async def get_user_repository(
+    db: AsyncSession = Depends(get_db),
+    read_db: Optional[AsyncSession] = Depends(get_read_db)
+) -> UserRepository:
+    """Dependency to get user repository (reads go to a replica when one is configured)"""
+    return UserRepository(db, read_db)
+
+async def get_unit_of_work(db: AsyncSession = Depends(get_db)) -> UnitOfWork:
+    """Dependency to get the request's unit of work (same session as the repositories)"""
+    return UnitOfWork(db)
@@ -1,11 +1,17 @@
 from fastapi import Depends
 from repositories.user_repository import UserRepository
-from .repositories import get_user_repository
+from .repositories import get_user_repository, get_unit_of_work
+from db.unit_of_work import UnitOfWork
 from services.user_service import UserService
 from services.security_service import SecurityService
+from services.user_import_service import UserImportService
 from dependencies.auth import get_auth_service
 
 
-async def get_user_service(user_repository: UserRepository = Depends(get_user_repository), security_service: SecurityService = Depends(get_auth_service) ) -> UserService:
+async def get_user_service(user_repository: UserRepository = Depends(get_user_repository), security_service: SecurityService = Depends(get_auth_service), uow: UnitOfWork = Depends(get_unit_of_work)) -> UserService:
     """Dependency to get user services"""
-    return UserService(user_repository,security_service)
\ No newline at end of file
+    return UserService(user_repository, security_service, uow)
+
+async def get_user_import_service(user_repository: UserRepository = Depends(get_user_repository)) -> UserImportService:
+    """Dependency to get the bulk user import service"""
+    return UserImportService(user_repository)
\ No newline at end of file
@@ -1,25 +1,91 @@
+import asyncio
+import logging
+import os
+from functools import partial
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
 from config import settings
 from routers.user_routers import router as user_router
 from routers.auth_router import router as auth_router
+from routers.metrics_router import router as metrics_router
 
 
-from db.session import init_db
+from db.session import init_db, SessionLocal, dispose_engine
+from repositories.role_repository import RoleRepository
+from services.permission_service import permission_registry
+from services.hashing_service import password_hasher, import_password_hasher, calibrate_rounds, set_rounds, shared_calibration
+from services.private_files import default_private_directory
+from services.login_tracker import login_tracker
+from services.revocation_service import revocation_store
+from services.invalidation_bus import invalidation_bus, install_handlers
+from repositories.token_repository import RevokedTokenRepository
+from db.unit_of_work import UnitOfWork
+from metrics.middleware import MetricsMiddleware
+from metrics.diagnostics import DiagnosticsMiddleware
+from metrics.collectors import install_collectors
+from schemas.serialization import FastJSONResponse
+
+logging.basicConfig(level=settings.LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    print("Application Starting Up...")
+    logger.info("Application starting up")
     await init_db()
-    print("Tables Created Succesfully!")
+    logger.info("Tables created")
+    if settings.PASSWORD_HASH_CALIBRATE:
+        rounds = await asyncio.to_thread(
+            shared_calibration,
+            settings.PASSWORD_HASH_CALIBRATION_FILE or os.path.join(default_private_directory(), "bcrypt-rounds"),
+            settings.PASSWORD_HASH_CALIBRATION_MAX_AGE,
+            partial(
+                calibrate_rounds,
+                settings.PASSWORD_HASH_TARGET_MS,
+                settings.PASSWORD_HASH_MIN_ROUNDS,
+                settings.PASSWORD_HASH_MAX_ROUNDS,
+            ),
+        )
+        set_rounds(rounds)
+        logger.info("bcrypt cost calibrated to %d rounds (%gms budget)", rounds, settings.PASSWORD_HASH_TARGET_MS)
+    async with SessionLocal() as session:
+        async with UnitOfWork(session):
+            await RoleRepository(session).assign_permission_bits()
+        await permission_registry.ensure_loaded(RoleRepository(session))
+        token_repository = RevokedTokenRepository(session)
+        async with UnitOfWork(session):
+            await token_repository.purge_expired()
+        await revocation_store.ensure_loaded(token_repository)
+    await login_tracker.start()
+    if invalidation_bus.enabled:
+        install_handlers(invalidation_bus)
+        await invalidation_bus.start()
+        logger.info("Cache invalidation bus listening (%s)", settings.INVALIDATION_BUS)
     yield
-    print("Application Shutting Down...")
+    logger.info("Application shutting down")
+    # flush buffered logins while the engine is still open (the flush publishes invalidations)
+    await login_tracker.stop()
+    await invalidation_bus.stop()
+    password_hasher.shutdown()
+    import_password_hasher.shutdown()
+    await dispose_engine()
+
 
+app = FastAPI(
+    lifespan=lifespan,
+    title=settings.PROJECT_NAME,
+    version=settings.PROJECT_VERSION,
+    default_response_class=FastJSONResponse,
+)
 
-app = FastAPI(lifespan=lifespan, title=settings.PROJECT_NAME, version=settings.PROJECT_VERSION)
+if settings.REQUEST_DIAGNOSTICS_ENABLED:
+    app.add_middleware(DiagnosticsMiddleware)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    install_collectors()
 
 app.include_router(auth_router)
 app.include_router(user_router)
+app.include_router(metrics_router)
 
 @app.get("/")
 async def read_root():
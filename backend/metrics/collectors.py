@@ -0,0 +1,109 @@
+from typing import Dict, List, Tuple
+from . import registry
+
+
+def _pool_lines() -> List[str]:
+    """Connection pool gauges and checkout wait histograms, from db.pool_metrics"""
+    from db.session import engine, replica_engines
+    from db.pool_metrics import get_pool_metrics
+
+    engines = [("primary", engine)] + [(f"replica-{index}", replica) for index, replica in enumerate(replica_engines)]
+    gauges = {"db_pool_size": "size", "db_pool_checked_out": "checked_out", "db_pool_overflow": "overflow"}
+    lines = [
+        "# HELP db_pool_checkout_wait_seconds Time waiting for a pooled connection",
+        "# TYPE db_pool_checkout_wait_seconds histogram",
+    ]
+    snapshots = [(name, get_pool_metrics(name).snapshot(db_engine.pool)) for name, db_engine in engines]
+    for name, snapshot in snapshots:
+        wait = snapshot["checkout_wait_seconds"]
+        for bound, cumulative in wait["buckets"].items():
+            lines.append(f'db_pool_checkout_wait_seconds_bucket{{engine="{name}",le="{bound}"}} {cumulative}')
+        lines.append(f'db_pool_checkout_wait_seconds_sum{{engine="{name}"}} {wait["sum"]}')
+        lines.append(f'db_pool_checkout_wait_seconds_count{{engine="{name}"}} {wait["count"]}')
+    lines += [
+        "# HELP db_pool_checkout_timeouts_total Checkouts that gave up after DB_POOL_TIMEOUT",
+        "# TYPE db_pool_checkout_timeouts_total counter",
+    ]
+    for name, snapshot in snapshots:
+        lines.append(f'db_pool_checkout_timeouts_total{{engine="{name}"}} {snapshot["checkout_timeouts_total"]}')
+    for metric, key in gauges.items():
+        lines += [f"# HELP {metric} Connection pool {key.replace('_', ' ')}", f"# TYPE {metric} gauge"]
+        for name, snapshot in snapshots:
+            if key in snapshot:
+                lines.append(f'{metric}{{engine="{name}"}} {snapshot[key]}')
+    return lines
+
+
+def _token_cache_stats() -> Dict[Tuple[str, ...], float]:
+    from services.token_cache import token_cache
+    return {
+        ("hits",): token_cache.hits,
+        ("misses",): token_cache.misses,
+        ("evictions",): token_cache.evictions,
+        ("entries",): len(token_cache),
+    }
+
+
+def _rate_limiter_stats() -> Dict[Tuple[str, ...], float]:
+    from services.rate_limiter import rate_limiter
+    return {
+        ("allowed",): rate_limiter.allowed,
+        ("rejected",): rate_limiter.rejected,
+        ("tracked_keys",): len(rate_limiter.store),
+    }
+
+
+def _login_tracker_stats() -> Dict[Tuple[str, ...], float]:
+    from services.login_tracker import login_tracker
+    return {
+        ("pending",): login_tracker.pending,
+        ("flushed",): login_tracker.flushed,
+        ("dropped",): login_tracker.dropped,
+        ("failed",): login_tracker.failed,
+    }
+
+
+def _repository_cache_stats() -> Dict[Tuple[str, ...], float]:
+    from repositories.cache import repository_cache
+    if repository_cache is None:
+        return {}
+    return {(name,): value for name, value in repository_cache.stats().items()}
+
+
+def _repository_flights_stats() -> Dict[Tuple[str, ...], float]:
+    from repositories.cache import repository_flights
+    if repository_flights is None:
+        return {}
+    return {(name,): value for name, value in repository_flights.stats().items()}
+
+
+def _invalidation_bus_stats() -> Dict[Tuple[str, ...], float]:
+    from services.invalidation_bus import invalidation_bus
+    if not invalidation_bus.enabled:
+        return {}
+    return {
+        ("published",): invalidation_bus.published,
+        ("received",): invalidation_bus.received,
+        ("failed",): invalidation_bus.failed,
+        ("dropped",): invalidation_bus.transport.dropped,
+    }
+
+
+def _password_hasher_stats() -> Dict[Tuple[str, ...], float]:
+    from services.hashing_service import password_hasher, current_rounds
+    return {("waiting",): password_hasher.waiting, ("rounds",): current_rounds()}
+
+
+def install_collectors() -> None:
+    """Scrape-time views of state the services already keep (called once from main)"""
+    if getattr(install_collectors, "installed", False):
+        return
+    install_collectors.installed = True
+    registry.add_collector(_pool_lines)
+    registry.gauge_function("token_cache", "Verified token cache counters and size", ("stat",), _token_cache_stats)
+    registry.gauge_function("rate_limiter", "Login/registration throttling counters", ("stat",), _rate_limiter_stats)
+    registry.gauge_function("login_tracker", "Write-behind login buffer state", ("stat",), _login_tracker_stats)
+    registry.gauge_function("repository_cache", "Repository row cache counters and size", ("stat",), _repository_cache_stats)
+    registry.gauge_function("repository_flights", "Coalesced repository lookups (started vs joined)", ("stat",), _repository_flights_stats)
+    registry.gauge_function("invalidation_bus", "Cross-worker cache invalidation events", ("stat",), _invalidation_bus_stats)
+    registry.gauge_function("password_hasher", "bcrypt pool queue and configured cost", ("stat",), _password_hasher_stats)
@@ -0,0 +1,180 @@
+"""
+Per-request diagnostics: SQL statement counting with N+1 detection for every request,
+and an opt-in sampling profiler that writes folded stacks (flame graph input).
+"""
+import logging
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Dict, Optional
+from jose import JWTError, jwt
+from starlette.types import ASGIApp, Receive, Scope, Send
+from config import settings
+from . import REQUEST_STATEMENTS
+
+logger = logging.getLogger(__name__)
+
+
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)|\(\s*%\(\w+\)s(?:\s*,\s*%\(\w+\)s)*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+@lru_cache(maxsize=1024)
+def statement_shape(statement: str) -> str:
+    """Statement with IN-lists collapsed, so the same query with different ids counts as one shape"""
+    return _IN_LIST.sub("(?+)", _WHITESPACE.sub(" ", statement).strip())
+
+
+class QueryLog:
+    """SQL statements issued while serving one request"""
+
+    __slots__ = ("count", "shapes")
+
+    def __init__(self):
+        self.count = 0
+        self.shapes: Dict[str, int] = {}
+
+    def record(self, statement: str) -> None:
+        self.count += 1
+        shape = statement_shape(statement)
+        self.shapes[shape] = self.shapes.get(shape, 0) + 1
+
+    def repeated(self, threshold: int) -> Dict[str, int]:
+        return {shape: count for shape, count in self.shapes.items() if count >= threshold}
+
+
+# the request's QueryLog, read by the engine hook installed with metrics.sql.track_statements
+current_queries: ContextVar[Optional[QueryLog]] = ContextVar("current_queries", default=None)
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for the event loop thread: a helper thread grabs the loop's
+    stack every `interval` seconds and counts identical stacks.
+    Other requests interleaved on the loop while the profiled one awaits show up too,
+    so profile a quiet instance (or many samples) before blaming a frame.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    @staticmethod
+    def _fold(frame) -> str:
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[self._fold(frame)] += 1
+
+    def start(self) -> "SamplingProfiler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+
+def _is_admin_token(authorization: str) -> bool:
+    """Signature-checked admin/superuser scope of a bearer access token (no DB lookup)"""
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    try:
+        claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM], issuer=settings.TOKEN_ISSUER)
+    except JWTError:
+        return False
+    return claims.get("type") == "access" and bool({"admin", "superuser"} & set(claims.get("scopes", ())))
+
+
+class DiagnosticsMiddleware:
+    """
+    Counts the SQL statements of every request and warns about too many of them or
+    about one statement shape repeated (the N+1 pattern of lazy loads in a loop).
+    Profiles a `sample_rate` fraction of requests, plus any request sending `X-Profile: 1`
+    with an admin bearer token, and logs where the time went.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.sample_rate = settings.PROFILE_SAMPLE_RATE
+        self.interval = settings.PROFILE_INTERVAL_MS / 1000
+        self.output_dir = settings.PROFILE_OUTPUT_DIR or os.path.join(tempfile.gettempdir(), "tma-profiles")
+        self.max_statements = settings.SQL_STATEMENTS_WARN_THRESHOLD
+        self.repeat_threshold = settings.SQL_REPEATED_STATEMENT_THRESHOLD
+        self._profiling = threading.Lock()
+
+    def _wants_profile(self, scope: Scope) -> bool:
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return True
+        headers = dict(scope.get("headers") or ())
+        if headers.get(b"x-profile") not in (b"1", b"true"):
+            return False
+        return _is_admin_token(headers.get(b"authorization", b"").decode("latin-1"))
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        queries = QueryLog()
+        reset_token = current_queries.set(queries)
+        profiler = None
+        # one profile at a time, the sampler sees the whole loop thread anyway
+        if self._wants_profile(scope) and self._profiling.acquire(blocking=False):
+            profiler = SamplingProfiler(threading.get_ident(), self.interval).start()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            elapsed = time.perf_counter() - start
+            current_queries.reset(reset_token)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            label = f"{scope['method']} {route}"
+            if profiler is not None:
+                stacks = profiler.stop()
+                self._profiling.release()
+                self._report_profile(label, elapsed, stacks)
+            REQUEST_STATEMENTS.labels(route).observe(queries.count)
+            self._check_queries(label, queries)
+
+    def _check_queries(self, label: str, queries: QueryLog) -> None:
+        if self.max_statements and queries.count > self.max_statements:
+            logger.warning("%s executed %d SQL statements (threshold %d)", label, queries.count, self.max_statements)
+        for shape, count in queries.repeated(self.repeat_threshold).items():
+            logger.warning("%s: possible N+1, statement ran %d times: %s", label, count, shape[:300])
+
+    def _report_profile(self, label: str, elapsed: float, stacks: Counter) -> None:
+        total = sum(stacks.values())
+        if not total:
+            logger.info("Profiled %s in %.1fms, too short for a sample", label, elapsed * 1000)
+            return
+        os.makedirs(self.output_dir, exist_ok=True)
+        safe_label = re.sub(r"[^A-Za-z0-9]+", "_", label).strip("_")
+        path = os.path.join(self.output_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{safe_label}-{os.getpid()}.folded")
+        with open(path, "w") as artifact:
+            # "frame;frame;frame count" lines, readable by flamegraph.pl and speedscope
+            artifact.writelines(f"{stack} {count}\n" for stack, count in stacks.most_common())
+        leaves = Counter()
+        for stack, count in stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        top = ", ".join(f"{frame} {count * 100 // total}%" for frame, count in leaves.most_common(5))
+        logger.info("Profiled %s in %.1fms, %d samples -> %s | top self: %s", label, elapsed * 1000, total, path, top)
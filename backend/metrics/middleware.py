@@ -0,0 +1,38 @@
+import time
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from . import HTTP_REQUEST_DURATION
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware timing every HTTP request.
+    The route label is the matched path template ("/users/{id}", not the raw path),
+    unmatched paths share one label so scanners can't blow up the series count.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.labels(
+                scope["method"],
+                getattr(route, "path", None) or "unmatched",
+                str(status_code),
+            ).observe(time.perf_counter() - start)
@@ -0,0 +1,41 @@
+import time
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from . import DB_QUERY_DURATION
+
+_START = "metrics_query_start"
+
+
+def instrument_engine(engine: AsyncEngine, name: str) -> None:
+    """Time every statement of `engine` through cursor execute events"""
+    histogram = DB_QUERY_DURATION.labels(name)
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault(_START, []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get(_START)
+        if starts:
+            histogram.observe(time.perf_counter() - starts.pop())
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(exception_context):
+        # failed statements are timed too, and must not leave their start behind
+        conn = exception_context.connection
+        starts = conn.info.get(_START) if conn is not None else None
+        if starts:
+            histogram.observe(time.perf_counter() - starts.pop())
+
+
+def track_statements(engine: AsyncEngine) -> None:
+    """Feed every statement of `engine` to the request's QueryLog (see metrics.diagnostics)"""
+    from .diagnostics import current_queries
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        queries = current_queries.get()
+        if queries is not None:
+            queries.record(statement)
@@ -0,0 +1,12 @@
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from .base_class import Base
+
+
+class LoginEvent(Base):
+    """One successful login, written in batches by services.login_tracker"""
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("user.id", ondelete="CASCADE"), index=True, nullable=False)
+    logged_in_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    ip_address = Column(String(45), nullable=True)
\ No newline at end of file
@@ -7,11 +7,14 @@ from .role_permission import role_permission
 class Permission(Base):
     id = Column(Integer, autoincrement=True, primary_key=True)
     name = Column(String, nullable=False, unique=True)
+    # position in the token permission mask: the lowest free one, given once (RoleRepository.assign_permission_bits)
+    # and kept for the permission's lifetime, so masks in issued tokens stay valid and small
+    bit = Column(Integer, nullable=True, unique=True, index=True)
 
     roles = relationship(
         "Role",
         secondary=role_permission,
         backref=backref("permissions", lazy=True),
-        lazy="subquery",
+        lazy="raise_on_sql",  # load per query with selectinload/joinedload when needed
     )
     ### the roles have many-to-many relation, one role can have many permission, one permission can assigned to many roles.
\ No newline at end of file
@@ -0,0 +1,13 @@
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from .base_class import Base
+
+
+class RevokedToken(Base):
+    """Revoked (or already rotated) token ids, kept until the token would have expired anyway"""
+
+    jti = Column(String(36), primary_key=True)
+    user_id = Column(Integer, ForeignKey("user.id", ondelete="CASCADE"), index=True, nullable=False)
+    token_type = Column(String(10), nullable=False)
+    expires_at = Column(DateTime, index=True, nullable=False)
+    revoked_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), index=True, nullable=False)
\ No newline at end of file
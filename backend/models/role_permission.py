@@ -4,6 +4,6 @@ from .base_class import Base
 role_permission = Table(
     "role_permission", 
     Base.metadata, 
-    Column("permission_id", ForeignKey("permission_id"), primary_key=True), 
-    Column("role_id", ForeignKey("role_id"), primary_key=True)
+    Column("permission_id", ForeignKey("permission.id"), primary_key=True), 
+    Column("role_id", ForeignKey("role.id"), primary_key=True)
 )
\ No newline at end of file
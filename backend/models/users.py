@@ -1,5 +1,5 @@
 from datetime import datetime, timezone
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, func
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, DDL, Index, event, func
 from sqlalchemy.orm import backref, relationship
 from .user_role import user_role
 from .base_class import Base
@@ -17,13 +17,29 @@ class User(Base):
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), 
                         onupdate=lambda: datetime.now(timezone.utc))
-    # last_login = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    # login bookkeeping, maintained in batches by services.login_tracker (not on the login request)
+    last_login = Column(DateTime, nullable=True)
+    login_count = Column(Integer, default=0, server_default="0", nullable=False)
+    # stamped into every token as `ver`, bumping it signs the user out of all sessions
+    token_version = Column(Integer, default=0, server_default="0", nullable=False)
 
+    # generated columns come back with the INSERT/UPDATE (RETURNING where supported) instead of a refresh
+    __mapper_args__ = {"eager_defaults": True}
+
+    # search support: lower() expression indexes serve case-insensitive exact and prefix (range) matches,
+    # created_at is indexed because it is the default sort of user search
+    __table_args__ = (
+        Index("ix_user_email_lower", func.lower(email)),
+        Index("ix_user_username_lower", func.lower(username)),
+        Index("ix_user_created_at", created_at),
+    )
+
+    # never loaded implicitly: ask for it per query (repository `options`), touching it unloaded raises
     roles = relationship(
         "Role",
         secondary=user_role,
         backref=backref("user", lazy=True),
-        lazy="subquery",
+        lazy="raise_on_sql",
     )
     
     # def verify_password(self, plain_password: str) -> bool:
@@ -31,4 +47,37 @@ class User(Base):
     
     # @staticmethod
     # def hash_password(password: str) -> str:
-    #     return pwd_context.hash(password)
\ No newline at end of file
+    #     return pwd_context.hash(password)
+
+
+# search indexes beyond __table_args__, created together with the user table (db.migrations adds them to existing ones)
+# postgres: lower(email)/lower(username) in the bytewise "C" collation for prefix ranges, trigram GIN indexes for substrings
+# sqlite: an external-content FTS5 table with the trigram tokenizer, kept in sync by triggers
+USER_SEARCH_FTS_TABLE = "user_search"
+USER_SEARCH_DDL = (
+    *(
+        ("postgresql", f'CREATE INDEX IF NOT EXISTS ix_user_{_column}_lower_c ON "user" ((lower({_column}) COLLATE "C"))')
+        for _column in ("email", "username")
+    ),
+    ("postgresql", "CREATE EXTENSION IF NOT EXISTS pg_trgm"),
+    *(
+        ("postgresql", f'CREATE INDEX IF NOT EXISTS ix_user_{_column}_trgm ON "user" USING gin (lower({_column}) gin_trgm_ops)')
+        for _column in ("email", "username")
+    ),
+    ("sqlite", f"""CREATE VIRTUAL TABLE IF NOT EXISTS {USER_SEARCH_FTS_TABLE}
+        USING fts5(email, username, content='user', content_rowid='id', tokenize='trigram')"""),
+    ("sqlite", f"""CREATE TRIGGER IF NOT EXISTS user_search_ai AFTER INSERT ON "user" BEGIN
+        INSERT INTO {USER_SEARCH_FTS_TABLE}(rowid, email, username) VALUES (new.id, new.email, new.username);
+    END"""),
+    ("sqlite", f"""CREATE TRIGGER IF NOT EXISTS user_search_ad AFTER DELETE ON "user" BEGIN
+        INSERT INTO {USER_SEARCH_FTS_TABLE}({USER_SEARCH_FTS_TABLE}, rowid, email, username)
+        VALUES ('delete', old.id, old.email, old.username);
+    END"""),
+    ("sqlite", f"""CREATE TRIGGER IF NOT EXISTS user_search_au AFTER UPDATE OF email, username ON "user" BEGIN
+        INSERT INTO {USER_SEARCH_FTS_TABLE}({USER_SEARCH_FTS_TABLE}, rowid, email, username)
+        VALUES ('delete', old.id, old.email, old.username);
+        INSERT INTO {USER_SEARCH_FTS_TABLE}(rowid, email, username) VALUES (new.id, new.email, new.username);
+    END"""),
+)
+for _dialect, _statement in USER_SEARCH_DDL:
+    event.listen(User.__table__, "after_create", DDL(_statement).execute_if(dialect=_dialect))
@@ -1,38 +1,267 @@
-from typing import TypeVar, Generic, List, Optional
+from typing import Any, Dict, TypeVar, Generic, List, Optional, Sequence, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy import inspect, select, tuple_
+from sqlalchemy.orm import DeclarativeBase, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.sql.base import ExecutableOption
+from db.unit_of_work import after_commit
+from services.invalidation_bus import invalidation_bus, ROWS
+from services.single_flight import SingleFlight
+from .cache import RepositoryCache
+from .pagination import encode_cursor, decode_cursor
 
 ModelType = TypeVar('ModelType', bound=DeclarativeBase)
 SchemaType = TypeVar('SchemaType')
 
+# session.info flag: once a request wrote through the primary, its reads stay there (read-your-writes)
+PRIMARY_PINNED = "primary_pinned"
+
+# loader options accepted by the read methods, e.g. (selectinload(User.roles),) or (load_only(User.id, User.email),)
+LoaderOptions = Sequence[ExecutableOption]
+
+# what a coalesced read hands to each caller: (class, loaded columns, loaded relationships as snapshots)
+Snapshot = Tuple[type, Dict[str, Any], Dict[str, Any]]
+
+def _snapshot(obj, seen: Optional[set] = None) -> Snapshot:
+    """Plain copy of whatever the query loaded into obj (and its loaded relationships), no session attached"""
+    seen = set() if seen is None else seen
+    seen.add(id(obj))
+    state = inspect(obj)
+    loaded = state.dict
+    columns = {attribute.key: loaded[attribute.key] for attribute in state.mapper.column_attrs if attribute.key in loaded}
+    relations = {}
+    for relationship in state.mapper.relationships:
+        if relationship.key not in loaded:
+            continue
+        value = loaded[relationship.key]
+        if relationship.uselist:
+            relations[relationship.key] = [_snapshot(item, seen) for item in value if id(item) not in seen]
+        elif value is None or id(value) not in seen:
+            relations[relationship.key] = _snapshot(value, seen) if value is not None else None
+    return type(obj), columns, relations
+
+def _detached(snapshot: Snapshot):
+    """Snapshot -> detached object with its identity (relationships included), ready for merge(load=False)"""
+    cls, columns, relations = snapshot
+    obj = inspect(cls).class_manager.new_instance()
+    for key, value in columns.items():
+        set_committed_value(obj, key, value)
+    for key, value in relations.items():
+        if isinstance(value, list):
+            value = [_detached(item) for item in value]
+        elif value is not None:
+            value = _detached(value)
+        set_committed_value(obj, key, value)
+    make_transient_to_detached(obj)
+    return obj
+
 class BaseRepository(Generic[ModelType, SchemaType]):
-    def __init__(self, model: ModelType, db: AsyncSession):
+    # with a RepositoryCache, unique columns (besides id) whose single-row lookups it serves
+    cached_lookups: Tuple[str, ...] = ()
+    # loader options the cache may serve anyway because they only narrow the columns (a full row covers them)
+    cached_options: Tuple[LoaderOptions, ...] = ()
+    # with a SingleFlight, further loader options whose concurrent identical lookups may share one query
+    # (their loaded attributes and relationships are copied into every caller's session)
+    coalesced_options: Tuple[LoaderOptions, ...] = ()
+    
+    def __init__(
+        self,
+        model: ModelType,
+        db: AsyncSession,
+        read_db: Optional[AsyncSession] = None,
+        cache: Optional[RepositoryCache] = None,
+        flights: Optional[SingleFlight] = None
+    ):
         self.model = model
         self.db = db
+        self.read_db = read_db
+        self.cache = cache
+        self.flights = flights
+    
+    @property
+    def reader(self) -> AsyncSession:
+        """Session for read-only queries: a replica when configured, the primary after any write"""
+        if self.read_db is None:
+            return self.db
+        if not getattr(self.db, "started", True):
+            # an untouched (lazy) primary session has nothing pinned or pending
+            return self.read_db
+        if self.db.info.get(PRIMARY_PINNED) or self.db.new or self.db.dirty or self.db.deleted:
+            return self.db
+        return self.read_db
+    
+    def pin_primary(self) -> None:
+        """Route every following read of this request to the primary"""
+        self.db.info[PRIMARY_PINNED] = True
+    
+    async def _attach(self, db_obj: ModelType) -> ModelType:
+        """Objects read from a replica belong to the replica session, writes need the primary's copy"""
+        if db_obj in self.db:
+            return db_obj
+        return await self.db.merge(db_obj)
+    
+    @staticmethod
+    def _scalars(result, options: LoaderOptions):
+        # joined eager loads repeat the parent row per child, collapse them
+        return result.unique().scalars() if options else result.scalars()
+    
+    def _reads_shared(self) -> bool:
+        # once the request wrote, it reads its own (uncommitted) rows from the database
+        db = self.db
+        if not getattr(db, "started", True):
+            return True
+        return not (db.info.get(PRIMARY_PINNED) or db.new or db.dirty or db.deleted)
+    
+    async def _get_one(self, column: str, value: Any, options: LoaderOptions = ()) -> Optional[ModelType]:
+        """
+        Row by id or a unique column, read through the row cache when one is configured.
+        With `flights`, concurrent identical lookups of the worker share one query
+        """
+        criterion = getattr(self.model, column) == value
+        cacheable = not options or any(options is known for known in self.cached_options)
+        cached = self.cache is not None and cacheable
+        coalesced = self.flights is not None and (
+            cacheable or any(options is known for known in self.coalesced_options)
+        )
+        if not (cached or coalesced) or not self._reads_shared():
+            result = await self.reader.execute(select(self.model).options(*options).where(criterion))
+            return self._scalars(result, options).first()
+        if cached:
+            row = self.cache.get_row(self.model, column, value)
+            if row is not None:
+                return await self._from_snapshot((self.model, row, {}))
+            ticket = self.cache.ticket()
+            # always the full row, whatever the caller's column subset, so it can serve every later lookup
+            options = ()
+        if not coalesced:
+            obj = (await self.reader.execute(select(self.model).where(criterion))).scalars().first()
+            if obj is not None:
+                self._fill(_snapshot(obj)[1], ticket)
+            return obj
+        reader, loaded = self.reader, []
+        
+        async def load() -> Optional[Snapshot]:
+            # runs on the leading caller's own session, the others get a copy of what it loaded
+            result = await reader.execute(select(self.model).options(*options).where(criterion))
+            obj = self._scalars(result, options).first()
+            if obj is None:
+                return None
+            loaded.append(obj)
+            snapshot = _snapshot(obj)
+            if cached:
+                self._fill(snapshot[1], ticket)
+            return snapshot
+        key = (self.model.__tablename__, column, value, id(options) if options else None)
+        snapshot = await self.flights.do(key, load)
+        if loaded:
+            return loaded[0]  # this caller led the flight, the object is already in its session
+        return await self._from_snapshot(snapshot) if snapshot is not None else None
+    
+    def _fill(self, row: Dict[str, Any], ticket: int) -> None:
+        # expired/deferred columns make it an incomplete row, not cached
+        if len(row) == len(inspect(self.model).column_attrs):
+            self.cache.put_row(self.model, row, self.cached_lookups, ticket)
+    
+    async def _from_snapshot(self, snapshot: Snapshot) -> ModelType:
+        """
+        Cached row or coalesced read -> persistent object of the reading session, without a query:
+        built detached with its identity, then merged with load=False
+        """
+        session = self.reader
+        cls, columns, relations = snapshot
+        if not relations:
+            existing = session.identity_map.get(inspect(cls).identity_key_from_primary_key((columns["id"],)))
+            if existing is not None and not inspect(existing).expired_attributes:
+                return existing
+        return await session.merge(_detached(snapshot), load=False)
+    
+    def _evict_after_commit(self, *ids: Any) -> None:
+        """
+        Once the current transaction commits: drop the rows from the row cache (this worker's and the others')
+        and let later lookups start their own read instead of joining one that began before the commit
+        """
+        if not ids or (self.cache is None and self.flights is None):
+            return
+        cache, flights, model = self.cache, self.flights, self.model
+        
+        def evict() -> None:
+            if flights is not None:
+                flights.forget()
+            if cache is not None:
+                cache.invalidate(model, *ids)
+                invalidation_bus.publish(ROWS, model.__tablename__, *ids)
+        after_commit(self.db, evict)
+    
+    async def get_by_id(self, id: int, options: LoaderOptions = ()) -> Optional[ModelType]:
+        return await self._get_one("id", id, options)
     
-    async def get_by_id(self, id: int) -> Optional[ModelType]:
-        result = await self.db.execute(select(self.model).where(self.model.id == id))
-        return result.scalars().first()
+    async def get_all(self, skip: int = 0, limit: int = 100, options: LoaderOptions = ()) -> List[ModelType]:
+        result = await self.reader.execute(select(self.model).options(*options).offset(skip).limit(limit))
+        return self._scalars(result, options).all()
     
-    async def get_all(self, skip: int = 0, limit: int = 100) -> List[ModelType]:
-        result = await self.db.execute(select(self.model).offset(skip).limit(limit))
-        return result.scalars().all()
+    async def get_page(
+        self,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        order_by: str = "id",
+        descending: bool = False,
+        filters: Sequence = (),
+        options: LoaderOptions = (),
+        columns: Sequence = (),
+    ) -> Tuple[List[ModelType], Optional[str]]:
+        """
+        Keyset (cursor) pagination ordered by an indexed column, ties broken by id
+        Returns (items, next_cursor), next_cursor is None on the last page
+        With `columns` (which must include id and the order_by column) items are plain rows, not ORM objects
+        Raises pagination.InvalidCursor for a bad or mismatched cursor
+        """
+        column = getattr(self.model, order_by)
+        pk = self.model.id
+        query = (select(*columns) if columns else select(self.model).options(*options)).where(*filters)
+        if cursor is not None:
+            value, last_id = decode_cursor(cursor, order_by)
+            if order_by == "id":
+                query = query.where(pk < last_id if descending else pk > last_id)
+            else:
+                key, after = tuple_(column, pk), tuple_(value, last_id)
+                query = query.where(key < after if descending else key > after)
+        if order_by == "id":
+            ordering = (pk.desc(),) if descending else (pk.asc(),)
+        else:
+            ordering = (column.desc(), pk.desc()) if descending else (column.asc(), pk.asc())
+        # one extra row tells us whether there is a next page without counting
+        result = await self.reader.execute(query.order_by(*ordering).limit(limit + 1))
+        items = list(result.all() if columns else self._scalars(result, options).all())
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            last = items[-1]
+            next_cursor = encode_cursor(order_by, getattr(last, order_by), last.id)
+        return items, next_cursor
     
+    # writes only stage changes in the session, the caller commits through db.unit_of_work.UnitOfWork
     async def create(self, obj_in: SchemaType) -> ModelType:
+        """INSERT (flushed so ids/defaults are available), not committed"""
+        self.pin_primary()
         db_obj = self.model(**obj_in.dict())
         self.db.add(db_obj)
-        await self.db.commit()
-        await self.db.refresh(db_obj)
+        await self.db.flush()
+        self._evict_after_commit(db_obj.id)
         return db_obj
     
     async def update(self, db_obj: ModelType, obj_in: SchemaType) -> ModelType:
+        """UPDATE (flushed), not committed"""
+        self.pin_primary()
+        db_obj = await self._attach(db_obj)
         for field, value in obj_in.dict(exclude_unset=True).items():
             setattr(db_obj, field, value)
-        await self.db.commit()
-        await self.db.refresh(db_obj)
+        await self.db.flush()
+        self._evict_after_commit(db_obj.id)
         return db_obj
     
     async def delete(self, db_obj: ModelType) -> None:
-        await self.db.delete(db_obj)
-        await self.db.commit()
\ No newline at end of file
+        """DELETE, not committed"""
+        self.pin_primary()
+        db_obj = await self._attach(db_obj)
+        self._evict_after_commit(db_obj.id)
+        await self.db.delete(db_obj)
\ No newline at end of file
@@ -0,0 +1,395 @@
+"""
+Second-level read-through cache for single-row repository lookups (by id or a unique column).
+Entries are whole rows as column dicts, never ORM objects (those belong to one session),
+under versioned keys "<namespace>:<table>:<version>:<column>:<value>". The id key holds the row,
+the unique-column keys only point at the id, so evicting one id key retires every way to reach it.
+The namespace tells databases sharing one backend apart, the version is a digest of the table's
+columns so a deploy that changes them never reads rows of the old shape from a shared backend.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from config import settings
+from services.private_files import default_private_directory, ensure_private_file
+from services.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryCacheBackend:
+    """In-process LRU with a TTL per entry, one per worker"""
+
+    def __init__(self, max_entries: int = 10_000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._generation = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.fills = 0
+        self.skipped_fills = 0
+
+    def generation(self) -> int:
+        return self._generation
+
+    def set_many(self, items: Iterable[Tuple[str, Any]], ttl: float, generation: int) -> None:
+        """Store the items unless a delete/clear happened since `generation` was read"""
+        if generation != self._generation:
+            self.skipped_fills += 1
+            return
+        for key, value in items:
+            self.set(key, value, ttl)
+        self.fills += 1
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, *keys: str) -> None:
+        self._generation += 1
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _encode(value: Any) -> str:
+    # data only (never pickle): whatever planted a row can't make the app run code by reading it
+    def tagged(obj: Any) -> Dict[str, str]:
+        if isinstance(obj, datetime):
+            return {"$dt": obj.isoformat()}
+        if isinstance(obj, date):
+            return {"$d": obj.isoformat()}
+        raise TypeError(f"{type(obj).__name__} values can't be cached")
+    return json.dumps(value, default=tagged, separators=(",", ":"))
+
+
+def _decode(data: str) -> Any:
+    def untagged(obj: Dict[str, Any]) -> Any:
+        if len(obj) == 1:
+            if "$dt" in obj:
+                return datetime.fromisoformat(obj["$dt"])
+            if "$d" in obj:
+                return date.fromisoformat(obj["$d"])
+        return obj
+    return json.loads(data, object_hook=untagged)
+
+
+class SqliteCacheBackend:
+    """
+    Cache shared by every worker process on the host, kept in a local SQLite file (WAL):
+    a stand-in for Redis/memcached with the same semantics, a delete in one worker is seen by all.
+    The file is created 0600 in a private directory (services.private_files) and values are JSON.
+    Reads run inline but never wait for a lock (WAL readers don't block, a busy database reads as a miss),
+    writes go through one background thread so a worker holding the write lock never stalls the event loop.
+    Keys with a delete still queued read as misses, so an eviction is effective as soon as it is issued.
+    The generation (bumped by every delete/clear of any worker, in the same transaction) lives in the
+    file too, so a fill that raced another worker's invalidation is dropped like a local one.
+    Over `max_entries` the entries closest to expiry go first (checked every `prune_every` writes).
+    """
+
+    def __init__(self, path: str, max_entries: int = 100_000, prune_every: int = 256):
+        self.path = ensure_private_file(path)
+        self.max_entries = max_entries
+        self.prune_every = prune_every
+        self.evictions = 0
+        self.expirations = 0
+        self.fills = 0
+        self.skipped_fills = 0
+        self._writes = 0
+        self._lock = threading.Lock()  # the reading connection, never held while waiting for the database
+        self._pending_lock = threading.Lock()
+        self._pending_deletes: Dict[str, int] = {}
+        self._pending_clears = 0
+        self._queued_bumps = 0
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="repository-cache")
+        self._write_conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=5.0)
+        self._write_conn.execute("PRAGMA journal_mode=WAL")
+        self._write_conn.execute("PRAGMA synchronous=OFF")
+        self._write_conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entry (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._write_conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_entry_expires_at ON cache_entry (expires_at)")
+        self._write_conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_generation (id INTEGER PRIMARY KEY CHECK (id = 0), value INTEGER NOT NULL)"
+        )
+        self._write_conn.execute("INSERT OR IGNORE INTO cache_generation (id, value) VALUES (0, 0)")
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=0)
+
+    def get(self, key: str) -> Optional[Any]:
+        if self._pending_clears or key in self._pending_deletes:
+            return None
+        try:
+            with self._lock:
+                row = self._conn.execute("SELECT value, expires_at FROM cache_entry WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error:
+            logger.warning("Repository cache read failed, treating %s as a miss", key, exc_info=True)
+            return None
+        if row is None:
+            return None
+        if row[1] <= time.time():
+            self._writer.submit(self._expire, key, row[1])
+            return None
+        try:
+            return _decode(row[0])
+        except ValueError:
+            logger.warning("Repository cache entry %s isn't valid JSON, treating it as a miss", key)
+            return None
+
+    def _expire(self, key: str, expires_at: float) -> None:
+        try:
+            if self._write_conn.execute(
+                "DELETE FROM cache_entry WHERE key = ? AND expires_at = ?", (key, expires_at)
+            ).rowcount:
+                self.expirations += 1
+        except sqlite3.Error:
+            pass  # still expired, the next reader or prune retries
+
+    def generation(self) -> int:
+        # the deletes/clears still queued land before any fill queued after this (one writer, FIFO)
+        queued = self._queued_bumps
+        try:
+            with self._lock:
+                return self._conn.execute("SELECT value FROM cache_generation WHERE id = 0").fetchone()[0] + queued
+        except sqlite3.Error:
+            return -1  # unknown, the fill this ticket is for gets dropped
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        self.set_many([(key, value)], ttl, None)
+
+    def set_many(self, items: Iterable[Tuple[str, Any]], ttl: float, generation: Optional[int]) -> None:
+        """Store the items unless a delete/clear (of any worker) happened since `generation` was read"""
+        try:
+            encoded = [(key, _encode(value)) for key, value in items]
+        except TypeError:
+            logger.warning("Repository cache can't store %s", [key for key, _ in items], exc_info=True)
+            return
+        self._writer.submit(self._set_many, encoded, time.time() + ttl, generation)
+
+    def _set_many(self, encoded: List[Tuple[str, str]], expires_at: float, generation: Optional[int]) -> None:
+        conn = self._write_conn
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                current = conn.execute("SELECT value FROM cache_generation WHERE id = 0").fetchone()[0]
+                if generation is not None and generation != current:
+                    self.skipped_fills += 1
+                    conn.execute("ROLLBACK")
+                    return
+                conn.executemany(
+                    "INSERT OR REPLACE INTO cache_entry (key, value, expires_at) VALUES (?, ?, ?)",
+                    [(key, data, expires_at) for key, data in encoded],
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            self.fills += 1
+            self._writes += 1
+            if self._writes % self.prune_every == 0:
+                self._prune()
+        except sqlite3.Error:
+            logger.warning("Repository cache write failed for %s", [key for key, _ in encoded], exc_info=True)
+
+    def _prune(self) -> None:
+        self.expirations += self._write_conn.execute("DELETE FROM cache_entry WHERE expires_at <= ?", (time.time(),)).rowcount
+        excess = self._write_conn.execute("SELECT COUNT(*) FROM cache_entry").fetchone()[0] - self.max_entries
+        if excess > 0:
+            self.evictions += self._write_conn.execute(
+                "DELETE FROM cache_entry WHERE key IN (SELECT key FROM cache_entry ORDER BY expires_at LIMIT ?)",
+                (excess,),
+            ).rowcount
+
+    def delete(self, *keys: str) -> None:
+        if not keys:
+            return
+        with self._pending_lock:
+            self._queued_bumps += 1
+            for key in keys:
+                self._pending_deletes[key] = self._pending_deletes.get(key, 0) + 1
+        self._writer.submit(self._delete, keys)
+
+    def _delete(self, keys: Tuple[str, ...]) -> None:
+        try:
+            self._bump_generation("DELETE FROM cache_entry WHERE key = ?", [(key,) for key in keys])
+        except sqlite3.Error:
+            # a lost delete serves a stale row until its TTL, make it loud
+            logger.error("Repository cache delete failed for %s", keys, exc_info=True)
+        finally:
+            with self._pending_lock:
+                self._queued_bumps -= 1
+                for key in keys:
+                    remaining = self._pending_deletes.pop(key, 1) - 1
+                    if remaining:
+                        self._pending_deletes[key] = remaining
+
+    def clear(self) -> None:
+        with self._pending_lock:
+            self._queued_bumps += 1
+            self._pending_clears += 1
+        self._writer.submit(self._clear)
+
+    def _clear(self) -> None:
+        try:
+            self._bump_generation("DELETE FROM cache_entry", [()])
+        except sqlite3.Error:
+            logger.error("Repository cache clear failed", exc_info=True)
+        finally:
+            with self._pending_lock:
+                self._queued_bumps -= 1
+                self._pending_clears -= 1
+
+    def _bump_generation(self, statement: str, parameters: List[tuple]) -> None:
+        conn = self._write_conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("UPDATE cache_generation SET value = value + 1 WHERE id = 0")
+            conn.executemany(statement, parameters)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def flush(self) -> None:
+        """Wait for the queued writes (tests, shutdown)"""
+        self._writer.submit(lambda: None).result()
+
+    def __len__(self) -> int:
+        try:
+            with self._lock:
+                return self._conn.execute("SELECT COUNT(*) FROM cache_entry").fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+
+class RepositoryCache:
+    """
+    Row cache used by BaseRepository (see its `cache` argument) in front of any backend with
+    get/set/set_many/delete/clear/generation/__len__.
+    A read captures `ticket()` (the backend's generation) before querying and passes it to `put_row`,
+    a row read while an invalidation happened is not stored (it may be the pre-commit version). With a
+    shared backend the generation is shared too, so that holds for invalidations by other workers.
+    """
+
+    def __init__(self, backend, ttl_seconds: float = 30, namespace: str = ""):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._versions: Dict[str, str] = {}
+
+    def version(self, table_name: str) -> str:
+        version = self._versions.get(table_name)
+        if version is None:
+            from models.base_class import Base
+            shape = ";".join(f"{column.name}:{column.type}" for column in Base.metadata.tables[table_name].columns)
+            version = self._versions[table_name] = hashlib.blake2b(shape.encode(), digest_size=4).hexdigest()
+        return version
+
+    def _key(self, table_name: str, column: str, value: Any) -> str:
+        return f"{self.namespace}:{table_name}:{self.version(table_name)}:{column}:{value}"
+
+    def key(self, model, column: str, value: Any) -> str:
+        return self._key(model.__tablename__, column, value)
+
+    def get_row(self, model, column: str, value: Any) -> Optional[Dict[str, Any]]:
+        """Cached column dict of the row whose `column` equals `value`"""
+        if column == "id":
+            row = self.backend.get(self.key(model, "id", value))
+        else:
+            row_id = self.backend.get(self.key(model, column, value))
+            row = self.backend.get(self.key(model, "id", row_id)) if row_id is not None else None
+            # the pointer outlives a change of the unique value, the row itself must still match
+            if row is not None and row.get(column) != value:
+                row = None
+        if row is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return row
+
+    def ticket(self) -> int:
+        return self.backend.generation()
+
+    def put_row(self, model, row: Dict[str, Any], lookups: Iterable[str], ticket: int) -> None:
+        """Store the row under its id key and a pointer per unique lookup column, all or nothing"""
+        items = [(self.key(model, "id", row["id"]), row)]
+        items += [(self.key(model, column, row[column]), row["id"]) for column in lookups if row.get(column) is not None]
+        self.backend.set_many(items, self.ttl_seconds, ticket)
+
+    def invalidate(self, model, *ids: Any) -> None:
+        """Evict rows by id (their lookup pointers then resolve to nothing)"""
+        self.invalidate_table(model.__tablename__, *ids)
+
+    def invalidate_table(self, table_name: str, *ids: Any) -> None:
+        """`invalidate` by table name, for events from other workers"""
+        self.invalidations += 1
+        self.backend.delete(*(self._key(table_name, "id", row_id) for row_id in ids))
+
+    def clear(self) -> None:
+        self.invalidations += 1
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "fills": self.backend.fills,
+            "skipped_fills": self.backend.skipped_fills,
+            "invalidations": self.invalidations,
+            "evictions": self.backend.evictions,
+            "expirations": self.backend.expirations,
+            "entries": len(self.backend),
+        }
+
+
+def build_repository_cache() -> Optional[RepositoryCache]:
+    """The configured cache, None when REPOSITORY_CACHE_BACKEND is empty (the default)"""
+    backend = settings.REPOSITORY_CACHE_BACKEND.lower()
+    if not backend:
+        return None
+    if backend == "memory":
+        store = MemoryCacheBackend(settings.REPOSITORY_CACHE_MAX_ENTRIES)
+    elif backend == "sqlite":
+        path = settings.REPOSITORY_CACHE_PATH or os.path.join(default_private_directory(), "repository-cache.db")
+        store = SqliteCacheBackend(path, settings.REPOSITORY_CACHE_MAX_ENTRIES)
+    else:
+        raise ValueError(f"Unknown REPOSITORY_CACHE_BACKEND {backend!r}, expected memory or sqlite")
+    namespace = hashlib.blake2b(settings.DATABASE_URL.encode(), digest_size=4).hexdigest()
+    return RepositoryCache(store, settings.REPOSITORY_CACHE_TTL_SECONDS, namespace)
+
+
+repository_cache = build_repository_cache()
+
+# shared by the repositories that coalesce concurrent lookups (BaseRepository `flights`), None when off
+repository_flights = SingleFlight() if settings.REPOSITORY_SINGLE_FLIGHT else None
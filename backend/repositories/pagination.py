@@ -0,0 +1,30 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Tuple
+
+
+class InvalidCursor(ValueError):
+    """Raised when a continuation token can't be decoded or doesn't match the requested ordering"""
+
+
+def encode_cursor(order_by: str, value: Any, last_id: int) -> str:
+    """Opaque continuation token: the sort key of the last row of the page"""
+    if isinstance(value, datetime):
+        value = {"dt": value.isoformat()}
+    raw = json.dumps([order_by, value, last_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, order_by: str) -> Tuple[Any, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        column, value, last_id = json.loads(raw)
+        if isinstance(value, dict):
+            value = datetime.fromisoformat(value["dt"])
+        last_id = int(last_id)
+    except (ValueError, TypeError, KeyError) as e:
+        raise InvalidCursor("Malformed cursor") from e
+    if column != order_by:
+        raise InvalidCursor("Cursor was issued for a different ordering")
+    return value, last_id
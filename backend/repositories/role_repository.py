@@ -0,0 +1,71 @@
+from itertools import count
+from typing import List, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update
+from .base_repository import BaseRepository
+from models.role import Role
+from models.permission import Permission
+from models.role_permission import role_permission
+from models.user_role import user_role
+from schemas.role import RoleCreate
+from services.permission_service import permission_registry
+from db.unit_of_work import after_commit
+from services.invalidation_bus import invalidation_bus, PERMISSIONS
+
+
+def _permissions_changed() -> None:
+    permission_registry.invalidate()
+    invalidation_bus.publish(PERMISSIONS)
+
+
+class RoleRepository(BaseRepository[Role, RoleCreate]):
+    def __init__(self, db: AsyncSession, read_db: Optional[AsyncSession] = None):
+        super().__init__(Role, db, read_db)
+    
+    async def get_role_permission_rows(self) -> List[Tuple[int, str, Optional[int], Optional[str]]]:
+        """(role_id, role_name, permission_bit, permission_name) for every role, permission columns are None for empty roles"""
+        result = await self.reader.execute(
+            select(Role.id, Role.name, Permission.bit, Permission.name)
+            .select_from(Role)
+            .outerjoin(role_permission, role_permission.c.role_id == Role.id)
+            .outerjoin(Permission, Permission.id == role_permission.c.permission_id)
+        )
+        return [tuple(row) for row in result.all()]
+    
+    async def get_role_ids_for_user(self, user_id: int) -> List[int]:
+        """Role ids straight from user_role, without loading Role rows"""
+        result = await self.reader.execute(
+            select(user_role.c.role_id).where(user_role.c.user_id == user_id)
+        )
+        return list(result.scalars().all())
+    
+    async def assign_permission_bits(self) -> int:
+        """Give permissions without a mask position the lowest free ones, returns how many, not committed"""
+        self.pin_primary()
+        rows = (await self.db.execute(select(Permission.id, Permission.bit).order_by(Permission.id))).all()
+        used = {bit for _, bit in rows if bit is not None}
+        free = (bit for bit in count() if bit not in used)
+        missing = [permission_id for permission_id, bit in rows if bit is None]
+        for permission_id, bit in zip(missing, free):
+            # the unique bit index turns a concurrent assignment of the same position into an IntegrityError
+            await self.db.execute(
+                update(Permission).where(Permission.id == permission_id, Permission.bit.is_(None)).values(bit=bit)
+            )
+        return len(missing)
+    
+    # any committed role change makes the compiled bitmasks stale
+    async def create(self, obj_in: RoleCreate) -> Role:
+        role = await super().create(obj_in)
+        await self.assign_permission_bits()
+        after_commit(self.db, _permissions_changed)
+        return role
+    
+    async def update(self, db_obj: Role, obj_in: RoleCreate) -> Role:
+        role = await super().update(db_obj, obj_in)
+        await self.assign_permission_bits()
+        after_commit(self.db, _permissions_changed)
+        return role
+    
+    async def delete(self, db_obj: Role) -> None:
+        await super().delete(db_obj)
+        after_commit(self.db, _permissions_changed)
@@ -0,0 +1,68 @@
+from datetime import datetime, timezone
+from typing import List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import delete, exists, insert, select
+from .base_repository import BaseRepository
+from models.revoked_token import RevokedToken
+from services.revocation_service import revocation_store
+from services.invalidation_bus import invalidation_bus, REVOKED
+from db.unit_of_work import after_commit
+
+
+class RevokedTokenRepository(BaseRepository[RevokedToken, dict]):
+    def __init__(self, db: AsyncSession, read_db: Optional[AsyncSession] = None):
+        super().__init__(RevokedToken, db, read_db)
+    
+    async def revoke(
+        self, jti: str, user_id: int, token_type: str, expires_at: datetime, ignore_existing: bool = False
+    ) -> None:
+        """
+        INSERT the jti, not committed
+        The primary key makes this the atomic "first use" check of refresh rotation:
+        a jti that is already there raises IntegrityError, unless ignore_existing (logout is idempotent)
+        """
+        statement = insert(RevokedToken.__table__).values(
+            jti=jti, user_id=user_id, token_type=token_type, expires_at=expires_at,
+            revoked_at=datetime.now(timezone.utc),
+        )
+        if ignore_existing:
+            try:
+                async with self.db.begin_nested():
+                    await self.db.execute(statement)
+            except IntegrityError:
+                return
+        else:
+            await self.db.execute(statement)
+        
+        def revoked() -> None:
+            revocation_store.add(jti)
+            invalidation_bus.publish(REVOKED, f"{user_id}:{jti}")
+        after_commit(self.db, revoked)
+    
+    async def is_revoked(self, jti: str) -> bool:
+        # always the primary, a lagging replica would let a just revoked token through
+        result = await self.db.execute(select(exists().where(RevokedToken.jti == jti)))
+        return bool(result.scalar())
+    
+    async def get_active_jtis(self) -> List[str]:
+        """jti of every revoked token that hasn't expired yet (filled into the in-memory filter)"""
+        result = await self.reader.execute(
+            select(RevokedToken.jti).where(RevokedToken.expires_at > datetime.now(timezone.utc))
+        )
+        return list(result.scalars().all())
+    
+    async def get_jtis_revoked_since(self, since: datetime) -> List[str]:
+        """Unexpired jtis revoked at or after `since` (the filter's periodic sync)"""
+        now = datetime.now(timezone.utc)
+        result = await self.reader.execute(
+            select(RevokedToken.jti).where(RevokedToken.revoked_at >= since, RevokedToken.expires_at > now)
+        )
+        return list(result.scalars().all())
+    
+    async def purge_expired(self) -> int:
+        """Expired tokens are rejected by their `exp` already, their rows can go, not committed"""
+        result = await self.db.execute(
+            delete(RevokedToken).where(RevokedToken.expires_at <= datetime.now(timezone.utc))
+        )
+        return result.rowcount or 0
@@ -1,87 +1,376 @@
 # from fastapi import Depends
 # from sqlalchemy.orm import Session
 # from db.session import get_db
+import re
+import time
 from datetime import datetime, timezone
-from typing import Optional, List
+from typing import AsyncIterator, Dict, Iterable, Optional, List, Sequence, Set, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, update
-from .base_repository import BaseRepository
-from models.users import User
-from schemas.users_scheme import UserCreate, UserUpdate
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import and_, bindparam, exists, insert, or_, select, func, update, text
+from sqlalchemy.orm import joinedload, load_only
+from .base_repository import BaseRepository, LoaderOptions
+from .cache import repository_cache, repository_flights
+from db.unit_of_work import after_commit
+from models.users import User, USER_SEARCH_FTS_TABLE
+from models.login_event import LoginEvent
+from models.role import Role
+from models.user_role import user_role
+from schemas.users_scheme import UserCreate, UserUpdate, UserSearch
+from services.hashing_service import password_hasher
+from services.token_cache import token_cache
+from services.invalidation_bus import invalidation_bus, USER
+
+# (active_only) -> (count, monotonic timestamp), shared by every repository instance of the worker
+_count_cache: Dict[bool, Tuple[int, float]] = {}
+
+# slim principal row for token authentication (see services.token_cache.Principal), roles stay unloaded
+PRINCIPAL_LOAD: LoaderOptions = (
+    load_only(User.id, User.email, User.username, User.is_active, User.is_superuser, User.created_at, User.updated_at,
+              User.token_version),
+)
+# login needs the hash and the role ids for the token claims, fetched with a single joined SELECT
+LOGIN_LOAD: LoaderOptions = (
+    load_only(User.id, User.hashed_password, User.is_active, User.token_version),
+    joinedload(User.roles).load_only(Role.id),
+)
+
+# columns written by the user export, never the password hash
+EXPORT_COLUMNS = (User.id, User.email, User.username, User.is_active, User.is_superuser, User.created_at, User.updated_at)
+
+# columns user search may sort by, each one is backed by an index
+SEARCH_SORT_COLUMNS = {"id": User.id, "created_at": User.created_at, "email": User.email, "username": User.username}
+
+def _prefix_range(column, prefix: str, dialect: str):
+    """lower(column) starts with prefix, as a range so the lower() index is used on every backend"""
+    expression = func.lower(column)
+    if dialect == "postgresql":
+        # a range is only a prefix match in bytewise order, a linguistic default collation (en_US.UTF-8)
+        # skips punctuation and "ab" would take in "a.bz", compared (and indexed, see USER_SEARCH_DDL) in "C"
+        expression = expression.collate("C")
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return and_(expression >= prefix, expression < upper)
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def _unique_lookups() -> Tuple[Dict[str, str], Dict[str, str]]:
+    # "user.email" -> "email" and "ix_user_email" -> "email", for the single-column unique keys of the user table
+    table = User.__table__
+    columns, indexes = {}, {}
+    for column in table.columns:
+        if column.unique:
+            columns[f"{table.name}.{column.name}"] = column.name
+    for index in table.indexes:
+        if index.unique and len(index.expressions) == 1 and index.expressions[0] in table.columns.values():
+            indexes[index.name] = index.expressions[0].name
+    return columns, indexes
+
+_UNIQUE_COLUMNS, _UNIQUE_INDEXES = _unique_lookups()
+_SQLITE_UNIQUE_FAILED = re.compile(r"UNIQUE constraint failed: ([\w.]+)$")
+_CONSTRAINT_NAME = re.compile(r"""(?:constraint|key) ["'`]([^"'`]+)["'`]""", re.IGNORECASE)
 
 class UserRepository(BaseRepository[User, UserCreate]):
-    def __init__(self, db: AsyncSession):
-        super().__init__(User, db)
+    cached_lookups = ("email", "username")
+    cached_options = (PRINCIPAL_LOAD,)
+    coalesced_options = (LOGIN_LOAD,)
     
-    async def get_by_email(self, email: str) -> Optional[User]:
+    def __init__(self, db: AsyncSession, read_db: Optional[AsyncSession] = None):
+        super().__init__(User, db, read_db, cache=repository_cache, flights=repository_flights)
+    
+    async def get_by_email(self, email: str, options: LoaderOptions = ()) -> Optional[User]:
         """Get user by email address"""
-        result = await self.db.execute(select(User).where(User.email == email))
-        return result.scalars().first()
+        return await self._get_one("email", email, options)
     
-    async def get_by_username(self, username: str) -> Optional[User]:
+    async def get_by_username(self, username: str, options: LoaderOptions = ()) -> Optional[User]:
         """Get user by username"""
-        result = await self.db.execute(select(User).where(User.username == username))
-        return result.scalars().first()
+        return await self._get_one("username", username, options)
     
     async def create_user_with_hashed_password(
         self, 
         user_in: UserCreate, 
         hashed_password: str
     ) -> User:
-        db_user = User(
-            email=user_in.email,
-            username=user_in.username,
-            hashed_password=hashed_password, 
-            is_active=getattr(user_in, 'is_active', True),
-            is_superuser=getattr(user_in, 'is_superuser', False)
+        """
+        INSERT ... RETURNING the whole row (ids and defaults come back with the insert, no refresh)
+        Not committed, raises IntegrityError on a duplicate email/username, see conflicting_field
+        """
+        self.pin_primary()
+        result = await self.db.scalars(
+            insert(User).returning(User),
+            [{
+                "email": user_in.email,
+                "username": user_in.username,
+                "hashed_password": hashed_password,
+                "is_active": getattr(user_in, 'is_active', True),
+                "is_superuser": getattr(user_in, 'is_superuser', False),
+            }]
+        )
+        return result.one()
+    
+    @staticmethod
+    def conflicting_field(error: IntegrityError) -> Optional[str]:
+        """
+        Which unique column an IntegrityError is about ("email", "username" or None), going by the
+        column or unique index the database names, never by the (user supplied) values in the message
+        """
+        orig = error.orig
+        # asyncpg reports the constraint (index) name on the driver exception
+        constraint = getattr(orig, "constraint_name", None) or getattr(orig.__cause__, "constraint_name", None)
+        if constraint is None:
+            message = str(orig)
+            failed = _SQLITE_UNIQUE_FAILED.search(message)
+            if failed:
+                # SQLite: "UNIQUE constraint failed: user.email"
+                return _UNIQUE_COLUMNS.get(failed.group(1))
+            # PostgreSQL: ... unique constraint "ix_user_email", MySQL: ... for key 'user.ix_user_email'
+            names = _CONSTRAINT_NAME.findall(message)
+            constraint = names[-1].rsplit(".", 1)[-1] if names else None
+        return _UNIQUE_INDEXES.get(constraint)
+    
+    async def find_taken(self, emails: Iterable[str], usernames: Iterable[str]) -> Tuple[Set[str], Set[str]]:
+        """Which of the given emails/usernames already exist, in one query"""
+        emails, usernames = list(emails), list(usernames)
+        if not emails and not usernames:
+            return set(), set()
+        result = await self.db.execute(
+            select(User.email, User.username).where(or_(User.email.in_(emails), User.username.in_(usernames)))
+        )
+        taken_emails, taken_usernames = set(), set()
+        for email, username in result.all():
+            taken_emails.add(email)
+            taken_usernames.add(username)
+        return taken_emails, taken_usernames
+    
+    async def bulk_insert(self, rows: List[dict]) -> None:
+        """Multi-row INSERT of prepared user rows, not committed (the caller owns the transaction)"""
+        self.pin_primary()
+        await self.db.execute(insert(User.__table__).values(rows))
+    
+    async def insert_one(self, row: dict) -> None:
+        """Single row insert inside a SAVEPOINT, raises IntegrityError without spoiling the outer transaction"""
+        self.pin_primary()
+        async with self.db.begin_nested():
+            await self.db.execute(insert(User.__table__).values(row))
+    
+    async def apply_login_stats(self, stats: List[dict]) -> None:
+        """
+        Batched `last_login`/`login_count` UPDATE, one executemany for many users
+        stats: [{"user_id": ..., "last_login": ..., "logins": ...}], not committed
+        updated_at is kept as is, logging in doesn't change the profile
+        """
+        if not stats:
+            return
+        table = User.__table__
+        await self.db.execute(
+            update(table)
+            .where(table.c.id == bindparam("user_id"))
+            .values(
+                last_login=bindparam("last_login"),
+                login_count=table.c.login_count + bindparam("logins"),
+                updated_at=table.c.updated_at,
+            ),
+            stats,
+        )
+        self._evict_after_commit(*(row["user_id"] for row in stats))
+    
+    async def apply_password_rehashes(self, rehashes: List[dict]) -> None:
+        """
+        Batched hash upgrades: [{"user_id": ..., "old_hash": ..., "new_hash": ...}], not committed
+        Only rows still holding the old hash change, a password changed meanwhile wins
+        """
+        if not rehashes:
+            return
+        table = User.__table__
+        await self.db.execute(
+            update(table)
+            .where(table.c.id == bindparam("user_id"), table.c.hashed_password == bindparam("old_hash"))
+            .values(hashed_password=bindparam("new_hash"), updated_at=table.c.updated_at),
+            rehashes,
         )
-        self.db.add(db_user)
-        await self.db.commit()
-        await self.db.refresh(db_user)
-        return db_user
-    
-    # async def update_last_login(self, user_id:int):
-    #     """Update user's last login timestamp"""
-    #     query = (
-    #         update(User)
-    #         .where(User.id == user_id)
-    #         .values(last_login=datetime.now(timezone.utc))
-    #     )
-    #     await self.db.execute(query)
-    #     await self.db.commit()
+        self._evict_after_commit(*(row["user_id"] for row in rehashes))
+    
+    async def add_login_events(self, events: List[dict]) -> None:
+        """Multi-row INSERT into login_event, not committed"""
+        if events:
+            await self.db.execute(insert(LoginEvent.__table__).values(events))
+    
+    async def bump_token_version(self, user_id: int) -> None:
+        """Invalidate every token issued to the user so far, not committed"""
+        table = User.__table__
+        await self.db.execute(
+            update(table)
+            .where(table.c.id == user_id)
+            .values(token_version=table.c.token_version + 1, updated_at=table.c.updated_at)
+        )
+        self._evict_after_commit(user_id)
+        self._invalidate_after_commit(user_id)
+    
+    async def get_token_version(self, user_id: int) -> Optional[int]:
+        # always the primary, a lagging replica would still accept tokens from before a logout-all
+        result = await self.db.execute(select(User.token_version).where(User.id == user_id))
+        return result.scalar_one_or_none()
     
     async def update_user(self, user: User, user_in: UserUpdate) -> User:
         """Update user with optional password hashing"""
+        self.pin_primary()
+        user = await self._attach(user)
         update_data = user_in.model_dump(exclude_unset=True)
         
         if "password" in update_data:
-            update_data["hashed_password"] = User.hash_password(update_data.pop("password"))
+            update_data["hashed_password"] = await password_hasher.hash(update_data.pop("password"))
         
         for field, value in update_data.items():
             setattr(user, field, value)
         
-        await self.db.commit()
-        await self.db.refresh(user)
+        await self.db.flush()
+        self._evict_after_commit(user.id)
+        self._invalidate_after_commit(user.id)
+        return user
+    
+    async def update(self, db_obj: User, obj_in) -> User:
+        user = await super().update(db_obj, obj_in)
+        self._invalidate_after_commit(user.id)
         return user
     
-    async def get_active_users(self, skip: int = 0, limit: int = 100) -> List[User]:
+    async def delete(self, db_obj: User) -> None:
+        user_id = db_obj.id
+        await super().delete(db_obj)
+        self._invalidate_after_commit(user_id)
+    
+    def _invalidate_after_commit(self, user_id: int) -> None:
+        def invalidate() -> None:
+            token_cache.invalidate_user(user_id)
+            invalidation_bus.publish(USER, user_id)
+        after_commit(self.db, invalidate)
+    
+    async def get_active_users(self, skip: int = 0, limit: int = 100, options: LoaderOptions = ()) -> List[User]:
         """Get only active users"""
-        result = await self.db.execute(
+        result = await self.reader.execute(
             select(User)
+            .options(*options)
             .where(User.is_active)
             .offset(skip)
             .limit(limit)
         )
-        return result.scalars().all()
+        return self._scalars(result, options).all()
+    
+    async def get_active_users_page(
+        self,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        options: LoaderOptions = (),
+        columns: Sequence = ()
+    ) -> Tuple[List[User], Optional[str]]:
+        """Keyset paginated active users, see BaseRepository.get_page"""
+        return await self.get_page(limit=limit, cursor=cursor, filters=(User.is_active,), options=options, columns=columns)
+    
+    async def count_users_cached(self, active_only: bool = False, max_age: float = 30) -> int:
+        """Exact count, reused for `max_age` seconds so paging doesn't recount the table every page"""
+        cached = _count_cache.get(active_only)
+        if cached is not None and time.monotonic() - cached[1] < max_age:
+            return cached[0]
+        count = await (self.count_active_users() if active_only else self.count_users())
+        _count_cache[active_only] = (count, time.monotonic())
+        return count
+    
+    async def estimate_users(self, active_only: bool = False) -> Tuple[int, bool]:
+        """
+        (count, is_estimate): the planner row estimate on Postgres (no scan), the cached exact count
+        elsewhere and for active users (the estimate covers the whole table)
+        """
+        if not active_only and self.reader.bind.dialect.name == "postgresql":
+            result = await self.reader.execute(
+                text("SELECT reltuples::bigint FROM pg_class WHERE relname = :table"),
+                {"table": User.__tablename__},
+            )
+            estimate = result.scalar_one_or_none()
+            if estimate is not None and estimate >= 0:
+                return estimate, True
+        return await self.count_users_cached(active_only=active_only), False
+    
+    def _match(self, column, value: str, mode: str, dialect: str):
+        value = value.lower()
+        if mode == "exact":
+            return func.lower(column) == value
+        if mode == "prefix" or len(value) < 3:
+            # the trigram indexes need at least 3 characters, shorter terms fall back to a prefix match
+            return _prefix_range(column, value, dialect)
+        if dialect == "sqlite":
+            # served by the FTS5 trigram table (its LIKE is case-insensitive), which can't use an
+            # ESCAPE clause - only escape when the term really contains wildcard characters
+            if "%" in value or "_" in value:
+                condition = f"{column.key} LIKE :{column.key}_term ESCAPE '\\'"
+                pattern = f"%{_escape_like(value)}%"
+            else:
+                condition = f"{column.key} LIKE :{column.key}_term"
+                pattern = f"%{value}%"
+            fts_match = select(text("rowid")).select_from(text(USER_SEARCH_FTS_TABLE)).where(
+                text(condition).bindparams(**{f"{column.key}_term": pattern})
+            )
+            return User.id.in_(fts_match)
+        pattern = f"%{_escape_like(value)}%"
+        return func.lower(column).like(pattern, escape="\\")
+    
+    async def search(
+        self,
+        criteria: UserSearch,
+        options: LoaderOptions = (),
+        columns: Sequence = ()
+    ) -> Tuple[List[User], bool]:
+        """
+        Single filtered query behind UserSearch
+        Returns (users, has_next), the extra row fetched for has_next replaces a count query
+        With `columns` the users are plain rows of those columns
+        """
+        dialect = self.reader.bind.dialect.name
+        query = select(*columns) if columns else select(User).options(*options)
+        if criteria.email:
+            query = query.where(self._match(User.email, criteria.email, criteria.match, dialect))
+        if criteria.username:
+            query = query.where(self._match(User.username, criteria.username, criteria.match, dialect))
+        if criteria.is_active is not None:
+            query = query.where(User.is_active == criteria.is_active)
+        if criteria.role is not None:
+            query = query.where(exists(
+                select(1)
+                .select_from(user_role.join(Role, Role.id == user_role.c.role_id))
+                .where(user_role.c.user_id == User.id, Role.name == criteria.role.value)
+            ))
+        
+        column = SEARCH_SORT_COLUMNS[criteria.order_by]
+        if criteria.order == "desc":
+            ordering = (column.desc(), User.id.desc())
+        else:
+            ordering = (column.asc(), User.id.asc())
+        query = (
+            query.order_by(*ordering)
+            .offset((criteria.page - 1) * criteria.page_size)
+            .limit(criteria.page_size + 1)
+        )
+        result = await self.reader.execute(query)
+        users = list(result.all() if columns else self._scalars(result, options).all())
+        return users[:criteria.page_size], len(users) > criteria.page_size
+    
+    async def stream_export_rows(self, batch_size: int = 1000) -> AsyncIterator[tuple]:
+        """
+        Every user as a plain row of EXPORT_COLUMNS, ordered by id
+        Uses a server-side cursor (stream + yield_per) so no more than one batch is buffered
+        """
+        result = await self.reader.stream(
+            select(*EXPORT_COLUMNS).order_by(User.id).execution_options(yield_per=batch_size)
+        )
+        async for row in result:
+            yield tuple(row)
     
     async def count_users(self) -> int:
         """Count total users"""
-        result = await self.db.execute(select(func.count()).select_from(User))
+        result = await self.reader.execute(select(func.count()).select_from(User))
         return result.scalar_one()
     
     async def count_active_users(self) -> int:
         """Count active users"""
-        result = await self.db.execute(
+        result = await self.reader.execute(
             select(func.count()).select_from(User).where(User.is_active)
         )
         return result.scalar_one()
\ No newline at end of file
@@ -1,13 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
-from schemas.token import Token  
-from dependencies.auth import get_auth_service  
-from services.security_service import SecurityService
+from config import settings
+from schemas.token import Token, RefreshRequest, LogoutRequest
+from dependencies.auth import get_auth_service, get_current_user
+from dependencies.rate_limit import limit_login_attempts
+from services.security_service import SecurityService, oauth2_scheme
+from services.token_cache import Principal
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
-@router.post("/login", response_model=Token)
+@router.post("/login", response_model=Token, dependencies=[Depends(limit_login_attempts)])
 async def login_for_access_token(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
     auth_service: SecurityService = Depends(get_auth_service)
 ):
@@ -15,23 +21,53 @@ async def login_for_access_token(
         # Your service returns (access_token, refresh_token)
         access_token, refresh_token = await auth_service.login_user(
             email=form_data.username,  # OAuth2 form uses "username" field
-            password=form_data.password
+            password=form_data.password,
+            client_ip=request.client.host if request.client else None
         )
         return {
             "access_token": access_token,
             "refresh_token": refresh_token,
             "token_type": "bearer",
-            "expires_in": 7
+            "expires_in": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
         }
     except HTTPException:
         # Re-raise auth exceptions from service
         raise
-    except Exception as e:
+    except Exception:
         # Generic fallback for unexpected errors
-        print("FULL ERROR:", repr(e))
-        import traceback
-        traceback.print_exc()
+        logger.exception("Login failed with an unexpected error")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Authentication service error"
-        )
\ No newline at end of file
+        )
+
+@router.post("/refresh", response_model=Token)
+async def refresh_tokens(
+    body: RefreshRequest,
+    auth_service: SecurityService = Depends(get_auth_service)
+):
+    """Rotate a refresh token into a new access/refresh pair, each refresh token works once"""
+    access_token, refresh_token = await auth_service.refresh_access_token(body.refresh_token)
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+        "expires_in": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    }
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(
+    body: LogoutRequest = LogoutRequest(),
+    token: str = Depends(oauth2_scheme),
+    auth_service: SecurityService = Depends(get_auth_service)
+):
+    """Revoke the current access token and, when given, its refresh token"""
+    await auth_service.logout(token, body.refresh_token)
+
+@router.post("/logout-all", status_code=status.HTTP_204_NO_CONTENT)
+async def logout_all(
+    current_user: Principal = Depends(get_current_user),
+    auth_service: SecurityService = Depends(get_auth_service)
+):
+    """Revoke every access and refresh token issued to the current user"""
+    await auth_service.logout_all(current_user)
@@ -0,0 +1,41 @@
+import secrets
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from config import settings
+from metrics import registry
+from db.session import engine, replica_engines
+from db.pool_metrics import get_pool_metrics
+from services.security_service import oauth2_scheme, SecurityService
+from services.token_cache import Principal
+from dependencies.auth import get_auth_service, get_current_active_admin, get_current_user
+from dependencies.context import get_request_context, RequestContext
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+async def verify_scraper(
+    token: str = Depends(oauth2_scheme),
+    context: RequestContext = Depends(get_request_context),
+    auth_service: SecurityService = Depends(get_auth_service)
+) -> None:
+    """The scraper sends METRICS_TOKEN as a bearer token, anyone else needs an admin's access token"""
+    if settings.METRICS_TOKEN and secrets.compare_digest(token.encode(), settings.METRICS_TOKEN.encode()):
+        return
+    principal = await get_current_user(token, context, auth_service)
+    await auth_service.get_current_active_admin(await auth_service.get_current_active_user(principal))
+
+@router.get("", response_class=PlainTextResponse, dependencies=[Depends(verify_scraper)])
+async def prometheus_metrics():
+    """ Route, dependency, SQL, bcrypt and pool metrics in the Prometheus text format => scraper token or admin """
+    return PlainTextResponse(registry.render(), media_type=registry.CONTENT_TYPE)
+
+@router.get("/pool")
+async def database_pool_metrics(
+    current_user: Principal = Depends(get_current_active_admin)
+):
+    """ Live connection pool state and checkout wait histogram => admin only """
+    return {
+        name: get_pool_metrics(name).snapshot(db_engine.pool)
+        for name, db_engine in [("primary", engine)] + [
+            (f"replica-{index}", replica) for index, replica in enumerate(replica_engines)
+        ]
+    }
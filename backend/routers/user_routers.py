@@ -1,19 +1,30 @@
-from typing import Annotated
+from typing import Annotated, Literal, Optional
 # from sqlalchemy.orm import Session
-from fastapi import APIRouter, Depends, HTTPException, status
-from schemas.users_scheme import UserBase, UserResponse, UserCreate, UserInDB, UserWithToken
-from models.users import User
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, status
+from fastapi.responses import StreamingResponse
+from schemas.users_scheme import UserBase, UserResponse, UserCreate, UserInDB, UserWithToken, UserSearch, UserImportReport, user_response_serializer
+from schemas.response import CursorPage, OffsetPage
+from config import settings
+from services.token_cache import Principal
 # from db.session import get_db
 from services.user_service import UserService
-from dependencies.services import get_user_service
-from dependencies.auth import get_current_active_user, get_current_active_admin,get_current_superuser
+from services.permission_service import USERS_READ, USERS_IMPORT, USERS_EXPORT
+from services.user_import_service import UserImportService, open_upload
+from services.user_export_service import UserExportService
+from dependencies.services import get_user_service, get_user_import_service
+from dependencies.auth import get_current_active_user, get_current_active_admin,get_current_superuser, require_permissions
+from dependencies.rate_limit import limit_registrations
+from dependencies.conditional import ConditionalGet, conditional_get, page_etag, user_etag
 
 
 router = APIRouter()
 
-@router.post("/register/user", response_model=UserResponse, status_code=status.HTTP_201_CREATED, responses={
+@router.post("/register/user", response_model=UserResponse, status_code=status.HTTP_201_CREATED, dependencies=[Depends(limit_registrations)], responses={
     status.HTTP_409_CONFLICT: {
         "description": "The User Already Exist"
+    },
+    status.HTTP_429_TOO_MANY_REQUESTS: {
+        "description": "Too many registrations from this client"
     }
 })
 async def register(user_in: UserCreate, user_service: UserService = Depends(get_user_service)) -> dict[str, UserBase]:
@@ -25,20 +36,92 @@ async def register(user_in: UserCreate, user_service: UserService = Depends(get_
 #    """ Get the cuurent user from db"""
 #    return await user_service.get_current_user()
 
-@router.get("/me", response_model=UserResponse, status_code=status.HTTP_200_OK)
+# response_model on the read routes documents the shape, they return FastJSONResponse
+# directly so FastAPI doesn't validate and re-encode rows that came from our own database.
+# They also send weak ETags (id + updated_at) and answer a matching If-None-Match with 304.
+NOT_MODIFIED = {status.HTTP_304_NOT_MODIFIED: {"description": "The client's copy (If-None-Match) is current"}}
+
+@router.get("/me", response_model=UserResponse, status_code=status.HTTP_200_OK, responses=NOT_MODIFIED)
 async def read_users_me(
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user),
+    conditional: ConditionalGet = Depends(conditional_get(settings.ME_CACHE_CONTROL))
+):
+    """ The cached principal is enough to answer, a 304 doesn't even serialize it """
+    return conditional.respond(user_etag(current_user), lambda: user_response_serializer.one(current_user))
+
+@router.get("/users", response_model=CursorPage[UserResponse], status_code=status.HTTP_200_OK, responses=NOT_MODIFIED)
+async def list_users(
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    active_only: bool = False,
+    total: Literal["none", "cached", "approximate"] = "none",
+    current_user: Principal = Depends(require_permissions(USERS_READ)),
+    user_service: UserService = Depends(get_user_service),
+    conditional: ConditionalGet = Depends(conditional_get(settings.USERS_CACHE_CONTROL))
+):
+    """ Keyset paginated user listing => admin or users:read, pass next_cursor back as cursor """
+    page = await user_service.list_users(limit=limit, cursor=cursor, active_only=active_only, total=total)
+    etag = page_etag(page["items"], next_cursor=page["next_cursor"], total=page["total"])
+    return conditional.respond(etag, lambda: page)
+
+@router.get("/users/search", response_model=OffsetPage[UserResponse], status_code=status.HTTP_200_OK, responses=NOT_MODIFIED)
+async def search_users(
+    criteria: UserSearch = Depends(),
+    current_user: Principal = Depends(require_permissions(USERS_READ)),
+    user_service: UserService = Depends(get_user_service),
+    conditional: ConditionalGet = Depends(conditional_get(settings.USERS_CACHE_CONTROL))
+):
+    """ Search users by email/username (exact, prefix or substring), status and role => admin or users:read """
+    page = await user_service.search_users(criteria)
+    etag = page_etag(page["items"], page=page["page"], page_size=page["page_size"], has_next=page["has_next"])
+    return conditional.respond(etag, lambda: page)
+
+@router.post("/users/import", response_model=UserImportReport, status_code=status.HTTP_200_OK)
+async def import_users(
+    file: UploadFile = File(...),
+    format: Optional[Literal["csv", "ndjson"]] = None,
+    current_user: Principal = Depends(require_permissions(USERS_IMPORT)),
+    import_service: UserImportService = Depends(get_user_import_service)
+):
+    """ Bulk create users from a CSV (email,username,password header) or NDJSON file => admin or users:import """
+    if format is None:
+        name = (file.filename or "").lower()
+        if name.endswith((".ndjson", ".jsonl")) or "ndjson" in (file.content_type or ""):
+            format = "ndjson"
+        elif name.endswith(".csv") or "csv" in (file.content_type or ""):
+            format = "csv"
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Can't tell the file format, pass format=csv or format=ndjson"
+            )
+    return await import_service.import_users(await open_upload(file), format)
+
+@router.get("/users/export", response_class=StreamingResponse, status_code=status.HTTP_200_OK)
+async def export_users(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    gzip: bool = False,
+    current_user: Principal = Depends(require_permissions(USERS_EXPORT))
 ):
-    return current_user
+    """ Stream every user as NDJSON or CSV, optionally gzip encoded => admin or users:export """
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv"
+    headers = {"Content-Disposition": f'attachment; filename="users.{format}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        UserExportService().export(format, compress=gzip),
+        media_type=media_type,
+        headers=headers
+    )
 
 @router.get("/admin-only")
 async def admin_endpoint(
-    current_user: User = Depends(get_current_active_admin)
+    current_user: Principal = Depends(get_current_active_admin)
 ):
     return {"message": "Admin access granted"}
 
 @router.get("/superuser-only")
 async def superuser_endpoint(
-    current_user: User = Depends(get_current_superuser)
+    current_user: Principal = Depends(get_current_superuser)
 ):
     return {"message": "Superuser access granted"}  
\ No newline at end of file
@@ -19,6 +19,20 @@ class PaginatedResponse(BaseModel, Generic[T]):
     page_size: int
     pages: int
 
+class CursorPage(BaseModel, Generic[T]):
+    """Keyset paginated response schema, pass next_cursor back to get the following page"""
+    items: List[T]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+    total_is_estimate: bool = False
+
+class OffsetPage(BaseModel, Generic[T]):
+    """Page/page_size response schema without a total count"""
+    items: List[T]
+    page: int
+    page_size: int
+    has_next: bool
+
 class ErrorResponse(BaseModel):
     """Error response schema"""
     success: bool = False
@@ -0,0 +1,87 @@
+"""
+Fast response path for data that doesn't need re-validating (ORM rows, principals, row tuples).
+`FastJSONResponse` renders with orjson when it is installed (stdlib json otherwise) and is the
+app's default response class, `RowSerializer` turns objects or row tuples straight into
+the dicts a response schema describes, skipping the pydantic model round trip.
+"""
+import json
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from enum import Enum
+from operator import attrgetter
+from typing import Any, Dict, Iterable, List, Sequence, Tuple, Type
+from uuid import UUID
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional, stdlib json is the fallback
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    """Types stdlib json can't encode, formatted the way pydantic's JSON mode does"""
+    if isinstance(value, datetime):
+        if value.tzinfo is not None and value.utcoffset() == timezone.utc.utcoffset(None):
+            return value.replace(tzinfo=None).isoformat() + "Z"
+        return value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (UUID, Decimal)):
+        return str(value)
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    def dumps(content: Any) -> bytes:
+        # OPT_UTC_Z: UTC datetimes end in "Z" like pydantic's output
+        return orjson.dumps(content, default=_default, option=orjson.OPT_UTC_Z)
+else:
+    def dumps(content: Any) -> bytes:
+        return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with the fast encoder, returning one from a route skips response_model validation"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class RowSerializer:
+    """
+    Serializer compiled once per response schema: the schema's field names (in its output order)
+    read off an object with one attrgetter, or zipped with a row tuple selected in that order.
+    Only for trusted data, values are emitted as they are without pydantic validation.
+    """
+
+    def __init__(self, schema: Type[BaseModel], fields: Sequence[str] = ()):
+        self.schema = schema
+        self.fields: Tuple[str, ...] = tuple(fields) or tuple(schema.model_fields)
+        getter = attrgetter(*self.fields)
+        # attrgetter returns a bare value, not a 1-tuple, for a single field
+        self._getter = getter if len(self.fields) > 1 else (lambda obj: (getter(obj),))
+
+    def one(self, obj: Any) -> Dict[str, Any]:
+        """Dict for an ORM object, Principal or anything with the schema's attributes"""
+        return dict(zip(self.fields, self._getter(obj)))
+
+    def many(self, objects: Iterable[Any]) -> List[Dict[str, Any]]:
+        fields, getter = self.fields, self._getter
+        return [dict(zip(fields, getter(obj))) for obj in objects]
+
+    def rows(self, rows: Iterable[Sequence[Any]]) -> List[Dict[str, Any]]:
+        """Dicts for row tuples selected in `fields` order (see `columns_for`)"""
+        fields = self.fields
+        return [dict(zip(fields, row)) for row in rows]
+
+    def columns_for(self, model) -> tuple:
+        """The model's columns in `fields` order, select(*columns) yields rows for `rows`"""
+        return tuple(getattr(model, name) for name in self.fields)
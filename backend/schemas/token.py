@@ -13,7 +13,17 @@ class TokenPayload(BaseModel):
     sub: str  # subject (usually user ID)
     exp: int  # expiration time
     type: str = "access"  # "access" or "refresh"
-    scopes: list[str] = []
+    scopes: list[str] = []  # role names
+    perms: int = 0  # effective permission bitmask, see services.permission_service
+    ver: int = 0  # user's token version, bumped by logout-all
+
+class RefreshRequest(BaseModel):
+    """Refresh token exchanged for a new token pair"""
+    refresh_token: str
+
+class LogoutRequest(BaseModel):
+    """Refresh token of the session being closed (optional, the access token is always revoked)"""
+    refresh_token: Optional[str] = None
 
 class TokenData(BaseModel):
     """Token data for internal use"""
@@ -3,6 +3,7 @@ from datetime import datetime
 from typing import Optional, List, Literal
 from .base import BaseSchema
 from .token import Token
+from .serialization import RowSerializer
 from enum import Enum
 
 class Role(str, Enum):
@@ -64,9 +65,12 @@ class UserResponse(UserBase):
     created_at: datetime
     updated_at: datetime
 
+# trusted rows (ORM users, principals, row tuples) -> UserResponse dicts without validation
+user_response_serializer = RowSerializer(UserResponse)
+
 class UserProfile(UserResponse):
     """User profile schema with additional info"""
-    # last_login: Optional[datetime] = None
+    last_login: Optional[datetime] = None
     login_count: int = 0
 
 class UserWithToken(UserResponse):
@@ -80,7 +84,21 @@ class UserSearch(BaseModel):
     full_name: Optional[str] = None
     is_active: Optional[bool] = None
     role: Optional[Role] = None
-    page: int = 1
-    page_size: int = 10
-    order_by: str = "created_at"
-    order: Literal["asc", "desc"] = "desc"
\ No newline at end of file
+    match: Literal["exact", "prefix", "contains"] = "prefix"  # how email/username are matched
+    page: int = Field(1, ge=1)
+    page_size: int = Field(10, ge=1, le=100)
+    order_by: Literal["id", "created_at", "email", "username"] = "created_at"  # indexed columns only
+    order: Literal["asc", "desc"] = "desc"
+
+class UserImportError(BaseModel):
+    """One rejected row of a bulk import"""
+    line: int
+    field: Optional[str] = None
+    message: str
+
+class UserImportReport(BaseModel):
+    """Bulk import result"""
+    created: int = 0
+    failed: int = 0
+    errors: List[UserImportError] = []
+    errors_truncated: bool = False
\ No newline at end of file
@@ -0,0 +1,196 @@
+import asyncio
+import fcntl
+import math
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, Optional
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from config import settings
+from services.private_files import ensure_private_file
+from metrics import PASSWORD_HASH_DURATION, PASSWORD_HASH_QUEUE_WAIT
+
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto"
+)
+
+
+def current_rounds() -> int:
+    """bcrypt cost new hashes get, stored hashes below it are rehashed on login"""
+    return pwd_context.handler("bcrypt").default_rounds
+
+def set_rounds(rounds: int) -> None:
+    # default_rounds + min_rounds rather than the `rounds` shorthand, which also sets max_rounds:
+    # a stronger hash (another worker's or an earlier calibration) must never be downgraded
+    pwd_context.update(bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds)
+
+if settings.PASSWORD_HASH_ROUNDS:
+    set_rounds(settings.PASSWORD_HASH_ROUNDS)
+
+def needs_rehash(hashed_password: str) -> bool:
+    """Outdated scheme or a cost below the current one, parses the hash only (no bcrypt work)"""
+    return pwd_context.needs_update(hashed_password)
+
+def calibrate_rounds(target_ms: float, min_rounds: int = 10, max_rounds: int = 15, samples: int = 3) -> int:
+    """
+    Highest bcrypt cost whose hash time fits `target_ms` on this machine.
+    Every extra round doubles the work, so one measurement at `min_rounds` predicts
+    the others, the pick is measured once more and stepped down if it overshoots.
+    Blocking, call it from a thread.
+    """
+    def measure(rounds: int, count: int) -> float:
+        best = math.inf
+        for _ in range(count):
+            start = time.perf_counter()
+            _hash("calibration-password", rounds)
+            best = min(best, (time.perf_counter() - start) * 1000)
+        return best
+
+    base_ms = measure(min_rounds, samples)
+    if base_ms >= target_ms:
+        return min_rounds
+    rounds = min(max_rounds, min_rounds + int(math.log2(target_ms / base_ms)))
+    while rounds > min_rounds and measure(rounds, 1) > target_ms:
+        rounds -= 1
+    return rounds
+
+def shared_calibration(path: str, max_age: float, calibrate: Callable[[], int]) -> int:
+    """
+    Cost calibrated once for all workers of the host: the first one measures while holding an
+    exclusive lock on `path` (the others wait instead of competing for the CPU and skewing the
+    measurement) and stores the result, which workers starting within `max_age` seconds reuse.
+    Blocking, call it from a thread.
+    """
+    ensure_private_file(path)
+    with open(path, "r+") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)  # released when the file is closed
+        try:
+            rounds, measured_at = handle.read().split()
+            if time.time() - float(measured_at) < max_age:
+                return int(rounds)
+        except ValueError:
+            pass  # first calibration on this host (empty file)
+        rounds = calibrate()
+        handle.seek(0)
+        handle.truncate()
+        handle.write(f"{rounds} {time.time()}\n")
+        return rounds
+
+
+@lru_cache(maxsize=None)
+def _bcrypt(rounds: int):
+    return pwd_context.handler("bcrypt").using(rounds=rounds)
+
+# module level so they can be shipped to a process pool, the cost travels
+# with the call because worker processes never see set_rounds()
+def _hash(password: str, rounds: int) -> str:
+    return _bcrypt(rounds).hash(password)
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt off the event loop in a bounded worker pool.
+    At most `max_concurrency` hashes run at once, at most `max_queue` callers
+    wait for a slot, anything beyond that gets a 503 instead of piling up.
+    With `max_queue=None` callers always wait (bulk work that must not fail halfway).
+    """
+
+    def __init__(
+        self,
+        executor: str = "thread",
+        max_workers: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        max_queue: Optional[int] = 64,
+    ):
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Unknown hashing executor: {executor}")
+        self.executor_kind = executor
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_concurrency = max_concurrency or self.max_workers
+        self.max_queue = max_queue
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._waiting = 0
+
+    @property
+    def waiting(self) -> int:
+        """Number of callers queued for a hashing slot"""
+        return self._waiting
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="bcrypt"
+                )
+        return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # semaphores bind to the running loop, recreate it if the loop changed (tests, benchmarks)
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+            self._waiting = 0
+        return self._semaphore
+
+    async def _run(self, operation: str, fn, *args):
+        semaphore = self._get_semaphore()
+        if semaphore.locked() and self.max_queue is not None and self._waiting >= self.max_queue:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication service busy, try again shortly",
+                headers={"Retry-After": "1"},
+            )
+        self._waiting += 1
+        queued = time.perf_counter()
+        try:
+            await semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        started = time.perf_counter()
+        PASSWORD_HASH_QUEUE_WAIT.labels(operation).observe(started - queued)
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            semaphore.release()
+            PASSWORD_HASH_DURATION.labels(operation).observe(time.perf_counter() - started)
+
+    async def hash(self, password: str) -> str:
+        """Hash password using bcrypt"""
+        return await self._run("hash", _hash, password, current_rounds())
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """Check a password against a stored bcrypt hash"""
+        return await self._run("verify", _verify, plain_password, hashed_password)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    executor=settings.PASSWORD_HASH_EXECUTOR,
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_concurrency=settings.PASSWORD_HASH_MAX_CONCURRENCY,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+)
+
+# bulk imports hash thousands of passwords, they get their own process pool so logins keep theirs.
+# Concurrent imports queue up for it: each holds at most one batch of hashes, a 503 would abort it midway
+import_password_hasher = PasswordHasher(
+    executor="process",
+    max_workers=settings.USER_IMPORT_HASH_WORKERS,
+    max_queue=None,
+)
@@ -0,0 +1,299 @@
+"""
+Cross-worker cache invalidation.
+Every worker keeps in-process caches (verified tokens, repository rows, compiled permissions,
+the revocation Bloom filter) that it evicts itself after its own commits. The bus tells the
+other workers: `publish` (called from the same after_commit callbacks) sends a compact event,
+every other worker applies it with the handlers from `install_handlers`.
+Transports: "unix" (Unix datagram sockets in a shared directory, one host) and "postgres"
+(LISTEN/NOTIFY, any number of hosts). Events lost on the way (a full socket buffer, a dropped
+LISTEN connection) are bounded by the caches' TTLs and the revocation filter's periodic sync
+(REVOCATION_FILTER_SYNC_SECONDS), a reconnect clears the caches outright.
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import uuid
+from typing import Callable, Dict, List, Optional, Sequence
+from config import settings
+from services.private_files import default_private_directory, ensure_private_directory
+
+logger = logging.getLogger(__name__)
+
+# event kinds, keys are what the handlers need to find the entries
+USER = "user"            # user ids: cached tokens/principals of those users
+ROWS = "rows"            # table name, then ids: repository row cache
+REVOKED = "revoked"      # "user_id:jti": revocation filter and that cached token
+PERMISSIONS = "perms"    # no keys: compiled role permission masks
+
+MessageHandler = Callable[[bytes], None]
+
+
+class UnixSocketTransport:
+    """
+    Single host: each worker binds a datagram socket `<pid>-<random>.sock` in `directory` and
+    sends every event to all other sockets there (no broker, delivery takes microseconds).
+    Sockets left behind by dead workers are removed by the first sender that can't reach them.
+    Whoever can enter `directory` can inject and read revocations, so it must be ours and 0700.
+    """
+
+    max_payload = 60_000
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.path: Optional[str] = None
+        self.dropped = 0
+        self._sock: Optional[socket.socket] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def start(self, on_message: MessageHandler, on_gap: Callable[[], None]) -> None:
+        ensure_private_directory(self.directory)
+        self.path = os.path.join(self.directory, f"{os.getpid()}-{uuid.uuid4().hex[:8]}.sock")
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.bind(self.path)
+        self._sock.setblocking(False)
+        self._loop = asyncio.get_running_loop()
+        self._loop.add_reader(self._sock.fileno(), self._read, on_message)
+
+    def _read(self, on_message: MessageHandler) -> None:
+        while True:
+            try:
+                payload = self._sock.recv(self.max_payload + 1024)
+            except (BlockingIOError, InterruptedError):
+                return
+            on_message(payload)
+
+    def send(self, payload: bytes) -> None:
+        if self._sock is None:
+            return
+        for name in os.listdir(self.directory):
+            peer = os.path.join(self.directory, name)
+            if not name.endswith(".sock") or peer == self.path:
+                continue
+            try:
+                self._sock.sendto(payload, peer)
+            except (ConnectionRefusedError, FileNotFoundError):
+                try:
+                    os.unlink(peer)
+                except FileNotFoundError:
+                    pass
+            except (BlockingIOError, InterruptedError):
+                # the peer isn't reading fast enough, its entries live until their TTL
+                self.dropped += 1
+                logger.warning("Invalidation to %s dropped, its receive buffer is full", name)
+
+    async def stop(self) -> None:
+        if self._sock is None:
+            return
+        self._loop.remove_reader(self._sock.fileno())
+        self._sock.close()
+        self._sock = None
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class PostgresTransport:
+    """
+    Cluster: LISTEN on `channel` over a dedicated asyncpg connection, events go out with
+    pg_notify from the same connection (in order, after the write committed).
+    A lost connection is re-established with backoff, whatever was missed meanwhile
+    is covered by `on_gap` (clear the caches).
+    """
+
+    max_payload = 7_900  # NOTIFY payloads must stay below 8000 bytes
+
+    def __init__(self, dsn: str, channel: str, reconnect_delay: float = 1.0):
+        self.dsn = dsn
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self.dropped = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._conn = None
+
+    async def start(self, on_message: MessageHandler, on_gap: Callable[[], None]) -> None:
+        self._queue = asyncio.Queue(maxsize=10_000)
+        await self._connect(on_message)
+        self._task = asyncio.create_task(self._run(on_message, on_gap), name="invalidation-notify")
+
+    async def _connect(self, on_message: MessageHandler) -> None:
+        import asyncpg  # only needed for this transport
+        self._conn = await asyncpg.connect(self.dsn)
+        await self._conn.add_listener(self.channel, lambda conn, pid, channel, payload: on_message(payload.encode()))
+        # a dead LISTEN connection would go unnoticed until the next publish, wake the sender to reconnect
+        self._conn.add_termination_listener(lambda conn: self._queue.put_nowait(None))
+
+    async def _run(self, on_message: MessageHandler, on_gap: Callable[[], None]) -> None:
+        while True:
+            payload = await self._queue.get()  # None: just make sure we are connected
+            while True:
+                try:
+                    if self._conn is None or self._conn.is_closed():
+                        await self._connect(on_message)
+                        on_gap()
+                    if payload is not None:
+                        await self._conn.execute("SELECT pg_notify($1, $2)", self.channel, payload)
+                    break
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    logger.exception("Invalidation NOTIFY failed, reconnecting in %.1fs", self.reconnect_delay)
+                    self._conn = None
+                    await asyncio.sleep(self.reconnect_delay)
+
+    def send(self, payload: bytes) -> None:
+        if self._queue is None:
+            return
+        try:
+            self._queue.put_nowait(payload.decode())
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning("Invalidation dropped, the NOTIFY queue is full")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            # drain what was published before shutdown, then stop
+            while not self._queue.empty() and not self._task.done():
+                await asyncio.sleep(0.01)
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+
+class InvalidationBus:
+    """
+    `publish(kind, *keys)` fans an event out to the other workers (this worker already evicted),
+    received events run the handlers `subscribe`d for their kind.
+    Without a transport publishing is a no-op, a single worker needs nothing else.
+    """
+
+    def __init__(self, transport=None):
+        self.transport = transport
+        self.origin = uuid.uuid4().hex[:12]
+        self._handlers: Dict[str, List[Callable[[Sequence], None]]] = {}
+        self._gap_handlers: List[Callable[[], None]] = []
+        self.published = 0
+        self.received = 0
+        self.failed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.transport is not None
+
+    def subscribe(self, kind: str, handler: Callable[[Sequence], None]) -> None:
+        self._handlers.setdefault(kind, []).append(handler)
+
+    def on_gap(self, handler: Callable[[], None]) -> None:
+        """Called when events may have been missed (reconnect), should drop everything cached"""
+        self._gap_handlers.append(handler)
+
+    def publish(self, kind: str, *keys) -> None:
+        if self.transport is None:
+            return
+        for payload in self._encode(kind, list(keys)):
+            try:
+                self.transport.send(payload)
+                self.published += 1
+            except Exception:
+                self.failed += 1
+                logger.exception("Publishing %s invalidation failed", kind)
+
+    def _encode(self, kind: str, keys: list) -> List[bytes]:
+        # rows events keep their table name in front of every chunk
+        head, keys = (keys[:1], keys[1:]) if kind == ROWS else ([], keys)
+        payload = json.dumps({"o": self.origin, "k": kind, "i": head + keys}, separators=(",", ":")).encode()
+        if len(payload) <= self.transport.max_payload or len(keys) <= 1:
+            return [payload]
+        middle = len(keys) // 2
+        return self._encode(kind, head + keys[:middle]) + self._encode(kind, head + keys[middle:])
+
+    def _receive(self, payload: bytes) -> None:
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            self.failed += 1
+            return
+        if event.get("o") == self.origin:
+            return  # NOTIFY also reaches the publishing connection
+        self.received += 1
+        for handler in self._handlers.get(event.get("k"), ()):
+            try:
+                handler(event.get("i") or [])
+            except Exception:
+                self.failed += 1
+                logger.exception("Invalidation handler for %s failed", event.get("k"))
+
+    def _gap(self) -> None:
+        for handler in self._gap_handlers:
+            handler()
+
+    async def start(self) -> None:
+        if self.transport is not None:
+            await self.transport.start(self._receive, self._gap)
+
+    async def stop(self) -> None:
+        if self.transport is not None:
+            await self.transport.stop()
+
+
+def install_handlers(bus: "InvalidationBus") -> None:
+    """Evict this worker's caches on events from the others (called once from main)"""
+    from repositories.cache import repository_cache
+    from services.permission_service import permission_registry
+    from services.revocation_service import revocation_store
+    from services.token_cache import token_cache
+
+    def users(keys: Sequence) -> None:
+        for user_id in keys:
+            token_cache.invalidate_user(int(user_id))
+
+    def rows(keys: Sequence) -> None:
+        if repository_cache is not None and keys:
+            repository_cache.invalidate_table(keys[0], *keys[1:])
+
+    def revoked(keys: Sequence) -> None:
+        for key in keys:
+            user_id, _, jti = str(key).partition(":")
+            revocation_store.add(jti)
+            token_cache.discard_jti(int(user_id), jti)
+
+    def everything() -> None:
+        token_cache.clear()
+        if repository_cache is not None:
+            repository_cache.clear()
+        permission_registry.invalidate()
+        revocation_store.invalidate()
+
+    bus.subscribe(USER, users)
+    bus.subscribe(ROWS, rows)
+    bus.subscribe(REVOKED, revoked)
+    bus.subscribe(PERMISSIONS, lambda keys: permission_registry.invalidate())
+    bus.on_gap(everything)
+
+
+def build_transport():
+    """The configured transport, None (single worker) when INVALIDATION_BUS is empty"""
+    kind = settings.INVALIDATION_BUS.lower()
+    if not kind:
+        return None
+    if kind == "unix":
+        directory = settings.INVALIDATION_SOCKET_DIR or os.path.join(default_private_directory(), "invalidation")
+        return UnixSocketTransport(directory)
+    if kind == "postgres":
+        from sqlalchemy.engine import make_url
+        url = make_url(settings.INVALIDATION_DATABASE_URL or settings.DATABASE_URL)
+        dsn = url.set(drivername="postgresql").render_as_string(hide_password=False)
+        return PostgresTransport(dsn, settings.INVALIDATION_CHANNEL)
+    raise ValueError(f"Unknown INVALIDATION_BUS {kind!r}, expected unix or postgres")
+
+
+invalidation_bus = InvalidationBus(build_transport())
@@ -0,0 +1,165 @@
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+from config import settings
+from db.session import SessionLocal
+from db.unit_of_work import UnitOfWork
+from repositories.user_repository import UserRepository
+
+logger = logging.getLogger(__name__)
+
+
+class LoginTracker:
+    """
+    Write-behind buffer for login bookkeeping.
+    `record` only appends to an in-memory deque, a background task flushes every
+    `flush_interval` seconds (or early once `flush_size` logins are pending) as one
+    transaction: a batched UPDATE of last_login/login_count and a multi-row INSERT of events.
+    The buffer is bounded, when the database can't keep up new logins are dropped
+    (counted in `dropped`) instead of growing memory or slowing /login down.
+    Password hash upgrades computed after a login ride along in the same flush, they are
+    written even with `enabled=False` (which only turns off the login stats).
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable = SessionLocal,
+        max_pending: int = 10_000,
+        flush_interval: float = 5.0,
+        flush_size: int = 500,
+        enabled: bool = True,
+    ):
+        self.session_factory = session_factory
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.enabled = enabled
+        self._pending: Deque[Tuple[int, datetime, Optional[str]]] = deque()
+        self._rehashes: Dict[int, dict] = {}
+        self._background: Set[asyncio.Task] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self.flushed = 0
+        self.dropped = 0
+        self.failed = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending) + len(self._rehashes)
+
+    def record(self, user_id: int, ip_address: Optional[str] = None) -> bool:
+        """Queue one successful login, never touches the database"""
+        if not self.enabled:
+            return False
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return False
+        self._pending.append((user_id, datetime.now(timezone.utc), ip_address))
+        if len(self._pending) >= self.flush_size and self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    def record_rehash(self, user_id: int, old_hash: str, new_hash: str) -> None:
+        """Queue a password hash upgrade (the newest one per user wins)"""
+        if len(self._rehashes) >= self.max_pending and user_id not in self._rehashes:
+            self.dropped += 1
+            return
+        self._rehashes[user_id] = {"user_id": user_id, "old_hash": old_hash, "new_hash": new_hash}
+
+    def schedule_rehash(self, user_id: int, old_hash: str, password: str, hasher) -> None:
+        """
+        Hash `password` with the current cost off the login request and queue the write,
+        a busy hashing pool just means the upgrade waits for a later login
+        """
+        async def rehash() -> None:
+            try:
+                new_hash = await hasher.hash(password)
+            except Exception:
+                return
+            self.record_rehash(user_id, old_hash, new_hash)
+
+        task = asyncio.create_task(rehash())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def start(self) -> None:
+        # runs with tracking disabled too, hash upgrades are flushed by it
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._run(), name="login-tracker")
+
+    async def stop(self) -> None:
+        """Stop the background task and write whatever is still buffered"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def _drain(self) -> Tuple[List[dict], List[dict], List[dict]]:
+        """Take everything pending, folded into one stats row per user plus the raw events"""
+        stats: Dict[int, dict] = {}
+        events: List[dict] = []
+        while self._pending:
+            user_id, at, ip_address = self._pending.popleft()
+            events.append({"user_id": user_id, "logged_in_at": at, "ip_address": ip_address})
+            row = stats.get(user_id)
+            if row is None:
+                stats[user_id] = {"user_id": user_id, "last_login": at, "logins": 1}
+            else:
+                row["logins"] += 1
+                row["last_login"] = max(row["last_login"], at)
+        rehashes, self._rehashes = list(self._rehashes.values()), {}
+        return list(stats.values()), events, rehashes
+
+    async def flush(self) -> int:
+        """Write the buffered logins, returns how many were written"""
+        if not self._pending and not self._rehashes:
+            return 0
+        lock = self._flush_lock or asyncio.Lock()
+        async with lock:
+            stats, events, rehashes = self._drain()
+            if not events and not rehashes:
+                return 0
+            try:
+                async with self.session_factory() as session:
+                    async with UnitOfWork(session):
+                        repo = UserRepository(session)
+                        await repo.apply_login_stats(stats)
+                        await repo.add_login_events(events)
+                        await repo.apply_password_rehashes(rehashes)
+            except Exception:
+                # bookkeeping only, a failed batch is dropped rather than retried forever
+                # (an upgrade that didn't make it is simply computed again on a later login)
+                self.failed += len(events) + len(rehashes)
+                logger.exception("Login tracking flush failed, dropped %d entries", len(events) + len(rehashes))
+                return 0
+            self.flushed += len(events) + len(rehashes)
+            return len(events) + len(rehashes)
+
+
+login_tracker = LoginTracker(
+    max_pending=settings.LOGIN_TRACKING_MAX_PENDING,
+    flush_interval=settings.LOGIN_TRACKING_FLUSH_INTERVAL,
+    flush_size=settings.LOGIN_TRACKING_FLUSH_SIZE,
+    enabled=settings.LOGIN_TRACKING_ENABLED,
+)
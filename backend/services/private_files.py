@@ -0,0 +1,59 @@
+"""
+Local files the workers of one host share (repository cache database, invalidation sockets) live in
+directories only the app's user can enter. Under a shared /tmp another local user could create such a
+directory first and read or plant what the app trusts, so an existing one must prove it is ours.
+"""
+import os
+import stat
+import tempfile
+
+
+class UnsafePathError(RuntimeError):
+    """A path the app would trust is owned by someone else or open to other users"""
+
+
+def ensure_private_directory(path: str) -> str:
+    """Create `path` 0700, or check an existing one is a real directory owned by us and closed to others"""
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode):
+        raise UnsafePathError(f"{path} is not a directory (or is a symlink)")
+    if info.st_uid != os.geteuid():
+        raise UnsafePathError(f"{path} is owned by uid {info.st_uid}, not by this process (uid {os.geteuid()})")
+    if info.st_mode & 0o077:
+        raise UnsafePathError(f"{path} is accessible to other users (mode {stat.S_IMODE(info.st_mode):o}), expected 700")
+    return path
+
+
+def ensure_private_file(path: str) -> str:
+    """
+    Create `path` 0600 (never through a symlink), or check an existing one is a regular file owned by us
+    and closed to others. Its directory must not be writable by other users either, or they could plant
+    files next to it (SQLite's -wal/-shm) or swap it out.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    info = os.stat(directory)
+    if info.st_uid not in (os.geteuid(), 0) or info.st_mode & 0o022:
+        raise UnsafePathError(
+            f"{directory} is owned or writable by other users, keep {os.path.basename(path)} in a private directory"
+        )
+    try:
+        os.close(os.open(path, os.O_RDWR | os.O_CREAT | os.O_EXCL | os.O_NOFOLLOW, 0o600))
+    except FileExistsError:
+        pass
+    info = os.lstat(path)
+    if not stat.S_ISREG(info.st_mode):
+        raise UnsafePathError(f"{path} is not a regular file (or is a symlink)")
+    if info.st_uid != os.geteuid():
+        raise UnsafePathError(f"{path} is owned by uid {info.st_uid}, not by this process (uid {os.geteuid()})")
+    if info.st_mode & 0o077:
+        raise UnsafePathError(f"{path} is accessible to other users (mode {stat.S_IMODE(info.st_mode):o}), expected 600")
+    return path
+
+
+def default_private_directory() -> str:
+    """Per-user directory under the system temp dir, used when no explicit path is configured"""
+    return ensure_private_directory(os.path.join(tempfile.gettempdir(), f"tma-{os.geteuid()}"))
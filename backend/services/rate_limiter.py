@@ -0,0 +1,134 @@
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Hashable, Optional, Tuple
+from fastapi import HTTPException, status
+from config import settings
+
+
+@dataclass(frozen=True)
+class TokenBucket:
+    """`burst` requests at once, refilled at `per_minute` requests per minute"""
+    burst: int
+    per_minute: float
+
+    def hit(self, state: Optional[tuple], now: float) -> Tuple[tuple, float]:
+        """New state and the seconds to wait (0 when the request is allowed)"""
+        tokens, updated = state if state is not None else (float(self.burst), now)
+        rate = self.per_minute / 60
+        tokens = min(float(self.burst), tokens + (now - updated) * rate)
+        if tokens >= 1:
+            return (tokens - 1, now), 0.0
+        return (tokens, now), (1 - tokens) / rate if rate > 0 else math.inf
+
+
+@dataclass(frozen=True)
+class SlidingWindow:
+    """
+    At most `limit` requests per `window` seconds, approximated from two counters
+    (current and previous fixed window, the previous one weighted by its overlap),
+    so a key costs three numbers instead of a timestamp per request
+    """
+    limit: int
+    window: float
+
+    def hit(self, state: Optional[tuple], now: float) -> Tuple[tuple, float]:
+        start = now - now % self.window
+        if state is None:
+            previous, current = 0, 0
+        else:
+            last_start, previous, current = state
+            if last_start != start:
+                # one window later the current count becomes the previous one, later than that both are stale
+                previous = current if start - last_start == self.window else 0
+                current = 0
+        elapsed = now - start
+        estimate = previous * (1 - elapsed / self.window) + current
+        if estimate + 1 <= self.limit:
+            return (start, previous, current + 1), 0.0
+        return (start, previous, current), self._retry_after(previous, current, elapsed)
+
+    def _retry_after(self, previous: int, current: int, elapsed: float) -> float:
+        allowed = self.limit - 1
+        if current > allowed:
+            # has to wait for the next window, until the carried over count has decayed enough
+            return (self.window - elapsed) + self.window * (1 - allowed / current)
+        # the previous window's weight drops linearly, solve previous * (1 - t / window) + current <= allowed
+        return max(0.0, self.window * (1 - (allowed - current) / previous) - elapsed)
+
+
+class MemoryRateLimitStore:
+    """
+    In-process state store, an LRU bounded to `max_keys` so a flood of distinct
+    IPs/emails can't grow memory, the least recently seen keys are evicted.
+    Other stores (e.g. shared between workers) implement the same get/set.
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._state: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[tuple]:
+        state = self._state.get(key)
+        if state is not None:
+            self._state.move_to_end(key)
+        return state
+
+    def set(self, key: Hashable, state: tuple) -> None:
+        self._state[key] = state
+        self._state.move_to_end(key)
+        while len(self._state) > self.max_keys:
+            self._state.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._state.clear()
+
+    def __len__(self) -> int:
+        return len(self._state)
+
+
+class RateLimiter:
+    """Applies token bucket / sliding window rules to keys held in a pluggable store"""
+
+    def __init__(self, store: Optional[MemoryRateLimitStore] = None, enabled: bool = True):
+        self.store = store if store is not None else MemoryRateLimitStore()
+        self.enabled = enabled
+        self.allowed = 0
+        self.rejected = 0
+
+    def hit(self, key: Hashable, rule, now: Optional[float] = None) -> float:
+        """Count one request for `key`, returns the seconds to wait (0 when allowed)"""
+        if not self.enabled:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        state, retry_after = rule.hit(self.store.get(key), now)
+        self.store.set(key, state)
+        if retry_after > 0:
+            self.rejected += 1
+        else:
+            self.allowed += 1
+        return retry_after
+
+    def check(self, *limits: Tuple[Hashable, object]) -> None:
+        """Apply several (key, rule) limits, raises 429 with Retry-After on the first one exceeded"""
+        for key, rule in limits:
+            retry_after = self.hit(key, rule)
+            if retry_after > 0:
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many requests, try again later",
+                    headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+                )
+
+
+LOGIN_PER_IP = TokenBucket(burst=settings.LOGIN_RATE_IP_BURST, per_minute=settings.LOGIN_RATE_IP_PER_MINUTE)
+LOGIN_PER_EMAIL = SlidingWindow(limit=settings.LOGIN_RATE_EMAIL_LIMIT, window=settings.LOGIN_RATE_EMAIL_WINDOW_SECONDS)
+REGISTER_PER_IP = TokenBucket(burst=settings.REGISTER_RATE_IP_BURST, per_minute=settings.REGISTER_RATE_IP_PER_MINUTE)
+
+rate_limiter = RateLimiter(
+    MemoryRateLimitStore(max_keys=settings.RATE_LIMIT_MAX_KEYS),
+    enabled=settings.RATE_LIMIT_ENABLED,
+)
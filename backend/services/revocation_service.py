@@ -0,0 +1,117 @@
+import hashlib
+import math
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional
+from config import settings
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings.
+    `item in bf` is False only for items that were never added, a True has to be
+    confirmed by the source of truth (false positive rate ~ error_rate at capacity).
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(1, capacity)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        # double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationStore:
+    """
+    In-memory negative lookup in front of the revoked_token table.
+    Almost every token checked is not revoked, the filter answers that without I/O,
+    only a (possibly false) positive costs a primary-key lookup.
+    Filled from the table on startup and after `invalidate()`, revocations committed
+    by this process are added directly. Other processes' revocations are picked up by
+    `ensure_loaded` every `sync_seconds` (the rows revoked since the last sync, looking back
+    `sync_overlap_seconds` further for slow commits and clock skew), the invalidation bus
+    only makes that faster. Once the filter holds more than its capacity it is rebuilt
+    from the unexpired rows on the next `ensure_loaded`.
+    """
+
+    def __init__(self, capacity: int = 100_000, error_rate: float = 0.001, sync_seconds: float = 5,
+                 sync_overlap_seconds: float = 60):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_seconds = sync_seconds
+        self.sync_overlap_seconds = sync_overlap_seconds
+        self._filter = BloomFilter(capacity, error_rate)
+        self._loaded = False
+        self._synced_at = 0.0
+        self._since: Optional[datetime] = None
+        self.lookups = 0
+        self.positives = 0
+        self.syncs = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded and self._filter.count <= self._filter.capacity
+
+    def fill(self, jtis: Iterable[str]) -> None:
+        jtis = list(jtis)
+        bloom = BloomFilter(max(self.capacity, len(jtis) * 2), self.error_rate)
+        for jti in jtis:
+            bloom.add(jti)
+        self._filter = bloom
+        self._loaded = True
+
+    async def ensure_loaded(self, token_repository) -> None:
+        if not self.loaded:
+            started = datetime.now(timezone.utc)
+            self.fill(await token_repository.get_active_jtis())
+            self._since, self._synced_at = started, time.monotonic()
+        elif time.monotonic() - self._synced_at >= self.sync_seconds:
+            started = datetime.now(timezone.utc)
+            # claimed before the query, concurrent requests don't sync all at once
+            self._synced_at = time.monotonic()
+            since = (self._since or started) - timedelta(seconds=self.sync_overlap_seconds)
+            for jti in await token_repository.get_jtis_revoked_since(since):
+                self.add(jti)
+            self._since = started
+            self.syncs += 1
+
+    def invalidate(self) -> None:
+        self._loaded = False
+
+    def add(self, jti: str) -> None:
+        # the overlapping syncs see the same rows again, they don't count towards the capacity twice
+        if jti not in self._filter:
+            self._filter.add(jti)
+
+    def might_be_revoked(self, jti: str) -> bool:
+        self.lookups += 1
+        if jti in self._filter:
+            self.positives += 1
+            return True
+        return False
+
+
+revocation_store = RevocationStore(
+    capacity=settings.REVOCATION_FILTER_CAPACITY,
+    error_rate=settings.REVOCATION_FILTER_ERROR_RATE,
+    sync_seconds=settings.REVOCATION_FILTER_SYNC_SECONDS,
+    sync_overlap_seconds=settings.REVOCATION_FILTER_SYNC_OVERLAP_SECONDS,
+)
@@ -1,44 +1,72 @@
 from datetime import timedelta, timezone, datetime
 import uuid
-from passlib.context import CryptContext
 from fastapi import HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 # from sqlalchemy.orm import Session
 from jose import JWTError, jwt
+from sqlalchemy.exc import IntegrityError
 from models.users import User
 # from repositories.user_repository import UserRepository
 from dependencies.repositories import get_user_repository, UserRepository
+from repositories.user_repository import LOGIN_LOAD, PRINCIPAL_LOAD
 # from dependencies.services import get_user_service
-from typing import Tuple
+from typing import Optional, Tuple
 from schemas.token import TokenData
 from config import settings
+from services.hashing_service import pwd_context, password_hasher, needs_rehash
+from services.token_cache import Principal, token_cache
+from services.permission_service import permission_registry, has_permissions
+from services.login_tracker import login_tracker
+from repositories.role_repository import RoleRepository
+from repositories.token_repository import RevokedTokenRepository
+from services.revocation_service import revocation_store
+from db.unit_of_work import UnitOfWork
+from metrics import DEPENDENCY_DURATION, timed
 
 
-pwd_context = CryptContext(
-    schemes=["bcrypt"], deprecated="auto"
-)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 
+_TOKEN_DECODE_TIMER = DEPENDENCY_DURATION.labels("token_decode")
+_REVOCATION_CHECK_TIMER = DEPENDENCY_DURATION.labels("revocation_check")
+_USER_LOOKUP_TIMER = DEPENDENCY_DURATION.labels("user_lookup")
+
 class SecurityService:
 
-    def __init__(self, user_repo: get_user_repository):
+    def __init__(self, user_repo: get_user_repository, uow: Optional[UnitOfWork] = None):
         self.user_repo = user_repo
+        self.uow = uow or UnitOfWork(user_repo.db)
+        self.token_repo = RevokedTokenRepository(user_repo.db, user_repo.read_db)
+        self.revocation_store = revocation_store
         self.pwd_context = pwd_context
+        self.hasher = password_hasher
+        self.token_cache = token_cache
+        self.permission_registry = permission_registry
     
-    def get_password_hash(self, password: str) -> str:
-        """Hash password using bcrypt"""
-        return self.pwd_context.hash(password)
+    async def get_password_hash(self, password: str) -> str:
+        """Hash password using bcrypt (runs in the hashing pool)"""
+        return await self.hasher.hash(password)
     
     
-    def verify_password(self, plain_password: str, hashed_password: str) -> bool:
-        """Hash passwordn cheking"""
-        return self.pwd_context.verify(plain_password, hashed_password)
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+        """Hash passwordn cheking (runs in the hashing pool)"""
+        return await self.hasher.verify(plain_password, hashed_password)
+    
+    async def get_token_claims(self, user: User) -> dict:
+        """
+        Claims stamped into access tokens: subject, role names as `scopes`,
+        the compiled permission bitmask as `perms` and the user's token version as `ver`
+        """
+        await self.permission_registry.ensure_loaded(RoleRepository(self.user_repo.db, self.user_repo.read_db))
+        scopes, perms = self.permission_registry.resolve(role.id for role in user.roles)
+        return {"sub": str(user.id), "scopes": list(scopes), "perms": perms, "ver": user.token_version or 0}
     
     def create_access_token(self, data: dict, expires_delta: timedelta) -> str:
         to_encode = data.copy()
-        expire = datetime.now(timezone.utc) + expires_delta
+        now = datetime.now(timezone.utc)
+        expire = now + expires_delta
         to_encode.update({
             "exp": expire,
+            "iat": now,
             "type": "access",
             "jti": str(uuid.uuid4()),  
             "iss": settings.TOKEN_ISSUER  # Add to config
@@ -51,11 +79,13 @@ class SecurityService:
 
     def create_refresh_token(self, data: dict) -> str:
         to_encode = data.copy()
-        expire = datetime.now(timezone.utc) + timedelta(
+        now = datetime.now(timezone.utc)
+        expire = now + timedelta(
             days=settings.REFRESH_TOKEN_EXPIRE_DAYS  # Must exist in config
         )
         to_encode.update({
             "exp": expire,
+            "iat": now,
             "type": "refresh",
             "jti": str(uuid.uuid4()),
             "iss": settings.TOKEN_ISSUER
@@ -67,43 +97,42 @@ class SecurityService:
         )
 
     def decode_token(self, token: str) -> dict:
-        # return jwt.decode(
-        #     token,
-        #     settings.SECRET_KEY,
-        #     algorithms=[settings.ALGORITHM],
-        #     issuer=settings.TOKEN_ISSUER  # Validate issuer
-        # )
-        try:
-            print(f"Decoding token: {token}")  # Temporary debug
-            payload = jwt.decode(
-                token,
-                settings.SECRET_KEY,
-                algorithms=[settings.ALGORITHM],
-                issuer=settings.TOKEN_ISSUER
-            )
-            print(f"Token decoded successfully: {payload}")  # Temporary debug
-            return payload
-        except JWTError as e:
-            print(f"Token decoding failed: {str(e)}")  # This will show the exact error
-            raise
+        return jwt.decode(
+            token,
+            settings.SECRET_KEY,
+            algorithms=[settings.ALGORITHM],
+            issuer=settings.TOKEN_ISSUER  # Validate issuer
+        )
+
+    @staticmethod
+    def token_expires_at(payload: dict) -> datetime:
+        return datetime.fromtimestamp(payload["exp"], tz=timezone.utc)
 
     async def authenticate_user(self, email: str, password: str) -> User|None:
         """
         Authenticate user by email and password
         Returns User object if successful, None otherwise
         """
-        user = await self.user_repo.get_by_email(email)
+        user = await self.user_repo.get_by_email(email, options=LOGIN_LOAD)
         if not user:
             return None
-        if not self.verify_password(password, user.hashed_password):
+        if not await self.verify_password(password, user.hashed_password):
             return None
+        if needs_rehash(user.hashed_password):
+            # cost (or scheme) changed since this hash was made, upgrade it in the background
+            login_tracker.schedule_rehash(user.id, user.hashed_password, password, self.hasher)
         return user
         
-    async def get_current_user(self, token: str) -> User: 
+    async def get_current_user(self, token: str) -> Principal: 
         """
         Get current user from token
-        This is the core authentication dependency
+        This is the core authentication dependency,
+        verified tokens are served from the token cache without a DB round-trip
         """
+        cached = self.token_cache.get(token)
+        if cached is not None:
+            return cached.principal
+
         credentials_exception = HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
@@ -112,7 +141,8 @@ class SecurityService:
         
         try:
             # Decode token
-            payload = self.decode_token(token)
+            with timed(_TOKEN_DECODE_TIMER):
+                payload = self.decode_token(token)
             
             # Validate token type
             token_type = payload.get("type")
@@ -134,17 +164,37 @@ class SecurityService:
         except JWTError:
             raise credentials_exception
         
-        # Get user from database
-        user = await self.user_repo.get_by_id(int(token_data.user_id))
-        if user is None:
+        # Revoked tokens (logout), the filter answers "not revoked" without I/O
+        jti = payload.get("jti")
+        with timed(_REVOCATION_CHECK_TIMER):
+            await self.revocation_store.ensure_loaded(self.token_repo)
+            revoked = bool(jti) and self.revocation_store.might_be_revoked(jti) and await self.token_repo.is_revoked(jti)
+        if revoked:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token has been revoked",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        
+        # Get user from database, tokens issued before a logout-all carry an old version
+        with timed(_USER_LOOKUP_TIMER):
+            on_replica = self.user_repo.reader is not self.user_repo.db
+            user = await self.user_repo.get_by_id(int(token_data.user_id), options=PRINCIPAL_LOAD)
+            if user is None:
+                raise credentials_exception
+            # like the revocation check, the version that revokes tokens comes from the primary
+            version = await self.user_repo.get_token_version(user.id) if on_replica else user.token_version
+        if payload.get("ver", 0) != (version or 0):
             raise credentials_exception
         
-        return user
+        principal = Principal.from_user(user, payload)
+        self.token_cache.set(token, payload, principal)
+        return principal
     
     async def get_current_active_user(
         self,
-        current_user: User
-    ) -> User:
+        current_user: Principal
+    ) -> Principal:
         """
         Get current active user
         Checks if user is active
@@ -158,13 +208,13 @@ class SecurityService:
     
     async def get_current_active_admin(
         self,
-        current_user: User 
-    ) -> User:
+        current_user: Principal 
+    ) -> Principal:
         """
         Get current active admin user
-        Checks if user has admin privileges
+        Checks if user has admin privileges (from the token scopes, no roles join)
         """
-        if current_user.roles != "admin" and current_user.roles != "superuser":
+        if not current_user.is_superuser and not {"admin", "superuser"} & set(current_user.roles):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Not enough permissions"
@@ -173,24 +223,48 @@ class SecurityService:
     
     async def get_current_superuser(
         self,
-        current_user: User
-    ) -> User:
+        current_user: Principal
+    ) -> Principal:
         """
         Get current superuser
         Checks if user is superuser
         """
-        if current_user.roles != "superuser":
+        if not current_user.is_superuser and "superuser" not in current_user.roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Superuser privileges required"
             )
         return current_user
     
+    async def require_permissions(
+        self,
+        current_user: Principal,
+        *permission_names: str
+    ) -> Principal:
+        """
+        Checks the token permission mask against the named permissions
+        Superusers and admins (token scopes) pass every check, the mask grants single permissions to other roles
+        """
+        if current_user.is_superuser or {"admin", "superuser"} & set(current_user.roles):
+            return current_user
+        await self.permission_registry.ensure_loaded(RoleRepository(self.user_repo.db, self.user_repo.read_db))
+        try:
+            required = self.permission_registry.mask_of(*permission_names)
+        except KeyError:
+            required = None
+        if required is None or not has_permissions(current_user.permissions, required):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not enough permissions"
+            )
+        return current_user
+    
     # Login & Token Management
     async def login_user(
         self,
         email: str,
-        password: str
+        password: str,
+        client_ip: Optional[str] = None
     ) -> Tuple[str, str]:
         """
         Handle user login
@@ -204,67 +278,113 @@ class SecurityService:
                 headers={"WWW-Authenticate": "Bearer"},
             )
         
-        # Create tokens
+        access_token, refresh_token = await self.issue_tokens(user)
+        
+        # last_login/login_count are written behind, in batches, off the request path
+        login_tracker.record(user.id, client_ip)
+        
+        return access_token, refresh_token
+    
+    async def issue_tokens(self, user: User) -> Tuple[str, str]:
+        """New (access_token, refresh_token) pair for a loaded user (LOGIN_LOAD)"""
+        claims = await self.get_token_claims(user)
         access_token = self.create_access_token(
-            data={"sub": str(user.id)},
+            data=claims,
             expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
         )
-        
         refresh_token = self.create_refresh_token(
-            data={"sub": str(user.id)}
+            data={"sub": claims["sub"], "ver": claims["ver"]}
         )
-        
-        # Update last login timestamp
-        # await self.user_repo.update_last_login(user.id)
-        
         return access_token, refresh_token
     
-    async def refresh_access_token(self, refresh_token: str) -> str:
+    async def refresh_access_token(self, refresh_token: str) -> Tuple[str, str]:
         """
-        Refresh access token using refresh token
-        Returns new access token
+        Refresh token rotation
+        Every refresh token is single use: its jti is recorded as revoked and a new pair is issued.
+        Presenting an already used one again means it leaked, every session of the user is ended.
+        Returns (access_token, refresh_token)
         """
+        invalid_token = HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
         try:
             # Decode refresh token
             payload = self.decode_token(refresh_token)
-            
-            # Validate token type
-            if payload.get("type") != "refresh":
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Invalid token type for refresh",
-                    headers={"WWW-Authenticate": "Bearer"},
-                )
-            
-            # Get user ID
-            user_id = payload.get("sub")
-            if not user_id:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Invalid refresh token",
-                    headers={"WWW-Authenticate": "Bearer"},
-                )
-            
-            # Verify user exists
-            user = await self.user_repository.get_by_id(int(user_id))
-            if not user or not user.is_active:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="User not found or inactive",
-                    headers={"WWW-Authenticate": "Bearer"},
-                )
-            
-            # Create new access token
-            new_access_token = self.create_access_token(
-                data={"sub": str(user.id)},
-                expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-            )
-            
-            return new_access_token
-            
         except JWTError:
+            raise invalid_token
+        
+        # Validate token type
+        if payload.get("type") != "refresh":
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid refresh token",
+                detail="Invalid token type for refresh",
                 headers={"WWW-Authenticate": "Bearer"},
-            )
\ No newline at end of file
+            )
+        
+        user_id = payload.get("sub")
+        jti = payload.get("jti")
+        if not user_id or not jti:
+            raise invalid_token
+        
+        # Verify user exists and the token predates no logout-all, on the primary (this request writes anyway)
+        self.user_repo.pin_primary()
+        user = await self.user_repo.get_by_id(int(user_id), options=LOGIN_LOAD)
+        if not user or not user.is_active:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found or inactive",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        if payload.get("ver", 0) != (user.token_version or 0):
+            raise invalid_token
+        
+        user_id = user.id
+        try:
+            # the jti primary key makes concurrent refreshes with one token race-free, only one wins
+            await self.token_repo.revoke(jti, user_id, "refresh", self.token_expires_at(payload))
+            tokens = await self.issue_tokens(user)
+            await self.uow.commit()
+        except IntegrityError:
+            await self.uow.rollback()
+            await self.user_repo.bump_token_version(user_id)
+            await self.uow.commit()
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Refresh token reuse detected, all sessions have been revoked",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        return tokens
+    
+    async def logout(self, access_token: str, refresh_token: Optional[str] = None) -> None:
+        """
+        End one session: the access token stops working right away,
+        the refresh token (when given, and only if it belongs to the same user) can't be rotated anymore
+        """
+        principal = await self.get_current_user(access_token)
+        payload = self.decode_token(access_token)
+        await self.token_repo.revoke(
+            payload["jti"], principal.id, "access", self.token_expires_at(payload), ignore_existing=True
+        )
+        if refresh_token:
+            try:
+                refresh_payload = self.decode_token(refresh_token)
+            except JWTError:
+                refresh_payload = {}
+            if (
+                refresh_payload.get("type") == "refresh"
+                and refresh_payload.get("sub") == str(principal.id)
+                and refresh_payload.get("jti")
+            ):
+                await self.token_repo.revoke(
+                    refresh_payload["jti"], principal.id, "refresh",
+                    self.token_expires_at(refresh_payload), ignore_existing=True
+                )
+        await self.uow.commit()
+        self.token_cache.discard(access_token)
+    
+    async def logout_all(self, current_user: Principal) -> None:
+        """End every session of the user by bumping the version stamped into their tokens"""
+        await self.user_repo.bump_token_version(current_user.id)
+        await self.uow.commit()
@@ -0,0 +1,68 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class _LeaderCancelled(Exception):
+    """The caller running a flight was cancelled, whoever waited on it runs the call itself"""
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one execution (per event loop / worker).
+    The first caller (the leader) runs `fn()` itself, in its own task, so whatever it uses
+    (its request's session and connection) is not held on behalf of anyone else; callers arriving
+    meanwhile wait for its outcome and all of them get the result or the exception.
+    A waiter that is cancelled only stops waiting. A cancelled leader cancels its call,
+    its waiters then start over and one of them leads the next flight.
+    Nothing is kept after a flight lands, this dedupes concurrent work, it is not a cache.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, asyncio.Future] = {}
+        self.started = 0
+        self.joined = 0
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        while True:
+            flight = self._flights.get(key)
+            if flight is None:
+                break
+            self.joined += 1
+            try:
+                # shielded: a cancelled waiter must not cancel the outcome the others wait for
+                return await asyncio.shield(flight)
+            except _LeaderCancelled:
+                continue
+        flight = self._flights[key] = asyncio.get_running_loop().create_future()
+        # nobody may have waited, don't let an unretrieved exception be logged at garbage collection
+        flight.add_done_callback(lambda future: future.cancelled() or future.exception())
+        self.started += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            self._land(key, flight)
+            flight.set_exception(_LeaderCancelled())
+            raise
+        except BaseException as error:
+            self._land(key, flight)
+            flight.set_exception(error)
+            raise
+        self._land(key, flight)
+        flight.set_result(result)
+        return result
+
+    def forget(self) -> None:
+        """Calls from now on start new flights, the running ones still answer their current waiters"""
+        self._flights.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"started": self.started, "joined": self.joined, "in_flight": len(self._flights)}
+
+    def _land(self, key: Hashable, flight: asyncio.Future) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
@@ -0,0 +1,134 @@
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Optional, Set, Tuple
+from config import settings
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Compact, session-independent snapshot of the authenticated user"""
+    id: int
+    email: str
+    username: str
+    is_active: bool
+    is_superuser: bool
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    roles: Tuple[str, ...] = ()
+    permissions: int = 0
+
+    @classmethod
+    def from_user(cls, user, claims: dict) -> "Principal":
+        """Roles and permission mask come from the token claims, not from a roles join"""
+        return cls(
+            id=user.id,
+            email=user.email,
+            username=user.username,
+            is_active=bool(user.is_active),
+            is_superuser=bool(user.is_superuser),
+            created_at=user.created_at,
+            updated_at=user.updated_at,
+            roles=tuple(claims.get("scopes", ())),
+            permissions=int(claims.get("perms", 0)),
+        )
+
+
+@dataclass
+class CachedToken:
+    claims: dict
+    principal: Principal
+    expires_at: float
+    key: bytes = field(repr=False, default=b"")
+
+
+class TokenCache:
+    """
+    Bounded LRU + TTL cache of verified access tokens.
+    Keys are a digest of the raw token so the tokens themselves are never kept around,
+    entries never outlive the token's own `exp`.
+    """
+
+    def __init__(self, max_entries: int = 10_000, ttl_seconds: float = 60):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[bytes, CachedToken]" = OrderedDict()
+        self._by_user: Dict[int, Set[bytes]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+    def get(self, token: str) -> Optional[CachedToken]:
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires_at <= time.time():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def set(self, token: str, claims: dict, principal: Principal) -> None:
+        if self.max_entries <= 0:
+            return
+        expires_at = time.time() + self.ttl_seconds
+        exp = claims.get("exp")
+        if exp is not None:
+            expires_at = min(expires_at, float(exp))
+        key = self._key(token)
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = CachedToken(claims=claims, principal=principal, expires_at=expires_at, key=key)
+        self._by_user.setdefault(principal.id, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: bytes) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._by_user.get(entry.principal.id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[entry.principal.id]
+
+    def discard(self, token: str) -> None:
+        """Forget one token (logout)"""
+        self._remove(self._key(token))
+
+    def discard_jti(self, user_id: int, jti: str) -> None:
+        """Forget one token by its jti (revoked in another worker, which only sent the jti)"""
+        for key in list(self._by_user.get(user_id, ())):
+            if self._entries[key].claims.get("jti") == jti:
+                self._remove(key)
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Drop every cached token of a user (call after the user row changes)"""
+        for key in list(self._by_user.get(user_id, ())):
+            self._remove(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._by_user.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+token_cache = TokenCache(
+    max_entries=settings.TOKEN_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.TOKEN_CACHE_TTL_SECONDS,
+)
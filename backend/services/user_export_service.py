@@ -0,0 +1,68 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Callable, Literal
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.session import SessionLocal, new_replica_session
+from repositories.user_repository import UserRepository, EXPORT_COLUMNS
+
+ExportFormat = Literal["ndjson", "csv"]
+
+EXPORT_FIELDS = [column.key for column in EXPORT_COLUMNS]
+
+
+def _default_session() -> AsyncSession:
+    # exports are pure reads, prefer a replica
+    return new_replica_session() or SessionLocal()
+
+
+def _jsonable(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+class UserExportService:
+    """
+    Streams the user table as NDJSON or CSV, optionally gzip compressed.
+    The export owns its session: the response body is produced after request dependencies
+    (and the session from get_db) are already closed.
+    """
+
+    def __init__(self, session_factory: Callable[[], AsyncSession] = _default_session, rows_per_chunk: int = 500):
+        self.session_factory = session_factory
+        self.rows_per_chunk = rows_per_chunk
+
+    async def export(self, format: ExportFormat, compress: bool = False) -> AsyncIterator[bytes]:
+        encoder = zlib.compressobj(wbits=31) if compress else None  # wbits=31 -> gzip container
+        async for chunk in self._serialize(format):
+            if encoder is None:
+                yield chunk
+                continue
+            compressed = encoder.compress(chunk)
+            if compressed:
+                yield compressed
+        if encoder is not None:
+            yield encoder.flush()
+
+    async def _serialize(self, format: ExportFormat) -> AsyncIterator[bytes]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer) if format == "csv" else None
+        if writer is not None:
+            writer.writerow(EXPORT_FIELDS)
+        pending = 0
+        async with self.session_factory() as session:
+            async for row in UserRepository(session).stream_export_rows():
+                if writer is not None:
+                    writer.writerow(_jsonable(value) for value in row)
+                else:
+                    buffer.write(json.dumps(dict(zip(EXPORT_FIELDS, map(_jsonable, row))), separators=(",", ":")))
+                    buffer.write("\n")
+                pending += 1
+                if pending >= self.rows_per_chunk:
+                    yield buffer.getvalue().encode()
+                    buffer.seek(0)
+                    buffer.truncate()
+                    pending = 0
+        if buffer.tell():
+            yield buffer.getvalue().encode()
@@ -0,0 +1,171 @@
+import asyncio
+import codecs
+import csv
+import io
+import json
+from itertools import islice
+from typing import BinaryIO, Dict, Iterator, List, Literal, Optional, TextIO, Tuple
+from fastapi import HTTPException, UploadFile, status
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
+from config import settings
+from db.unit_of_work import UnitOfWork
+from repositories.user_repository import UserRepository
+from schemas.users_scheme import UserCreate, UserImportError, UserImportReport
+from services.hashing_service import PasswordHasher, import_password_hasher
+
+ImportFormat = Literal["csv", "ndjson"]
+
+
+class UserImportService:
+    """
+    Streams users from CSV (header row, then one record per row, quoted fields may span lines)
+    or NDJSON, validates each row with UserCreate, hashes a batch at a time across the import process pool
+    and inserts it with one multi-row INSERT. Only one batch is held in memory at a time.
+    """
+
+    def __init__(
+        self,
+        user_repository: UserRepository,
+        hasher: PasswordHasher = import_password_hasher,
+        batch_size: int = settings.USER_IMPORT_BATCH_SIZE,
+        max_errors: int = settings.USER_IMPORT_MAX_ERRORS,
+    ):
+        self.user_repository = user_repository
+        self.hasher = hasher
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+
+    async def import_users(self, stream: TextIO, format: ImportFormat) -> UserImportReport:
+        report = UserImportReport()
+        batch: List[Tuple[int, UserCreate]] = []
+        async for line_no, row in self._records(stream, format, report):
+            try:
+                batch.append((line_no, UserCreate(**row)))
+            except ValidationError as e:
+                first = e.errors()[0]
+                field = ".".join(str(part) for part in first["loc"]) or None
+                self._reject(report, line_no, field, first["msg"])
+                continue
+            except TypeError:
+                self._reject(report, line_no, None, "Row must be an object")
+                continue
+            if len(batch) >= self.batch_size:
+                await self._flush(batch, report)
+                batch = []
+        if batch:
+            await self._flush(batch, report)
+        return report
+
+    async def _records(self, stream: TextIO, format: ImportFormat, report: UserImportReport):
+        records = self._parse(stream, format, report)
+        while True:
+            chunk = await asyncio.to_thread(list, islice(records, self.batch_size))
+            if not chunk:
+                return
+            for record in chunk:
+                yield record
+
+    def _parse(self, stream: TextIO, format: ImportFormat, report: UserImportReport) -> Iterator[Tuple[int, object]]:
+        # blocking reads, import_users pulls from it on a worker thread
+        if format == "ndjson":
+            for line_no, line in enumerate(stream, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_no, json.loads(line)
+                except json.JSONDecodeError as e:
+                    self._reject(report, line_no, None, f"Invalid JSON: {e.msg}")
+            return
+        # one reader over the whole stream: quoted fields may span lines and values are kept verbatim
+        reader = csv.reader(stream)
+        header: Optional[List[str]] = None
+        line_no = 1
+        for values in reader:
+            record_line, line_no = line_no, reader.line_num + 1
+            if not any(value.strip() for value in values):
+                continue
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            if len(values) != len(header):
+                self._reject(report, record_line, None, f"Expected {len(header)} columns, got {len(values)}")
+                continue
+            yield record_line, dict(zip(header, values))
+
+    def _reject(self, report: UserImportReport, line_no: int, field: Optional[str], message: str) -> None:
+        report.failed += 1
+        if len(report.errors) < self.max_errors:
+            report.errors.append(UserImportError(line=line_no, field=field, message=message))
+        else:
+            report.errors_truncated = True
+
+    async def _flush(self, batch: List[Tuple[int, UserCreate]], report: UserImportReport) -> None:
+        # duplicates inside the batch and against the table, one query for the whole batch
+        taken_emails, taken_usernames = await self.user_repository.find_taken(
+            (user.email for _, user in batch), (user.username for _, user in batch)
+        )
+        accepted: List[Tuple[int, UserCreate]] = []
+        for line_no, user in batch:
+            if user.email in taken_emails:
+                self._reject(report, line_no, "email", "Email already registered")
+            elif user.username in taken_usernames:
+                self._reject(report, line_no, "username", "Username already taken")
+            else:
+                taken_emails.add(user.email)
+                taken_usernames.add(user.username)
+                accepted.append((line_no, user))
+        if not accepted:
+            return
+
+        hashes = await asyncio.gather(*(self.hasher.hash(user.password) for _, user in accepted))
+        rows: List[Dict] = [
+            {"email": user.email, "username": user.username, "hashed_password": hashed, "is_active": True, "is_superuser": False}
+            for (_, user), hashed in zip(accepted, hashes)
+        ]
+        uow = UnitOfWork(self.user_repository.db)
+        try:
+            await self.user_repository.bulk_insert(rows)
+            await uow.commit()
+            report.created += len(rows)
+            return
+        except IntegrityError:
+            # someone registered one of these users meanwhile, retry row by row to pin the conflicts down
+            await uow.rollback()
+        for (line_no, _), row in zip(accepted, rows):
+            try:
+                await self.user_repository.insert_one(row)
+                report.created += 1
+            except IntegrityError:
+                self._reject(report, line_no, None, "Email or username already exists")
+        await uow.commit()
+
+
+def _not_utf8(line_no: int) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"File is not UTF-8 text (line {line_no})")
+
+
+def _checked_utf8(binary: BinaryIO) -> TextIO:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    line_no = 1
+    for chunk in iter(lambda: binary.read(64 * 1024), b""):
+        try:
+            decoder.decode(chunk)
+        except UnicodeDecodeError as e:
+            raise _not_utf8(line_no + chunk.count(b"\n", 0, e.start))
+        line_no += chunk.count(b"\n")
+    try:
+        decoder.decode(b"", final=True)  # a multi-byte sequence cut off at the end
+    except UnicodeDecodeError:
+        raise _not_utf8(line_no)
+    binary.seek(0)
+    return io.TextIOWrapper(binary, encoding="utf-8-sig", newline="")
+
+
+async def open_upload(upload: UploadFile) -> TextIO:
+    """
+    Text stream over an uploaded file (already spooled by the time the endpoint runs).
+    The whole file is checked to be UTF-8 first, so a wrong encoding is a 400 before anything is imported
+    """
+    await upload.seek(0)
+    return await asyncio.to_thread(_checked_utf8, upload.file)
@@ -9,46 +9,69 @@
 # from sqlalchemy.ext.asyncio import AsyncSession
 # import asyncio
 
-from typing import Optional
+from typing import Any, Dict, Literal, Optional
 from fastapi import HTTPException, status
+from sqlalchemy.exc import IntegrityError
+from config import settings
 from repositories.user_repository import UserRepository
 from services.security_service import SecurityService
-from schemas.users_scheme import UserCreate, UserResponse
+from schemas.users_scheme import UserCreate, UserResponse, UserSearch, user_response_serializer
+from repositories.pagination import InvalidCursor
 from models.users import User
+from services.token_cache import Principal
+from db.unit_of_work import UnitOfWork
+
+# list endpoints select just the UserResponse columns, no ORM objects are built for them
+USER_RESPONSE_COLUMNS = user_response_serializer.columns_for(User)
 
 class UserService:
-    def __init__(self, user_repository: UserRepository, security_service: SecurityService):
+    def __init__(self, user_repository: UserRepository, security_service: SecurityService, uow: UnitOfWork):
         self.user_repository = user_repository
         self.security_service = security_service
+        self.uow = uow
     
     async def create_user(self, user_in: UserCreate) -> UserResponse:
         """Business logic: Create user with validation"""
-        # Check if email already exists
-        existing_user = await self.user_repository.get_by_email(user_in.email)
-        if existing_user:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Email already registered"
-            )
+        # uniqueness checks must see the latest writes, keep the whole flow on the primary
+        self.user_repository.pin_primary()
         
-        # Check if username already exists
-        existing_username = await self.user_repository.get_by_username(user_in.username)
-        if existing_username:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Username already taken"
-            )
+        # Optional pre-check (email and username in one query) so duplicates don't cost a bcrypt hash
+        if settings.REGISTRATION_PRECHECK:
+            taken_emails, taken_usernames = await self.user_repository.find_taken([user_in.email], [user_in.username])
+            # both sets hold every matching row's values, another user may own the other one
+            if user_in.email in taken_emails:
+                raise self._conflict("email")
+            if user_in.username in taken_usernames:
+                raise self._conflict("username")
         
         # Hashing
-        hashed_password = self.security_service.get_password_hash(user_in.password)
+        hashed_password = await self.security_service.get_password_hash(user_in.password)
 
-        
-        user = await self.user_repository.create_user_with_hashed_password(
-            user_in=user_in,
-            hashed_password=hashed_password  
-        )
+        # the unique indexes are the real guard, a racing signup surfaces as IntegrityError
+        try:
+            user = await self.user_repository.create_user_with_hashed_password(
+                user_in=user_in,
+                hashed_password=hashed_password  
+            )
+            await self.uow.commit()
+        except IntegrityError as e:
+            await self.uow.rollback()
+            raise self._conflict(self.user_repository.conflicting_field(e))
         return UserResponse.model_validate(user)
     
+    @staticmethod
+    def _conflict(field: Optional[str]) -> HTTPException:
+        if field == "email":
+            detail = "Email already registered"
+        elif field == "username":
+            detail = "Username already taken"
+        else:
+            detail = "User already exists"
+        return HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=detail
+        )
+    
     async def get_user_by_id(self, user_id: int) -> Optional[UserResponse]:
         """Get user by ID with business logic"""
         user = await self.user_repository.get_by_id(user_id)
@@ -59,7 +82,61 @@ class UserService:
             )
         return UserResponse.model_validate(user)
     
-    async def get_current_user(self, current_user: User) -> UserResponse:
+    async def list_users(
+        self,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        active_only: bool = False,
+        total: Literal["none", "cached", "approximate"] = "none"
+    ) -> Dict[str, Any]:
+        """
+        Keyset paginated user listing, the total is only computed when asked for
+        Returns the CursorPage[UserResponse] payload, built from row tuples without validation
+        """
+        try:
+            if active_only:
+                users, next_cursor = await self.user_repository.get_active_users_page(
+                    limit=limit, cursor=cursor, columns=USER_RESPONSE_COLUMNS
+                )
+            else:
+                users, next_cursor = await self.user_repository.get_page(
+                    limit=limit, cursor=cursor, columns=USER_RESPONSE_COLUMNS
+                )
+        except InvalidCursor as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+        
+        count, is_estimate = None, False
+        if total == "cached":
+            count = await self.user_repository.count_users_cached(active_only=active_only)
+        elif total == "approximate":
+            count, is_estimate = await self.user_repository.estimate_users(active_only=active_only)
+        
+        return {
+            "items": user_response_serializer.rows(users),
+            "next_cursor": next_cursor,
+            "total": count,
+            "total_is_estimate": is_estimate,
+        }
+    
+    async def search_users(self, criteria: UserSearch) -> Dict[str, Any]:
+        """Filtered, sorted user search, returns the OffsetPage[UserResponse] payload"""
+        if criteria.full_name:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Searching by full_name is not supported"
+            )
+        users, has_next = await self.user_repository.search(criteria, columns=USER_RESPONSE_COLUMNS)
+        return {
+            "items": user_response_serializer.rows(users),
+            "page": criteria.page,
+            "page_size": criteria.page_size,
+            "has_next": has_next,
+        }
+    
+    async def get_current_user(self, current_user: Principal) -> UserResponse:
         """Get current user profile"""
         if not current_user.is_active:
             raise HTTPException(
@@ -0,0 +1,15 @@
+"""
+Tests boot main.app in-process (see benchmarks.harness) against a throwaway SQLite file.
+The environment has to be set before anything imports config, hence module level here.
+"""
+import os
+import tempfile
+
+os.environ.setdefault("DATABASE_URL_TEST", f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(prefix='tma-test-'), 'test.db')}")
+os.environ.setdefault("SECRET_KEY", "test-secret-key-not-for-production")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("PASSWORD_HASH_ROUNDS", "4")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+# the periodic revocation filter sync would add a query to whichever request happens to trigger it
+os.environ.setdefault("REVOCATION_FILTER_SYNC_SECONDS", "3600")
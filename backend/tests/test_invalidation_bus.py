@@ -0,0 +1,11 @@
+"""Logout and logout-all reach every worker of the host through the unix socket bus"""
+import argparse
+from benchmarks.invalidation_workers import run
+
+
+def test_revocations_reach_the_other_workers(monkeypatch):
+    # the workers share a database of their own, not the one of this test session
+    monkeypatch.delenv("DATABASE_URL_TEST")
+    result = run(argparse.Namespace(workers=2, transport="unix", timeout=2.0))
+    assert result["logout"]["stale_workers"] == 0
+    assert result["logout_all"]["stale_workers"] == 0
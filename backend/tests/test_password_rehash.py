@@ -0,0 +1,73 @@
+"""bcrypt cost: logins upgrade weaker hashes in the background, calibration is shared by the workers"""
+import os
+from sqlalchemy import select
+from benchmarks.harness import app_client, run
+from services.hashing_service import current_rounds, needs_rehash, set_rounds, shared_calibration
+from services.login_tracker import login_tracker
+
+PASSWORD = "rehash-password"
+
+
+def stored_hash(email: str):
+    async def read():
+        from db.session import SessionLocal
+        from models.users import User
+
+        async with SessionLocal() as session:
+            return (await session.execute(select(User.hashed_password).where(User.email == email))).scalar_one()
+    return read()
+
+
+def test_rehash_is_written_with_login_tracking_disabled(monkeypatch):
+    monkeypatch.setattr(login_tracker, "enabled", False)
+    email = "rehash-untracked@example.com"
+    rounds = current_rounds()
+
+    async def scenario():
+        async with app_client() as client:
+            await client.post("/register/user", json={"email": email, "username": "rehashuntracked", "password": PASSWORD})
+            set_rounds(rounds + 1)
+            response = await client.post("/login", data={"username": email, "password": PASSWORD})
+            assert response.status_code == 200
+        # shutting the app down flushed the tracker
+        return await stored_hash(email)
+
+    try:
+        hashed = run(scenario())
+    finally:
+        set_rounds(rounds)
+    assert hashed.startswith(f"$2b${rounds + 1:02d}$")
+
+
+def test_stronger_hash_is_kept():
+    email = "rehash-stronger@example.com"
+    rounds = current_rounds()
+
+    async def scenario():
+        async with app_client() as client:
+            set_rounds(rounds + 1)  # e.g. another worker calibrated higher
+            await client.post("/register/user", json={"email": email, "username": "rehashstronger", "password": PASSWORD})
+            set_rounds(rounds)
+            response = await client.post("/login", data={"username": email, "password": PASSWORD})
+            assert response.status_code == 200
+        return await stored_hash(email)
+
+    try:
+        hashed = run(scenario())
+    finally:
+        set_rounds(rounds)
+    assert hashed.startswith(f"$2b${rounds + 1:02d}$")
+    assert not needs_rehash(hashed)
+
+
+def test_calibration_is_measured_once_per_host(tmp_path):
+    os.chmod(tmp_path, 0o700)
+    path = str(tmp_path / "bcrypt-rounds")
+    measured = []
+
+    def calibrate() -> int:
+        measured.append(1)
+        return 12
+    assert [shared_calibration(path, 60, calibrate) for _ in range(3)] == [12, 12, 12]
+    assert len(measured) == 1
+    assert shared_calibration(path, 0, calibrate) == 12 and len(measured) == 2  # too old, measured again
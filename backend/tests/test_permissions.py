@@ -0,0 +1,48 @@
+"""Permission masks: dense bit positions, and the route guards that check them"""
+from jose import jwt
+from sqlalchemy import insert, select
+from benchmarks.harness import app_client, register_and_login, run
+from services.permission_service import USERS_READ, permission_registry
+
+PASSWORD = "permission-password"
+
+
+def test_granted_permission_opens_the_admin_listing_only():
+    async def scenario():
+        from db.session import SessionLocal, init_db
+        from models.permission import Permission
+        from models.role import Role
+        from models.role_permission import role_permission
+        from models.user_role import user_role
+        from models.users import User
+
+        await init_db()
+        async with SessionLocal() as session:
+            # sparse ids, as left behind by deleted permissions: the mask must not follow them
+            await session.execute(insert(Permission), [{"id": 1000, "name": USERS_READ}, {"id": 5000, "name": "reports:read"}])
+            role_id = (await session.execute(insert(Role).returning(Role.id), [{"name": "reader"}])).scalar_one()
+            await session.execute(insert(role_permission), [{"role_id": role_id, "permission_id": 1000}])
+            await session.commit()
+        permission_registry.invalidate()
+
+        async with app_client() as client:  # startup gives the new permissions their bits
+            await register_and_login(client, "reader@example.com", "reader", PASSWORD)
+            plain = await register_and_login(client, "plain@example.com", "plainuser", PASSWORD)
+            async with SessionLocal() as session:
+                bits = dict((await session.execute(select(Permission.name, Permission.bit))).all())
+                reader_id = (await session.execute(select(User.id).where(User.username == "reader"))).scalar_one()
+                await session.execute(insert(user_role), [{"user_id": reader_id, "role_id": role_id}])
+                await session.commit()
+            reader = await register_and_login(client, "reader@example.com", "reader", PASSWORD)
+
+            statuses = {
+                "reader_list": (await client.get("/users", headers={"Authorization": f"Bearer {reader}"})).status_code,
+                "reader_export": (await client.get("/users/export", headers={"Authorization": f"Bearer {reader}"})).status_code,
+                "plain_list": (await client.get("/users", headers={"Authorization": f"Bearer {plain}"})).status_code,
+            }
+        return bits, jwt.get_unverified_claims(reader)["perms"], statuses
+
+    bits, perms, statuses = run(scenario())
+    assert sorted(bits.values()) == [0, 1]
+    assert perms == 1 << bits[USERS_READ]
+    assert statuses == {"reader_list": 200, "reader_export": 403, "plain_list": 403}
@@ -0,0 +1,53 @@
+"""SQL statements per request on the auth hot path, counted at the engine"""
+from contextlib import contextmanager
+from typing import Iterator, List
+from sqlalchemy import event
+from benchmarks.harness import app_client, register_and_login, run
+
+PASSWORD = "query-count-password"
+
+
+@contextmanager
+def statements() -> Iterator[List[str]]:
+    """Every statement the primary engine executes inside the block"""
+    from db.session import engine
+
+    executed: List[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    try:
+        yield executed
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+
+def test_login_and_me_query_counts():
+    async def scenario():
+        from services.token_cache import token_cache
+
+        counts = {}
+        async with app_client() as client:
+            await register_and_login(client, "counted@example.com", "counteduser", PASSWORD)
+
+            with statements() as executed:
+                response = await client.post("/login", data={"username": "counted@example.com", "password": PASSWORD})
+            assert response.status_code == 200
+            counts["login"] = len(executed)
+            headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+            token_cache.clear()  # authenticate from the database
+            with statements() as executed:
+                response = await client.get("/me", headers=headers)
+            assert response.status_code == 200
+            counts["me"] = len(executed)
+
+            with statements() as executed:
+                response = await client.get("/me", headers=headers)
+            assert response.status_code == 200
+            counts["me_cached_token"] = len(executed)
+        return counts
+
+    # login: user, hash and role ids in one joined SELECT; /me: one principal SELECT, none once the token is cached
+    assert run(scenario()) == {"login": 1, "me": 1, "me_cached_token": 0}
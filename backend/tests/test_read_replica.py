@@ -0,0 +1,126 @@
+"""
+Replica routing with a second SQLite file standing in for the replica. It is only synced
+from the primary when the test says so, anything read from it afterwards is visibly stale.
+"""
+import sqlite3
+from contextlib import contextmanager
+from itertools import cycle
+from typing import Dict, Iterator, List
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+import db.session
+from benchmarks.harness import app_client, run
+from config import settings
+from repositories.user_repository import UserRepository
+
+PASSWORD = "replica-password"
+
+
+class Replica:
+    def __init__(self, path: str):
+        self.path = path
+        self.engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        self.sessions = sessionmaker(bind=self.engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+    def sync(self) -> None:
+        """Copy the primary as it is now (replication catching up)"""
+        source = sqlite3.connect(make_url(settings.DATABASE_URL).database)
+        target = sqlite3.connect(self.path)
+        try:
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
+
+
+@pytest.fixture
+def replica(tmp_path, monkeypatch) -> Replica:
+    # DATABASE_REPLICA_URLS is read at import, route get_read_db to this replica instead
+    replica = Replica(str(tmp_path / "replica.db"))
+    monkeypatch.setattr(db.session, "_replica_cycle", cycle([replica.sessions]))
+    return replica
+
+
+@contextmanager
+def statements(replica: Replica) -> Iterator[Dict[str, List[str]]]:
+    """Statements each database executes inside the block"""
+    executed: Dict[str, List[str]] = {"primary": [], "replica": []}
+    listeners = []
+    for name, engine in (("primary", db.session.engine), ("replica", replica.engine)):
+        def record(conn, cursor, statement, parameters, context, executemany, log=executed[name]):
+            log.append(statement)
+        event.listen(engine.sync_engine, "before_cursor_execute", record)
+        listeners.append((engine, record))
+    try:
+        yield executed
+    finally:
+        for engine, record in listeners:
+            event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+
+def touches(statements: List[str], table: str) -> bool:
+    return any(table in statement for statement in statements)
+
+
+def test_reads_go_to_the_replica_writes_and_revocations_to_the_primary(replica):
+    async def scenario():
+        from services.token_cache import token_cache
+
+        try:
+            async with app_client() as client:
+                user = {"email": "replica@example.com", "username": "replicauser", "password": PASSWORD}
+                credentials = {"username": user["email"], "password": PASSWORD}
+
+                # a write, and the reads of its flow (duplicate check, response) stay on the primary
+                with statements(replica) as executed:
+                    response = await client.post("/register/user", json=user)
+                assert response.status_code == 201
+                assert touches(executed["primary"], "INSERT") and executed["replica"] == []
+
+                replica.sync()
+                with statements(replica) as executed:
+                    response = await client.post("/login", data=credentials)
+                assert response.status_code == 200
+                assert touches(executed["replica"], "FROM user") and not touches(executed["primary"], "FROM user")
+                logged_out = {"Authorization": f"Bearer {response.json()['access_token']}"}
+                response = await client.post("/login", data=credentials)
+                signed_out = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+                token_cache.clear()
+                with statements(replica) as executed:
+                    response = await client.get("/me", headers=logged_out)
+                assert response.status_code == 200
+                # the principal comes from the replica, only the version that revokes tokens from the primary
+                assert len(executed["replica"]) == 1
+                assert len(executed["primary"]) == 1 and touches(executed["primary"], "token_version")
+
+                # revocations are written to the primary and the replica isn't synced: checks must not read it
+                assert (await client.post("/logout", headers=logged_out, json={})).status_code == 204
+                token_cache.clear()
+                with statements(replica) as executed:
+                    response = await client.get("/me", headers=logged_out)
+                assert response.status_code == 401
+                assert touches(executed["primary"], "revokedtoken") and not touches(executed["replica"], "revokedtoken")
+
+                assert (await client.post("/logout-all", headers=signed_out)).status_code == 204
+                token_cache.clear()
+                with statements(replica) as executed:
+                    response = await client.get("/me", headers=signed_out)
+                assert response.status_code == 401  # the replica still has the old token_version
+                assert touches(executed["primary"], "token_version")
+
+                # once a request wrote (or pinned), its reads see the primary
+                async with db.session.SessionLocal() as session, replica.sessions() as read_session:
+                    repository = UserRepository(session, read_session)
+                    with statements(replica) as executed:
+                        await repository.get_by_email(user["email"])
+                        repository.pin_primary()
+                        await repository.get_by_email(user["email"])
+                    assert len(executed["replica"]) == 1 and len(executed["primary"]) == 1
+        finally:
+            await replica.engine.dispose()
+
+    run(scenario())
@@ -0,0 +1,28 @@
+"""Duplicate registrations name the field that is actually taken, with and without the pre-check"""
+import pytest
+from config import settings
+from benchmarks.harness import app_client, run
+
+PASSWORD = "registration-password"
+
+
+@pytest.mark.parametrize("precheck", [True, False])
+def test_conflict_names_the_taken_field(monkeypatch, precheck):
+    monkeypatch.setattr(settings, "REGISTRATION_PRECHECK", precheck)
+    suffix = "pre" if precheck else "race"
+
+    async def scenario():
+        async with app_client() as client:
+            taken = {"email": f"taken-{suffix}@example.com", "username": f"taken{suffix}", "password": PASSWORD}
+            assert (await client.post("/register/user", json=taken)).status_code == 201
+
+            details = {}
+            for field, new_value in (("username", f"fresh-{suffix}@example.com"), ("email", f"fresh{suffix}")):
+                # the other field is new, only `field` collides
+                other = "email" if field == "username" else "username"
+                response = await client.post("/register/user", json={**taken, other: new_value})
+                assert response.status_code == 409
+                details[field] = response.json()["detail"]
+        return details
+
+    assert run(scenario()) == {"username": "Username already taken", "email": "Email already registered"}
@@ -0,0 +1,32 @@
+"""Concurrent identical lookups share one query (repositories' SingleFlight)"""
+import pytest
+import repositories.user_repository
+from benchmarks.harness import run
+from benchmarks.single_flight import bursts, semantics
+from services.single_flight import SingleFlight
+
+CONCURRENCY = 20
+
+
+@pytest.fixture
+def flights(monkeypatch) -> SingleFlight:
+    # REPOSITORY_SINGLE_FLIGHT is read at import, hand the repositories their own instance instead
+    flights = SingleFlight()
+    monkeypatch.setattr(repositories.user_repository, "repository_flights", flights)
+    return flights
+
+
+def test_concurrent_me_and_logins_run_one_user_query(flights):
+    result = run(bursts(CONCURRENCY))
+    # /me with a cold token cache: every request loads the user, one of them queries
+    assert result["me"] == {"requests": CONCURRENCY, "ok": CONCURRENCY, "user_queries": 1}
+    assert result["login"] == {"requests": CONCURRENCY, "ok": CONCURRENCY, "user_queries": 1}
+    assert flights.joined > 0 and len(flights) == 0
+
+
+def test_errors_and_cancellation():
+    assert run(semantics()) == {
+        "error_reaches_every_waiter": True,
+        "cancelled_waiter_leaves_result_to_others": True,
+        "cancelled_leader_hands_over": True,
+    }